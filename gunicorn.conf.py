@@ -0,0 +1,21 @@
+"""
+gunicorn 配置（gunicorn 启动时自动读取工作目录下的 gunicorn.conf.py）
+PROMETHEUS_MULTIPROC_DIR 存放各 worker 的指标文件：启动时清空上次运行留下的文件，worker 退出时标记其 Gauge 失效。
+"""
+
+import os
+import shutil
+
+
+def on_starting(server):
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,36 @@
+"""add user game counters
+
+Revision ID: 3f2c9a1d7b64
+Revises: ab5a531cf240
+Create Date: 2026-10-19 10:12:03.518204
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "3f2c9a1d7b64"
+down_revision = "ab5a531cf240"
+branch_labels = None
+depends_on = None
+
+COUNTER_COLUMNS = ["games_good", "games_evil"] + [
+    f"{kind}_as_{role}"
+    for role in ("merlin", "percival", "loyal", "morgana", "assassin", "mordred", "minion", "oberon")
+    for kind in ("games", "wins")
+]
+
+
+def upgrade():
+    with op.batch_alter_table("users", schema=None) as batch_op:
+        for column in COUNTER_COLUMNS:
+            batch_op.add_column(sa.Column(column, sa.Integer(), server_default="0", nullable=True))
+
+    # Backfill with: flask reconcile-stats
+
+
+def downgrade():
+    with op.batch_alter_table("users", schema=None) as batch_op:
+        for column in reversed(COUNTER_COLUMNS):
+            batch_op.drop_column(column)
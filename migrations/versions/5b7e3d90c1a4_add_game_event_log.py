@@ -0,0 +1,53 @@
+"""add game event log
+
+Revision ID: 5b7e3d90c1a4
+Revises: 8d41e7c2a9f0
+Create Date: 2026-10-19 16:21:08.402113
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import mysql
+
+# revision identifiers, used by Alembic.
+revision = "5b7e3d90c1a4"
+down_revision = "8d41e7c2a9f0"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "game_events",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("room_id", sa.Integer(), nullable=False),
+        sa.Column("seq", sa.Integer(), nullable=False),
+        sa.Column("event_type", sa.String(length=32), nullable=False),
+        sa.Column("payload", mysql.JSON(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["room_id"], ["rooms.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("room_id", "seq", name="uq_game_events_room_seq"),
+    )
+    with op.batch_alter_table("game_events", schema=None) as batch_op:
+        batch_op.create_index(batch_op.f("ix_game_events_room_id"), ["room_id"], unique=False)
+
+    with op.batch_alter_table("game_states", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("log_seq", sa.Integer(), server_default="0", nullable=True))
+
+    with op.batch_alter_table("game_history", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("replay_log", sa.LargeBinary(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("game_history", schema=None) as batch_op:
+        batch_op.drop_column("replay_log")
+
+    with op.batch_alter_table("game_states", schema=None) as batch_op:
+        batch_op.drop_column("log_seq")
+
+    with op.batch_alter_table("game_events", schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f("ix_game_events_room_id"))
+
+    op.drop_table("game_events")
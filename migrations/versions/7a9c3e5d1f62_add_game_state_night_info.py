@@ -0,0 +1,27 @@
+"""add game_state night_info
+
+Revision ID: 7a9c3e5d1f62
+Revises: e2b6f4a09d18
+Create Date: 2026-10-19 18:04:37.519206
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import mysql
+
+# revision identifiers, used by Alembic.
+revision = "7a9c3e5d1f62"
+down_revision = "e2b6f4a09d18"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("game_states", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("night_info", mysql.JSON(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("game_states", schema=None) as batch_op:
+        batch_op.drop_column("night_info")
@@ -0,0 +1,28 @@
+"""add game_history archive_key
+
+Revision ID: 8d41e7c2a9f0
+Revises: 3f2c9a1d7b64
+Create Date: 2026-10-19 14:03:47.129550
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "8d41e7c2a9f0"
+down_revision = "3f2c9a1d7b64"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("game_history", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("archive_key", sa.String(length=64), nullable=True))
+        batch_op.create_index(batch_op.f("ix_game_history_archive_key"), ["archive_key"], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table("game_history", schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f("ix_game_history_archive_key"))
+        batch_op.drop_column("archive_key")
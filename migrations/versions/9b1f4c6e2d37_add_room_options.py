@@ -0,0 +1,27 @@
+"""add room options
+
+Revision ID: 9b1f4c6e2d37
+Revises: 7a9c3e5d1f62
+Create Date: 2026-10-19 20:12:05.318442
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import mysql
+
+# revision identifiers, used by Alembic.
+revision = "9b1f4c6e2d37"
+down_revision = "7a9c3e5d1f62"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("rooms", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("options", mysql.JSON(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("rooms", schema=None) as batch_op:
+        batch_op.drop_column("options")
@@ -0,0 +1,26 @@
+"""add game_state log_archive
+
+Revision ID: c4a81f26d3e7
+Revises: 5b7e3d90c1a4
+Create Date: 2026-10-19 17:48:52.610375
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "c4a81f26d3e7"
+down_revision = "5b7e3d90c1a4"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("game_states", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("log_archive", sa.LargeBinary(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("game_states", schema=None) as batch_op:
+        batch_op.drop_column("log_archive")
@@ -0,0 +1,27 @@
+"""add game_state seat index
+
+Revision ID: e2b6f4a09d18
+Revises: c4a81f26d3e7
+Create Date: 2026-10-19 17:52:14.208733
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import mysql
+
+# revision identifiers, used by Alembic.
+revision = "e2b6f4a09d18"
+down_revision = "c4a81f26d3e7"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("game_states", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("seat_of", mysql.JSON(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("game_states", schema=None) as batch_op:
+        batch_op.drop_column("seat_of")
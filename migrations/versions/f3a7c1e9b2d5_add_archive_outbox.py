@@ -0,0 +1,39 @@
+"""add archive outbox
+
+Revision ID: f3a7c1e9b2d5
+Revises: 9b1f4c6e2d37
+Create Date: 2026-10-19 21:40:12.508173
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import mysql
+
+# revision identifiers, used by Alembic.
+revision = "f3a7c1e9b2d5"
+down_revision = "9b1f4c6e2d37"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "archive_outbox",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("archive_key", sa.String(length=64), nullable=False),
+        sa.Column("payload", mysql.JSON(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    with op.batch_alter_table("archive_outbox", schema=None) as batch_op:
+        batch_op.create_index(batch_op.f("ix_archive_outbox_archive_key"), ["archive_key"], unique=True)
+        batch_op.create_index(batch_op.f("ix_archive_outbox_created_at"), ["created_at"], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table("archive_outbox", schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f("ix_archive_outbox_created_at"))
+        batch_op.drop_index(batch_op.f("ix_archive_outbox_archive_key"))
+
+    op.drop_table("archive_outbox")
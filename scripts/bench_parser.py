@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+指令解析基准测试：在模拟的真实消息语料上对比「逐条 re.match 的旧解析器」与「首词字典分发 + 预编译参数模式」的吞吐量
+
+用法:
+    python scripts/bench_parser.py
+    python scripts/bench_parser.py --messages 200000 --repeat 5
+
+语料按一局游戏中的消息比例生成：投票、任务和 /status 占多数，夹杂全角输入、大小写变体和闲聊（UNKNOWN）。
+不需要数据库和 Redis。
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.wechat.commands import Command, CommandType
+from src.wechat.parser import FULL_WIDTH, parser
+
+# (权重, 生成一条消息)
+CORPUS = [
+    (30, lambda r: f"/vote {r.choice(['yes', 'no', 'YES', 'No'])}"),
+    (10, lambda r: f"投票 {r.choice(['赞成', '反对'])}"),
+    (12, lambda r: f"/quest {r.choice(['success', 'fail'])}"),
+    (4, lambda r: f"任务 {r.choice(['成功', '失败'])}"),
+    (15, lambda r: r.choice(["/status", "状态"])),
+    (6, lambda r: "/pick " + " ".join(str(s) for s in r.sample(range(1, 11), r.randint(2, 5)))),
+    (3, lambda r: f"/join {r.randint(100000, 999999)}"),
+    (2, lambda r: r.choice(["建房", "/start", "开始游戏", "/help", "/profile", "/rank 梅林"])),
+    (1, lambda r: f"/shoot {r.randint(1, 10)}"),
+    (3, lambda r: "／ｖｏｔｅ　ｙｅｓ"),
+    (2, lambda r: "加入　" + "".join(chr(0xFF10 + int(d)) for d in str(r.randint(100000, 999999)))),
+    (12, lambda r: r.choice(["好的", "谁是梅林？", "我是好人", "快点投票", "1号别划水", "哈哈哈哈", "？？？", "/vote maybe"])),
+]
+
+
+class LegacyParser:
+    """重构前的实现：按顺序尝试每个正则（依赖 re 模块缓存），每次调用都重建参数映射"""
+
+    patterns = [
+        (r"^建房$|^创建房间$", CommandType.CREATE_ROOM),
+        (r"^/join\s+(\d+)$|^加入\s+(\d+)$", CommandType.JOIN_ROOM),
+        (r"^/start$|^开始游戏$", CommandType.START_GAME),
+        (r"^/nick\s+(.+)$|^昵称\s+(.+)$", CommandType.SET_NICKNAME),
+        (r"^/status$|^状态$", CommandType.STATUS),
+        (r"^/roles(?:\s+(.+))?$|^板子(?:\s+(.+))?$", CommandType.SET_ROLES),
+        (r"^/pick\s+([\d\s]+)$|^提议\s+([\d\s]+)$", CommandType.PICK_TEAM),
+        (r"^/vote\s+(yes|no|赞成|反对)$|^投票\s+(yes|no|赞成|反对)$", CommandType.VOTE),
+        (r"^/quest\s+(success|fail|成功|失败)$|^任务\s+(success|fail|成功|失败)$", CommandType.QUEST),
+        (r"^/shoot\s+(\d+)$|^刺杀\s+(\d+)$", CommandType.SHOOT),
+        (r"^/profile$|^我的战绩$|^战绩$", CommandType.PROFILE),
+        (r"^/rank(?:\s+(\S+))?$|^排行榜(?:\s+(\S+))?$", CommandType.RANK),
+        (r"^/help$|^帮助$|^菜单$", CommandType.HELP),
+    ]
+
+    def parse(self, text: str, openid: str) -> Command:
+        text = text.strip()
+        for pattern, cmd_type in self.patterns:
+            match = re.match(pattern, text, re.IGNORECASE)
+            if match:
+                args = [g for g in match.groups() if g is not None]
+                if cmd_type in (CommandType.PICK_TEAM, CommandType.SET_ROLES) and args:
+                    args = args[0].split()
+                mapping = {"赞成": "yes", "反对": "no", "成功": "success", "失败": "fail"}
+                args = [mapping.get(a, a).lower() for a in args]
+                return Command(command_type=cmd_type, args=args, raw_content=text, user_openid=openid)
+        return Command(command_type=CommandType.UNKNOWN, raw_content=text, user_openid=openid)
+
+
+def make_corpus(size: int, rng: random.Random) -> list[str]:
+    weights = [w for w, _ in CORPUS]
+    makers = [m for _, m in CORPUS]
+    return [rng.choices(makers, weights)[0](rng) for _ in range(size)]
+
+
+def throughput(parse, corpus: list[str], repeat: int) -> float:
+    """最好一轮的每秒解析条数"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in corpus:
+            parse(text, "bench_user")
+        best = min(best, time.perf_counter() - start)
+    return len(corpus) / best
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="指令解析吞吐量")
+    arg_parser.add_argument("--messages", type=int, default=100_000, help="语料条数")
+    arg_parser.add_argument("--repeat", type=int, default=3, help="重复轮数（取最好一轮）")
+    arg_parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    args = arg_parser.parse_args()
+
+    corpus = make_corpus(args.messages, random.Random(args.seed))
+    legacy = LegacyParser()
+
+    # 两者对半角输入的结果应一致（新解析器另外接受全角输入与简写）
+    half_width = [text for text in corpus if text == text.translate(FULL_WIDTH)]
+    recognized = sum(parser.parse(text, "u").command_type is not CommandType.UNKNOWN for text in corpus)
+    mismatches = sum(legacy.parse(text, "u") != parser.parse(text, "u") for text in half_width[:10_000])
+
+    old = throughput(legacy.parse, corpus, args.repeat)
+    new = throughput(parser.parse, corpus, args.repeat)
+
+    print("=" * 60)
+    print(f"语料: {len(corpus)} 条，识别为指令 {recognized} 条，半角样本结果不一致 {mismatches} 条")
+    print(f"{'解析器':<24} {'条/秒':>14} {'微秒/条':>10}")
+    print("=" * 60)
+    print(f"{'逐条 re.match（旧）':<24} {old:>14,.0f} {1e6 / old:>10.2f}")
+    print(f"{'首词分发 + 预编译（新）':<24} {new:>14,.0f} {1e6 / new:>10.2f}")
+    print("=" * 60)
+    print(f"加速比: {new / old:.2f}x（含 Command 模型构造）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+房间加载基准测试：对比「从头回放整个事件日志」与「快照 + 尾部回放」的加载耗时
+
+用法:
+    python scripts/bench_room_load.py                              # 默认 sqlite 内存库
+    python scripts/bench_room_load.py --lengths 10 100 1000 10000 --repeat 50
+    python scripts/bench_room_load.py --database-url mysql+pymysql://...   # 对真实库测试（会写入测试数据）
+
+create_app 启动时会连接 Redis，请先运行 docker compose up -d
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import insert
+
+from src.app_factory import create_app, db
+from src.fsm.game_log import GameEventType
+from src.models.sql_models import GameEvent, GameState, Room
+from src.repositories.room_repository import room_repo
+
+PLAYERS = [f"bench_{i}" for i in range(10)]
+ROLES = ["MERLIN", "PERCIVAL", "LOYAL", "LOYAL", "LOYAL", "LOYAL", "ASSASSIN", "MORGANA", "MORDRED", "OBERON"]
+TAIL = 10  # 快照之后保留的尾部事件数（一个投票阶段的规模）
+
+
+def make_room(room_number: str, length: int) -> int:
+    """创建一个日志长度为 length 的对局：开局 + 组队 + 一长串投票事件，快照停在 seq 0（从未压缩）"""
+    room = Room(room_number=room_number, owner_id=PLAYERS[0], status="PLAYING")
+    room.game_state = GameState(players=list(PLAYERS), roles_config={}, current_team=[], quest_results=[], votes={}, quest_votes={}, log_seq=0)
+    db.session.add(room)
+    db.session.commit()
+
+    events = [(GameEventType.GAME_STARTED, {"players": PLAYERS, "roles": ROLES}), (GameEventType.TEAM_PICKED, {"team": [0, 1, 2]})]
+    while len(events) < length:
+        events.append((GameEventType.VOTE_CAST, {"seat": random.randrange(len(PLAYERS)), "vote": random.choice(["yes", "no"])}))
+    db.session.execute(
+        insert(GameEvent),
+        [{"room_id": room.id, "seq": seq, "event_type": kind.value, "payload": payload} for seq, (kind, payload) in enumerate(events, start=1)],
+    )
+    db.session.commit()
+    return room.id
+
+
+def time_load(room_id: int, repeat: int) -> float:
+    """平均加载耗时（毫秒）；每次都换新 session，模拟崩溃恢复 / 新请求的冷加载"""
+    total = 0.0
+    for _ in range(repeat):
+        db.session.remove()
+        start = time.perf_counter()
+        room = room_repo.get_by_id(room_id)
+        assert room.game_state.phase == "TEAM_VOTE"
+        total += time.perf_counter() - start
+    return total / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="房间加载耗时 vs 事件日志长度")
+    parser.add_argument("--database-url", default="sqlite:///:memory:", help="数据库连接串（默认 sqlite 内存库）")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[10, 100, 1000, 10000], help="测试的日志长度")
+    parser.add_argument("--repeat", type=int, default=20, help="每个长度重复加载的次数")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": args.database_url})
+
+    with app.app_context():
+        db.create_all()
+
+        print("=" * 60)
+        print(f"{'日志长度':>10} {'全量回放 (ms)':>16} {'快照+尾部 (ms)':>16} {'加速比':>8}")
+        print("=" * 60)
+        for i, length in enumerate(args.lengths):
+            room_id = make_room(f"B{i:03d}", length)
+            full = time_load(room_id, args.repeat)
+
+            # 在当前 head 写快照并压缩，再追加 TAIL 个事件作为尾部
+            room = room_repo.get_by_id(room_id)
+            tail = [(GameEventType.VOTE_CAST, {"seat": random.randrange(len(PLAYERS)), "vote": "yes"}) for _ in range(TAIL)]
+            room_repo.snapshot(room)
+            room_repo.append_events(room, tail)
+            snapshot = time_load(room_id, args.repeat)
+
+            print(f"{length:>10} {full:>16.3f} {snapshot:>16.3f} {full / snapshot:>7.1f}x")
+
+        print("=" * 60)
+        print(f"快照之后的尾部长度: {TAIL} 个事件；每项取 {args.repeat} 次冷加载平均值")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,10 @@
 用法:
     python scripts/cleanup_rooms.py              # 执行清理
     python scripts/cleanup_rooms.py --stats     # 只查看统计
-    python scripts/cleanup_rooms.py --dry-run    # 模拟运行（不删除）
+    python scripts/cleanup_rooms.py --dry-run    # 模拟运行（不删除）：按策略列出将要清理的房间数与可释放空间
+    python scripts/cleanup_rooms.py --dry-run --format jsonl --list-rooms --output plan.jsonl   # 完整清单写入文件
+    python scripts/cleanup_rooms.py --batch-size 1000 --sleep 0.2   # 调整每批房间数与批间停顿
+    python scripts/cleanup_rooms.py --restart    # 丢弃上次中断留下的断点，从头扫描
 """
 
 import argparse
@@ -18,12 +21,45 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")
 
 from src.app_factory import create_app
 from src.services.cleanup_service import cleanup_service
+from src.utils.json_utils import json_dumps
+
+
+def format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def format_plan_record(record: dict) -> str:
+    """模拟运行记录的文本格式（见 CleanupService.plan）"""
+    if record["type"] == "rooms":
+        return f"  [{record['policy']}] {' '.join(record['rooms'])}"
+    counts = (
+        f"{record['rooms']} 个房间（game_states {record['game_states']}, game_events {record['game_events']}, "
+        f"移出房间的用户 {record['users']}），约 {format_bytes(record['bytes'])}"
+    )
+    if record["type"] == "policy":
+        lines = [f"[模拟] {record['policy']}（{record['threshold_hours']} 小时）: {counts}"]
+        if record["samples"]:
+            lines.append(f"  示例: {', '.join(record['samples'])}")
+        return "\n".join(lines)
+    source = "MySQL 表统计" if record["bytes_source"] == "table_statistics" else "默认行长估算"
+    return f"[模拟] 合计: {counts}（空间按{source}）"
 
 
 def main():
     parser = argparse.ArgumentParser(description="清理过期房间")
     parser.add_argument("--stats", action="store_true", help="只显示统计信息，不执行清理")
     parser.add_argument("--dry-run", action="store_true", help="模拟运行，不实际删除")
+    parser.add_argument("--batch-size", type=int, help="每批扫描的房间数（默认 CLEANUP_BATCH_SIZE）")
+    parser.add_argument("--sleep", type=float, help="批与批之间停顿的秒数（默认 CLEANUP_BATCH_SLEEP_SECONDS）")
+    parser.add_argument("--restart", action="store_true", help="丢弃上次中断留下的断点，从头扫描")
+    parser.add_argument("--output", help="模拟运行的结果写入文件（默认标准输出）")
+    parser.add_argument("--format", choices=["text", "jsonl"], default="text", help="模拟运行的输出格式")
+    parser.add_argument("--samples", type=int, default=10, help="模拟运行时每条策略列出的示例房间数")
+    parser.add_argument("--list-rooms", action="store_true", help="模拟运行时逐批输出全部待清理的房间号")
 
     args = parser.parse_args()
 
@@ -43,16 +79,17 @@ def main():
             return 0
 
         if args.dry_run:
-            # 模拟运行
-            print("=" * 60)
-            print("模拟运行 - 不会实际删除房间")
-            print("=" * 60)
-            stats = cleanup_service.get_room_statistics()
-            print("\n当前状态:")
-            for key, value in stats.items():
-                print(f"  {key:20s}: {value}")
-            print("\n[模拟] 将根据策略清理过期房间...")
-            print("=" * 60)
+            # 模拟运行：与实际清理相同的候选查询，边计算边输出
+            out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+            try:
+                plan = cleanup_service.plan(batch_size=args.batch_size, samples=args.samples, list_rooms=args.list_rooms)
+                for record in plan:
+                    out.write(json_dumps(record) if args.format == "jsonl" else format_plan_record(record))
+                    out.write("\n")
+                    out.flush()
+            finally:
+                if out is not sys.stdout:
+                    out.close()
             return 0
 
         # 执行清理
@@ -68,7 +105,7 @@ def main():
 
         # 执行清理
         print("\n执行清理...")
-        cleanup_result = cleanup_service.cleanup_expired_rooms()
+        cleanup_result = cleanup_service.cleanup_expired_rooms(batch_size=args.batch_size, sleep_seconds=args.sleep, resume=not args.restart)
 
         # 显示清理结果
         print("\n清理结果:")
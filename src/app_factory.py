@@ -35,10 +35,24 @@ def create_app(config_override=None):
     app.config["SQLALCHEMY_DATABASE_URI"] = settings.DATABASE_URL
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
     app.config["REDIS_URL"] = settings.REDIS_URL
+    app.config["REDIS_SOCKET_TIMEOUT"] = settings.REDIS_SOCKET_TIMEOUT
 
     if config_override:
         app.config.update(config_override)
 
+    # 请求截止时间：MySQL 锁等待与驱动读写都有上限，慢锁不会拖过微信的 5 秒
+    if app.config["SQLALCHEMY_DATABASE_URI"].startswith("mysql"):
+        app.config.setdefault(
+            "SQLALCHEMY_ENGINE_OPTIONS",
+            {
+                "connect_args": {
+                    "read_timeout": settings.DB_READ_TIMEOUT,
+                    "write_timeout": settings.DB_READ_TIMEOUT,
+                    "init_command": f"SET SESSION innodb_lock_wait_timeout = {settings.DB_LOCK_WAIT_TIMEOUT}",
+                }
+            },
+        )
+
     # Initialize extensions
     db.init_app(app)
     migrate.init_app(app, db)
@@ -53,6 +67,14 @@ def create_app(config_override=None):
 
             db.session.execute(text("SELECT 1"))
             logger.info("✅ MySQL connection verified.")
+
+            from src.utils.deadline import install_statement_limit
+            from src.utils.instrumentation import install_db_counter
+            from src.utils.metrics import install_pool_metrics
+
+            install_statement_limit(db.engine)
+            install_db_counter(db.engine)
+            install_pool_metrics(db.engine)
         except Exception as e:
             logger.error(f"❌ MySQL connection failed: {e}")
             if settings.APP_ENV == "dev":
@@ -82,6 +104,16 @@ def create_app(config_override=None):
 
     register_error_handlers(app)
 
+    # 阶段变化推送：订阅对局状态变化与延迟指令结果
+    from src.services.notification_service import notification_service
+
+    notification_service.install()
+
+    # 房间计数：随开局与阶段变化实时更新
+    from src.services.room_gauge_service import room_gauge_service
+
+    room_gauge_service.install()
+
     @app.before_request
     def add_trace_id():
         import uuid
@@ -92,6 +124,10 @@ def create_app(config_override=None):
         trace_id = request.headers.get("X-Trace-Id") or str(uuid.uuid4())
         g.trace_id = trace_id
 
+    from src.utils.metrics import install_http_metrics
+
+    install_http_metrics(app)
+
     @app.after_request
     def add_trace_id_to_header(response):
         from flask import g
@@ -150,6 +186,10 @@ def create_app(config_override=None):
                         timeout_service.check_and_process_timeouts()
                     except Exception as e:
                         logger.error(f"Error in timeout checker: {e}")
+                    try:
+                        room_gauge_service.maybe_reconcile()
+                    except Exception as e:
+                        logger.error(f"Error reconciling room gauges: {e}")
                     time.sleep(timeout_service.check_interval)
 
         # 在后台线程中运行
@@ -159,11 +199,41 @@ def create_app(config_override=None):
         thread.start()
         logger.info("✅ Timeout checker background thread started")
 
+    # 启动对局归档消费者后台任务（每个进程一个消费者，同属一个消费者组）
+    def _start_archive_worker():
+        import threading
+
+        from src.services.archive_service import archive_service
+
+        def archive_worker_loop():
+            with app.app_context():
+                archive_service.run_worker()
+
+        thread = threading.Thread(target=archive_worker_loop, daemon=True, name="ArchiveWorker")
+        thread.start()
+        logger.info("✅ Archive worker background thread started")
+
+    # 启动阶段通知发送者后台任务
+    def _start_push_sender():
+        import threading
+
+        def push_sender_loop():
+            with app.app_context():
+                notification_service.run_worker()
+
+        thread = threading.Thread(target=push_sender_loop, daemon=True, name="PushSender")
+        thread.start()
+        logger.info("✅ Push sender background thread started")
+
     # 只在主进程启动后台任务
     import os
 
     if (os.environ.get("WERKZEUG_RUN_MAIN") == "true" or settings.APP_ENV != "dev") and not app.config.get("TESTING"):
         _start_timeout_checker()
+        if settings.ARCHIVE_ASYNC:
+            _start_archive_worker()
+        if settings.PUSH_ENABLED:
+            _start_push_sender()
 
     logger.info(f"🚀 Mini-Avalon started in [{settings.APP_ENV}] mode")
     logger.info(f"📅 Database: {app.config['SQLALCHEMY_DATABASE_URI']}")
@@ -1,4 +1,4 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, Response, jsonify
 
 api_bp = Blueprint("api", __name__, url_prefix="/api")
 
@@ -6,3 +6,12 @@ api_bp = Blueprint("api", __name__, url_prefix="/api")
 @api_bp.route("/ping")
 def ping():
     return jsonify({"message": "pong"})
+
+
+@api_bp.route("/metrics")
+def metrics():
+    """Prometheus 抓取端点（汇总所有 gunicorn worker）"""
+    from src.services.metrics_service import metrics_service
+
+    body, content_type = metrics_service.render()
+    return Response(body, content_type=content_type)
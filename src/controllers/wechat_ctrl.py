@@ -1,9 +1,11 @@
-from flask import Blueprint, g, make_response, request
+from flask import Blueprint, current_app, g, make_response, request
 from wechatpy import create_reply, parse_message
 from wechatpy.exceptions import InvalidSignatureException
 from wechatpy.utils import check_signature
 
 from src.config.settings import settings
+from src.exceptions.server.server_exceptions import DeadlineExceededError
+from src.utils import deadline
 from src.utils.logger import get_logger
 
 wechat_bp = Blueprint("wechat", __name__)
@@ -37,20 +39,42 @@ def wechat():
         logger.info(f"Received text message from {openid}: {content}")
 
         from src.repositories.user_repository import user_repo
+        from src.wechat.deferred import ACCEPTED_REPLY, deferred_commands
         from src.wechat.handlers import dispatcher
+        from src.wechat.idempotency import reply_cache
         from src.wechat.parser import parser
 
-        # 1. Ensure user exists
-        user_repo.create_or_update(openid)
+        # 0. WeChat retries slow requests with the same MsgId: run each message once
+        cached = reply_cache.begin(msg.id)
+        if cached is not None:
+            logger.info(f"Duplicate delivery of message {msg.id} from {openid}, replying from cache")
+            return cached
 
-        # 2. Parse Command
-        cmd = parser.parse(content, openid)
+        try:
+            with deadline.budget(settings.REQUEST_BUDGET_SECONDS):
+                # 1. Parse Command
+                cmd = parser.parse(content, openid)
 
-        # 3. Handle Command via Strategy Pattern
-        reply_text = dispatcher.dispatch(cmd)
+                # 2. Throttle before anything touches the database
+                reply_text = dispatcher.throttle(cmd)
+                if reply_text is None:
+                    # 3. Ensure user exists
+                    user_repo.create_or_update(openid)
 
-        reply = create_reply(reply_text, message=msg)
-        return reply.render()
+                    # 4. Handle Command via Strategy Pattern
+                    reply_text = dispatcher.dispatch(cmd)
+        except DeadlineExceededError as e:
+            # Deadline checks sit before each command's write, so nothing changed yet: redo it in the background
+            logger.warning(f"Message {msg.id} from {openid} ran out of time at {e.details['step']}, finishing asynchronously")
+            deferred_commands.submit(current_app._get_current_object(), msg, content, openid)
+            return create_reply(ACCEPTED_REPLY, message=msg).render()
+        except Exception:
+            reply_cache.release(msg.id)
+            raise
+
+        rendered = create_reply(reply_text, message=msg).render()
+        reply_cache.finish(msg.id, rendered)
+        return rendered
     else:
         reply = create_reply("目前仅支持文本消息交互", message=msg)
         return reply.render()
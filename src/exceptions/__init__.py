@@ -25,4 +25,5 @@ __all__ = [
     "InvalidCommandError",
     "RedisConnectionError",
     "DatabaseError",
+    "DeadlineExceededError",
 ]
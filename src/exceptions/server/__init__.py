@@ -1,3 +1,3 @@
 from .server_exceptions import *
 
-__all__ = ["RedisConnectionError", "DatabaseError"]
\ No newline at end of file
+__all__ = ["RedisConnectionError", "DatabaseError", "DeadlineExceededError"]
\ No newline at end of file
@@ -17,3 +17,13 @@ class DatabaseError(ServerException):
             error_code="INFRA-DB-001",
             http_status=http_status
         )
+
+
+class DeadlineExceededError(ServerException):
+    def __init__(self, step: str, http_status: int = 500):
+        super().__init__(
+            message=f"请求处理超时: {step}",
+            error_code="INFRA-DEADLINE-001",
+            http_status=http_status,
+            details={"step": step}
+        )
@@ -1,16 +1,40 @@
 from redis import Redis
+from redis.client import Pipeline
+
+from src.utils.instrumentation import count_redis_call
+
+
+class _CountingPipeline(Pipeline):
+    def execute(self, raise_on_error=True):
+        count_redis_call()
+        return super().execute(raise_on_error)
+
+
+class InstrumentedRedis(Redis):
+    """每次往返（单条命令、脚本或一次 pipeline 提交）计入当前指令的 Redis 调用数"""
+
+    def execute_command(self, *args, **options):
+        count_redis_call()
+        return super().execute_command(*args, **options)
+
+    def pipeline(self, transaction=True, shard_hint=None) -> Pipeline:
+        return _CountingPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
 
 
 class RedisExtension:
     def __init__(self, app=None):
         self._client = None
+        self._blocking_client = None
         if app is not None:
             self.init_app(app)
 
     def init_app(self, app):
         redis_url = app.config.get("REDIS_URL")
-        # 初始化连接池
-        self._client = Redis.from_url(redis_url, decode_responses=True)
+        # 初始化连接池；单次命令有读写超时，Redis 卡顿不会拖过请求截止时间
+        timeout = app.config.get("REDIS_SOCKET_TIMEOUT")
+        self._client = InstrumentedRedis.from_url(redis_url, decode_responses=True, socket_timeout=timeout, socket_connect_timeout=timeout)
+        # 阻塞读（XREADGROUP BLOCK）会超过读超时，走不设读超时的独立连接池
+        self._blocking_client = Redis.from_url(redis_url, decode_responses=True, socket_connect_timeout=timeout)
 
         # 快速失败自检：确认 Redis 是否可用
         try:
@@ -35,6 +59,11 @@ class RedisExtension:
     def client(self) -> Redis:
         return self._client
 
+    @property
+    def blocking_client(self) -> Redis:
+        """仅供后台任务的阻塞读使用"""
+        return self._blocking_client
+
 
 # 创建单例对象，供外部模块导入
 redis_manager = RedisExtension()
@@ -10,6 +10,13 @@ class GamePhase(Enum):
     GAME_OVER = "GAME_OVER"
 
 
+# 好人: MERLIN, PERCIVAL, LOYAL
+# 坏人: MORGANA, ASSASSIN, MORDRED, MINION, OBERON
+GOOD_ROLES = ("MERLIN", "PERCIVAL", "LOYAL")
+EVIL_ROLES = ("MORGANA", "ASSASSIN", "MORDRED", "MINION", "OBERON")
+ALL_ROLES = GOOD_ROLES + EVIL_ROLES
+
+
 class AvalonFSM:
     """
     Core Logic for Avalon Game state transitions.
@@ -17,7 +24,12 @@ class AvalonFSM:
     """
 
     @staticmethod
-    def get_role_distribution(player_count: int) -> dict[str, int]:
+    def get_team(role: str | None) -> str:
+        """Returns 'GOOD' or 'EVIL'. Unknown roles count as EVIL, as the stats code always did."""
+        return "GOOD" if role in GOOD_ROLES else "EVIL"
+
+    @staticmethod
+    def get_role_distribution(player_count: int) -> tuple[int, int]:
         # Standard Avalon distribution (Good vs Evil)
         # 5 players: 3 Good, 2 Evil
         # 6 players: 4 Good, 2 Evil
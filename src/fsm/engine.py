@@ -0,0 +1,352 @@
+"""
+Pure Avalon rules engine.
+
+No I/O, no clock, no ORM: a `Game` is a small slotted value with seat-indexed tuples, and every
+transition returns a new `Game` plus the log events (see `game_log`) that reproduce it. Validation
+errors raise `IllegalMove` with a player-facing message.
+
+Transitions never mutate their input; treat `Game` instances as immutable. The phase guard, effect and
+possible next phases of every event are declared once in `TRANSITIONS`.
+"""
+
+from collections.abc import Sequence
+from enum import Enum
+
+from src.fsm.avalon_fsm import AvalonFSM, GamePhase
+
+
+class GameEventType(Enum):
+    GAME_STARTED = "game_started"  # {"players": [openid...], "roles": [role per seat]}
+    TEAM_PICKED = "team_picked"  # {"team": [seat...]}
+    VOTE_CAST = "vote_cast"  # {"seat": int, "vote": "yes" | "no"}
+    TEAM_VOTE_RESOLVED = "team_vote_resolved"  # {"approved": bool}
+    QUEST_CAST = "quest_cast"  # {"seat": int, "vote": "success" | "fail"}
+    QUEST_RESOLVED = "quest_resolved"  # {"success": bool, "fails": int}
+    ASSASSINATION = "assassination"  # {"seat": int, "hit": bool}
+    TIMEOUT = "timeout"  # {"phase": str, "votes": [[seat, vote], ...]}  auto-played votes
+
+
+TEAM_SELECTION = GamePhase.TEAM_SELECTION
+TEAM_VOTE = GamePhase.TEAM_VOTE
+QUEST_PERFORM = GamePhase.QUEST_PERFORM
+ASSASSINATION = GamePhase.ASSASSINATION
+GAME_OVER = GamePhase.GAME_OVER
+
+# player count -> quest size per round (1-5), precomputed from AvalonFSM
+QUEST_SIZES = {n: tuple(AvalonFSM.get_quest_size(n, r) for r in range(1, 6)) for n in range(5, 11)}
+MAX_REJECTIONS = 5
+
+Event = tuple[GameEventType, dict]
+
+
+class IllegalMove(ValueError):
+    """The move is not allowed in the current state; str(e) is the message shown to the player."""
+
+
+class Game:
+    """
+    roles:   role per seat
+    team:    seats on the current quest team
+    votes:   team vote per seat (True = approve, None = not voted yet)
+    cards:   quest card per seat (True = success, None = not played)
+    results: quest outcomes so far
+    winner:  "GOOD" / "EVIL" once phase is GAME_OVER
+    """
+
+    __slots__ = ("roles", "phase", "round_num", "vote_track", "leader", "team", "votes", "cards", "results", "winner")
+
+    def __init__(
+        self,
+        roles: tuple[str, ...],
+        phase: GamePhase = TEAM_SELECTION,
+        round_num: int = 1,
+        vote_track: int = 0,
+        leader: int = 0,
+        team: tuple[int, ...] = (),
+        votes: tuple[bool | None, ...] | None = None,
+        cards: tuple[bool | None, ...] | None = None,
+        results: tuple[bool, ...] = (),
+        winner: str | None = None,
+    ):
+        empty = (None,) * len(roles)
+        self.roles = roles
+        self.phase = phase
+        self.round_num = round_num
+        self.vote_track = vote_track
+        self.leader = leader
+        self.team = team
+        self.votes = votes if votes is not None else empty
+        self.cards = cards if cards is not None else empty
+        self.results = results
+        self.winner = winner
+
+    @property
+    def n(self) -> int:
+        return len(self.roles)
+
+    @property
+    def quest_size(self) -> int:
+        return QUEST_SIZES[len(self.roles)][self.round_num - 1]
+
+    @property
+    def required_fails(self) -> int:
+        # Quest 4 Rule: 7+ players need 2 fails
+        return 2 if len(self.roles) >= 7 and self.round_num == 4 else 1
+
+    def evolve(self, **changes) -> "Game":
+        # Hot path of every transition: copy the slots explicitly, then overwrite the changed ones
+        g = Game.__new__(Game)
+        g.roles, g.phase, g.round_num, g.vote_track, g.leader = self.roles, self.phase, self.round_num, self.vote_track, self.leader
+        g.team, g.votes, g.cards, g.results, g.winner = self.team, self.votes, self.cards, self.results, self.winner
+        for slot, value in changes.items():
+            setattr(g, slot, value)
+        return g
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Game) and all(getattr(self, s) == getattr(other, s) for s in Game.__slots__)
+
+    def __repr__(self) -> str:
+        return f"<Game {self.phase.value} r{self.round_num} leader={self.leader} results={self.results}>"
+
+
+def new_game(roles: Sequence[str]) -> Game:
+    if len(roles) not in QUEST_SIZES:
+        raise IllegalMove(f"不支持的人数: {len(roles)}")
+    return Game(tuple(roles))
+
+
+# Who sees whom during the night phase
+MERLIN_SEES = ("MORGANA", "ASSASSIN", "MINION", "OBERON")  # all evil except Mordred
+PERCIVAL_SEES = ("MERLIN", "MORGANA")  # undistinguished Merlin candidates
+EVIL_TEAM = ("MORGANA", "ASSASSIN", "MORDRED", "MINION")  # know each other; Oberon is alone
+
+
+def night_knowledge(roles: Sequence[str]) -> tuple[tuple[int, ...], ...]:
+    """Seats each seat sees at night (roles never change, so this is computed once per game)."""
+    merlin = tuple(s for s, r in enumerate(roles) if r in MERLIN_SEES)
+    percival = tuple(s for s, r in enumerate(roles) if r in PERCIVAL_SEES)
+    evil = tuple(s for s, r in enumerate(roles) if r in EVIL_TEAM)
+    views = []
+    for seat, role in enumerate(roles):
+        if role == "MERLIN":
+            views.append(merlin)
+        elif role == "PERCIVAL":
+            views.append(percival)
+        elif role in EVIL_TEAM:
+            views.append(tuple(s for s in evil if s != seat))
+        else:
+            views.append(())
+    return tuple(views)
+
+
+# ---------------------------------------------------------------------------
+# Transition table: per event, the phases it may happen in (guard), its effect on the game, and the
+# phases it can lead to. Declared targets are checked against AvalonFSM.check_transition at import,
+# and every phase change made by a live move is checked against its declared targets in _emit.
+# ---------------------------------------------------------------------------
+
+
+class Transition:
+    """
+    phases:  phases the event is legal in; a move outside them raises IllegalMove(refusal)
+    effect:  (game, payload) -> game; pure facts, no validation (also used to fold stored logs)
+    targets: phases the event may move the game to (empty: never changes the phase)
+    refusal: player-facing message when the guard fails; may use {phase}
+    """
+
+    __slots__ = ("phases", "effect", "targets", "refusal")
+
+    def __init__(self, phases: tuple[GamePhase, ...], effect, targets: tuple[GamePhase, ...] = (), refusal: str = ""):
+        self.phases = phases
+        self.effect = effect
+        self.targets = targets
+        self.refusal = refusal
+
+
+def _team_picked(g: Game, payload: dict) -> Game:
+    return g.evolve(team=tuple(payload["team"]), phase=TEAM_VOTE, votes=(None,) * g.n)
+
+
+def _vote_cast(g: Game, payload: dict) -> Game:
+    return g.evolve(votes=_set(g.votes, payload["seat"], payload["vote"] == "yes"))
+
+
+def _team_vote_resolved(g: Game, payload: dict) -> Game:
+    if payload["approved"]:
+        return g.evolve(phase=QUEST_PERFORM, vote_track=0, cards=(None,) * g.n)
+    track = g.vote_track + 1
+    if track >= MAX_REJECTIONS:
+        return g.evolve(vote_track=track, phase=GAME_OVER, winner="EVIL")
+    return g.evolve(vote_track=track, leader=(g.leader + 1) % g.n, phase=TEAM_SELECTION)
+
+
+def _quest_cast(g: Game, payload: dict) -> Game:
+    return g.evolve(cards=_set(g.cards, payload["seat"], payload["vote"] == "success"))
+
+
+def _quest_resolved(g: Game, payload: dict) -> Game:
+    results = g.results + (payload["success"],)
+    cleared = (None,) * g.n
+    if results.count(False) >= 3:
+        return g.evolve(results=results, cards=cleared, phase=GAME_OVER, winner="EVIL")
+    if results.count(True) >= 3:
+        return g.evolve(results=results, cards=cleared, phase=ASSASSINATION)
+    return g.evolve(
+        results=results,
+        cards=cleared,
+        round_num=g.round_num + 1,
+        vote_track=0,
+        leader=(g.leader + 1) % g.n,
+        phase=TEAM_SELECTION,
+    )
+
+
+def _assassination(g: Game, payload: dict) -> Game:
+    return g.evolve(phase=GAME_OVER, winner="EVIL" if payload["hit"] else "GOOD")
+
+
+def _timeout(g: Game, payload: dict) -> Game:
+    if payload["phase"] == TEAM_VOTE.value:
+        votes = list(g.votes)
+        for seat, vote in payload["votes"]:
+            votes[seat] = vote == "yes"
+        return g.evolve(votes=tuple(votes))
+    cards = list(g.cards)
+    for seat, card in payload["votes"]:
+        cards[seat] = card == "success"
+    return g.evolve(cards=tuple(cards))
+
+
+def _game_started(g: Game | None, payload: dict) -> Game:
+    return new_game(payload["roles"])
+
+
+TRANSITIONS: dict[GameEventType, Transition] = {
+    GameEventType.GAME_STARTED: Transition((GamePhase.WAITING,), _game_started, (TEAM_SELECTION,)),
+    GameEventType.TEAM_PICKED: Transition((TEAM_SELECTION,), _team_picked, (TEAM_VOTE,), "当前不是组队阶段"),
+    GameEventType.VOTE_CAST: Transition((TEAM_VOTE,), _vote_cast, refusal="当前不是投票阶段"),
+    GameEventType.TEAM_VOTE_RESOLVED: Transition((TEAM_VOTE,), _team_vote_resolved, (QUEST_PERFORM, TEAM_SELECTION, GAME_OVER)),
+    GameEventType.QUEST_CAST: Transition((QUEST_PERFORM,), _quest_cast, refusal="当前不是任务执行阶段"),
+    GameEventType.QUEST_RESOLVED: Transition((QUEST_PERFORM,), _quest_resolved, (TEAM_SELECTION, ASSASSINATION, GAME_OVER)),
+    GameEventType.ASSASSINATION: Transition((ASSASSINATION,), _assassination, (GAME_OVER,), "当前不是刺杀阶段"),
+    GameEventType.TIMEOUT: Transition((TEAM_VOTE, QUEST_PERFORM), _timeout, refusal="{phase} 阶段没有超时处理"),
+}
+
+
+def _check_table() -> None:
+    fsm = AvalonFSM()
+    for kind, t in TRANSITIONS.items():
+        for source in t.phases:
+            for target in t.targets:
+                if not fsm.check_transition(source.value, target):
+                    raise ValueError(f"Transition table: {kind.value} may not move {source.value} -> {target.value}")
+
+
+_check_table()
+
+
+def apply(g: Game, kind: GameEventType, payload: dict) -> Game:
+    """Applies one event (the fold): facts only, no validation."""
+    t = TRANSITIONS.get(kind)
+    if t is None:
+        raise ValueError(f"Unknown event type: {kind}")
+    return t.effect(g, payload)
+
+
+# ---------------------------------------------------------------------------
+# Moves: validate, decide, return (new game, events)
+# ---------------------------------------------------------------------------
+
+
+def _guard(g: Game, kind: GameEventType) -> None:
+    t = TRANSITIONS[kind]
+    if g.phase not in t.phases:
+        raise IllegalMove(t.refusal.format(phase=g.phase.value))
+
+
+def pick(g: Game, leader: int | None, team: Sequence[int]) -> tuple[Game, list[Event]]:
+    _guard(g, GameEventType.TEAM_PICKED)
+    if leader != g.leader:
+        raise IllegalMove("你不是当前队长")
+    if len(team) != g.quest_size:
+        raise IllegalMove(f"本轮任务需要选择 {g.quest_size} 人")
+    for seat in team:
+        if not 0 <= seat < g.n:
+            raise IllegalMove(f"非法的玩家编号: {seat + 1}")
+    return _emit(g, [(GameEventType.TEAM_PICKED, {"team": list(team)})])
+
+
+def vote(g: Game, seat: int | None, approve: bool) -> tuple[Game, list[Event]]:
+    _guard(g, GameEventType.VOTE_CAST)
+    if seat is None or not 0 <= seat < g.n:
+        raise IllegalMove("你不在该房间中")
+    g, events = _emit(g, [(GameEventType.VOTE_CAST, {"seat": seat, "vote": "yes" if approve else "no"})])
+    return _resolve(g, events)
+
+
+def quest(g: Game, seat: int | None, success: bool) -> tuple[Game, list[Event]]:
+    _guard(g, GameEventType.QUEST_CAST)
+    if seat not in g.team:
+        raise IllegalMove("你不在本次任务队伍中")
+    g, events = _emit(g, [(GameEventType.QUEST_CAST, {"seat": seat, "vote": "success" if success else "fail"})])
+    return _resolve(g, events)
+
+
+def shoot(g: Game, assassin: int | None, target: int) -> tuple[Game, list[Event]]:
+    _guard(g, GameEventType.ASSASSINATION)
+    if assassin is None or g.roles[assassin] != "ASSASSIN":
+        raise IllegalMove("只有刺客可以执行刺杀")
+    if not 0 <= target < g.n:
+        raise IllegalMove(f"非法的玩家编号: {target + 1}")
+    return _emit(g, [(GameEventType.ASSASSINATION, {"seat": target, "hit": g.roles[target] == "MERLIN"})])
+
+
+def timeout(g: Game, moves: Sequence[tuple[int, bool]]) -> tuple[Game, list[Event]]:
+    """Plays the given (seat, approve / success) moves for players who ran out of time, then resolves."""
+    _guard(g, GameEventType.TIMEOUT)
+    if g.phase is TEAM_VOTE:
+        auto = [[seat, "yes" if ok else "no"] for seat, ok in moves]
+    else:
+        auto = [[seat, "success" if ok else "fail"] for seat, ok in moves]
+    g, events = _emit(g, [(GameEventType.TIMEOUT, {"phase": g.phase.value, "votes": auto})])
+    return _resolve(g, events)
+
+
+def pending_seats(g: Game) -> list[int]:
+    """Seats that still have to act in the current phase."""
+    if g.phase is TEAM_SELECTION:
+        return [g.leader]
+    if g.phase is TEAM_VOTE:
+        return [seat for seat, v in enumerate(g.votes) if v is None]
+    if g.phase is QUEST_PERFORM:
+        return [seat for seat in g.team if g.cards[seat] is None]
+    if g.phase is ASSASSINATION:
+        return [g.roles.index("ASSASSIN")]
+    return []
+
+
+def _resolve(g: Game, events: list[Event]) -> tuple[Game, list[Event]]:
+    """Closes the vote / quest once everyone involved has acted."""
+    if g.phase is TEAM_VOTE and None not in g.votes:
+        approvals = g.votes.count(True)
+        return _emit(g, [(GameEventType.TEAM_VOTE_RESOLVED, {"approved": approvals > g.n - approvals})], events)
+    if g.phase is QUEST_PERFORM and all(g.cards[seat] is not None for seat in g.team):
+        fails = sum(1 for seat in g.team if g.cards[seat] is False)
+        return _emit(g, [(GameEventType.QUEST_RESOLVED, {"success": fails < g.required_fails, "fails": fails})], events)
+    return g, events
+
+
+def _emit(g: Game, new_events: list[Event], events: list[Event] | None = None) -> tuple[Game, list[Event]]:
+    for kind, payload in new_events:
+        t = TRANSITIONS[kind]
+        if g.phase not in t.phases:
+            raise ValueError(f"{kind.value} is not legal in {g.phase.value}")
+        after = t.effect(g, payload)
+        if after.phase is not g.phase and after.phase not in t.targets:
+            raise ValueError(f"{kind.value} moved {g.phase.value} -> {after.phase.value}, not a declared target")
+        g = after
+    return g, (events or []) + new_events
+
+
+def _set(values: tuple, index: int, value) -> tuple:
+    return values[:index] + (value,) + values[index + 1 :]
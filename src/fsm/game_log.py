@@ -0,0 +1,157 @@
+"""
+Append-only game event log.
+
+Live game state is a fold over the events of the current game: every player action
+appends one small event instead of rewriting the GameState JSON columns. Events record
+facts that were already decided (roles dealt, vote outcome, quest outcome), so a replay
+never re-runs any randomness or rule and is deterministic by construction.
+
+Player references inside payloads are seat indices (0-based positions in `players`).
+The game rules themselves are in `src.fsm.engine`.
+"""
+
+import json
+import zlib
+from datetime import UTC, datetime
+from typing import Any
+
+from src.fsm import engine
+from src.fsm.avalon_fsm import GamePhase
+from src.fsm.engine import GameEventType
+
+__all__ = ["GameEventType", "STATE_FIELDS", "fold", "replay", "build_seat_index", "seat_index", "to_game", "from_game", "encode_log", "decode_log"]
+
+# GameState columns that are derived from the log
+STATE_FIELDS = (
+    "phase",
+    "round_num",
+    "vote_track",
+    "leader_idx",
+    "current_team",
+    "quest_results",
+    "roles_config",
+    "players",
+    "votes",
+    "quest_votes",
+    "phase_start_time",
+    "seat_of",
+    "night_info",
+)
+
+# Events that (re)start the phase timer even without a phase change
+_TIMER_EVENTS = (GameEventType.GAME_STARTED, GameEventType.TEAM_PICKED, GameEventType.TIMEOUT)
+
+
+def fold(state: dict[str, Any], event_type: str, payload: dict[str, Any], ts: datetime | None = None) -> dict[str, Any]:
+    """
+    Applies one event to a state dict (keys: STATE_FIELDS) and returns the new state. Never mutates the input.
+    The rules live in `engine.apply`; this only converts between the stored openid-keyed shape and seats.
+    """
+    kind = GameEventType(event_type)
+    if kind is GameEventType.GAME_STARTED:
+        players, before = list(payload["players"]), None
+    else:
+        players, before = state["players"], to_game(state)
+
+    after = engine.apply(before, kind, payload) if before else engine.new_game(payload["roles"])
+    s = {**state, **from_game(after, players)}
+    if not before:
+        # Seats and roles are fixed for the whole game: index the seats and work out the night phase once
+        s["seat_of"] = build_seat_index(players)
+        s["night_info"] = [list(seen) for seen in engine.night_knowledge(payload["roles"])]
+    elif after.phase is GamePhase.GAME_OVER:
+        # Only needed while playing; the finished game is archived without it
+        s["night_info"] = None
+    if kind in _TIMER_EVENTS or (before and after.phase is not before.phase and after.phase is not GamePhase.GAME_OVER):
+        s["phase_start_time"] = ts
+    return s
+
+
+def build_seat_index(players: list[str]) -> dict[str, int]:
+    """{openid: seat} for players in seat order."""
+    return {openid: seat for seat, openid in enumerate(players)}
+
+
+def seat_index(game_state) -> dict[str, int]:
+    """
+    The seat lookup of a GameState. States written before the index existed (or rooms that have
+    not started) have none, so it is rebuilt from players for them.
+    """
+    seat_of = getattr(game_state, "seat_of", None)
+    if seat_of is not None:
+        return seat_of
+    return build_seat_index(game_state.players or [])
+
+
+def to_game(state: dict[str, Any]) -> engine.Game:
+    """Stored state (openid-keyed) -> engine state (seat-indexed)."""
+    players = state.get("players") or []
+    seat_of = state.get("seat_of") or {openid: seat for seat, openid in enumerate(players)}
+    roles_config = state.get("roles_config") or {}
+    votes = [None] * len(players)
+    for openid, vote in (state.get("votes") or {}).items():
+        votes[seat_of[openid]] = vote == "yes"
+    cards = [None] * len(players)
+    for openid, card in _as_dict(state.get("quest_votes")).items():
+        cards[seat_of[openid]] = card == "success"
+    return engine.Game(
+        roles=tuple(roles_config.get(openid) for openid in players),
+        phase=GamePhase(state.get("phase") or GamePhase.WAITING.value),
+        round_num=state.get("round_num") or 1,
+        vote_track=state.get("vote_track") or 0,
+        leader=state.get("leader_idx") or 0,
+        team=tuple(seat_of[openid] for openid in state.get("current_team") or []),
+        votes=tuple(votes),
+        cards=tuple(cards),
+        results=tuple(state.get("quest_results") or []),
+    )
+
+
+def from_game(g: engine.Game, players: list[str]) -> dict[str, Any]:
+    """Engine state -> stored state columns (everything in STATE_FIELDS except phase_start_time and the seat index)."""
+    return {
+        "phase": g.phase.value,
+        "round_num": g.round_num,
+        "vote_track": g.vote_track,
+        "leader_idx": g.leader,
+        "current_team": [players[seat] for seat in g.team],
+        "quest_results": list(g.results),
+        "roles_config": dict(zip(players, g.roles, strict=True)),
+        "players": list(players),
+        "votes": {players[seat]: "yes" if v else "no" for seat, v in enumerate(g.votes) if v is not None},
+        "quest_votes": {players[seat]: "success" if c else "fail" for seat, c in enumerate(g.cards) if c is not None},
+    }
+
+
+def replay(events: list[dict[str, Any]], state: dict[str, Any] | None = None) -> dict[str, Any]:
+    """Folds a list of {"type", "payload", "ts"} events, starting from `state` (or an empty game)."""
+    s = dict(state or {})
+    for e in events:
+        s = fold(s, e["type"], e["payload"], e.get("ts"))
+    return s
+
+
+def encode_log(events: list[dict[str, Any]]) -> bytes:
+    """Compact storage for a completed log: [[type, payload, unix_ts], ...] as zlib-compressed JSON."""
+    rows = [[e["type"], e["payload"], _to_unix(e.get("ts"))] for e in events]
+    raw = json.dumps(rows, separators=(",", ":"), ensure_ascii=False).encode()
+    return zlib.compress(raw, 9)
+
+
+def decode_log(blob: bytes) -> list[dict[str, Any]]:
+    rows = json.loads(zlib.decompress(blob))
+    return [{"type": t, "payload": p, "ts": _from_unix(ts)} for t, p, ts in rows]
+
+
+def _to_unix(ts: datetime | None) -> float | None:
+    # Timestamps are naive UTC throughout the models
+    return ts.replace(tzinfo=UTC).timestamp() if ts else None
+
+
+def _from_unix(value: float | None) -> datetime | None:
+    return datetime.fromtimestamp(value, UTC).replace(tzinfo=None) if value is not None else None
+
+
+def _as_dict(value) -> dict:
+    # quest_votes used to be stored as a list before any quest was played
+    return dict(value) if isinstance(value, dict) else {}
@@ -0,0 +1,157 @@
+"""
+Role distribution tables.
+
+Each variant maps a player count to the complete role multiset for that count, so dealing a game is a
+single permutation draw (`deal`). Every table is checked against `AvalonFSM.get_role_distribution` and
+the engine's invariants at import, so a bad edit fails at startup instead of in the middle of a game.
+
+A room selects its variant through `Room.options` ({"variant": key, "preset": [role, ...]}); the
+"custom" variant uses the owner's preset, validated with the same rules when it is set.
+"""
+
+from collections import Counter
+from collections.abc import Sequence
+
+from src.fsm.avalon_fsm import ALL_ROLES, GOOD_ROLES, AvalonFSM
+
+CLASSIC = "classic"
+CUSTOM = "custom"
+
+# Roles the engine looks up by name: exactly one of each per game
+REQUIRED_ROLES = ("MERLIN", "ASSASSIN")
+# Roles that only make sense once per game
+UNIQUE_ROLES = ("MERLIN", "PERCIVAL", "ASSASSIN", "MORGANA", "MORDRED", "OBERON")
+
+
+class RoleTableError(ValueError):
+    """The table or preset is not a legal deal; str(e) is the message shown to the player."""
+
+
+class RoleVariant:
+    """
+    key:             value stored in Room.options["variant"]
+    label:           name shown to players
+    tables:          player count -> roles (good first, then evil)
+    lady_of_the_lake: the variant is meant to be played with the Lady of the Lake token
+    """
+
+    __slots__ = ("key", "label", "tables", "lady_of_the_lake")
+
+    def __init__(self, key: str, label: str, tables: dict[int, tuple[str, ...]], lady_of_the_lake: bool = False):
+        self.key = key
+        self.label = label
+        self.tables = tables
+        self.lady_of_the_lake = lady_of_the_lake
+
+
+def _roles(good: str, evil: str) -> tuple[str, ...]:
+    return tuple(good.split()) + tuple(evil.split())
+
+
+VARIANTS = {
+    v.key: v
+    for v in (
+        RoleVariant(
+            CLASSIC,
+            "经典",
+            {
+                5: _roles("MERLIN PERCIVAL LOYAL", "ASSASSIN MORGANA"),
+                6: _roles("MERLIN PERCIVAL LOYAL LOYAL", "ASSASSIN MORGANA"),
+                7: _roles("MERLIN PERCIVAL LOYAL LOYAL", "ASSASSIN MORGANA OBERON"),
+                8: _roles("MERLIN PERCIVAL LOYAL LOYAL LOYAL", "ASSASSIN MORGANA MINION"),
+                9: _roles("MERLIN PERCIVAL LOYAL LOYAL LOYAL LOYAL", "ASSASSIN MORGANA MORDRED"),
+                10: _roles("MERLIN PERCIVAL LOYAL LOYAL LOYAL LOYAL", "ASSASSIN MORGANA MORDRED OBERON"),
+            },
+        ),
+        RoleVariant(
+            "no_percival",
+            "无派西维尔",
+            {
+                5: _roles("MERLIN LOYAL LOYAL", "ASSASSIN MINION"),
+                6: _roles("MERLIN LOYAL LOYAL LOYAL", "ASSASSIN MINION"),
+                7: _roles("MERLIN LOYAL LOYAL LOYAL", "ASSASSIN MINION MINION"),
+                8: _roles("MERLIN LOYAL LOYAL LOYAL LOYAL", "ASSASSIN MINION MINION"),
+                9: _roles("MERLIN LOYAL LOYAL LOYAL LOYAL LOYAL", "ASSASSIN MORDRED MINION"),
+                10: _roles("MERLIN LOYAL LOYAL LOYAL LOYAL LOYAL", "ASSASSIN MORDRED MINION MINION"),
+            },
+        ),
+        RoleVariant(
+            "lady",
+            "湖中仙女",
+            {
+                7: _roles("MERLIN PERCIVAL LOYAL LOYAL", "ASSASSIN MORGANA MORDRED"),
+                8: _roles("MERLIN PERCIVAL LOYAL LOYAL LOYAL", "ASSASSIN MORGANA MORDRED"),
+                9: _roles("MERLIN PERCIVAL LOYAL LOYAL LOYAL LOYAL", "ASSASSIN MORGANA MORDRED"),
+                10: _roles("MERLIN PERCIVAL LOYAL LOYAL LOYAL LOYAL", "ASSASSIN MORGANA MORDRED OBERON"),
+            },
+            lady_of_the_lake=True,
+        ),
+        RoleVariant(CUSTOM, "自定义", {}),
+    )
+}
+
+# Accepted spellings of variant keys in /roles
+VARIANT_ALIASES = {**{key: key for key in VARIANTS}, **{v.label: key for key, v in VARIANTS.items()}, "无派": "no_percival"}
+
+
+def validate(roles: Sequence[str]) -> None:
+    """Raises RoleTableError unless `roles` is a playable deal for len(roles) players."""
+    count = len(roles)
+    if count not in range(5, 11):
+        raise RoleTableError(f"角色数必须在 5-10 之间，当前 {count} 个")
+    unknown = [r for r in roles if r not in ALL_ROLES]
+    if unknown:
+        raise RoleTableError(f"未知角色: {' '.join(unknown)}（可用: {' '.join(ALL_ROLES)}）")
+
+    tally = Counter(roles)
+    for role in REQUIRED_ROLES:
+        if tally[role] != 1:
+            raise RoleTableError(f"必须且只能有一个 {role}")
+    for role in UNIQUE_ROLES:
+        if tally[role] > 1:
+            raise RoleTableError(f"{role} 最多只能有一个")
+
+    good_count, evil_count = AvalonFSM.get_role_distribution(count)
+    good = sum(n for role, n in tally.items() if role in GOOD_ROLES)
+    if (good, count - good) != (good_count, evil_count):
+        raise RoleTableError(f"{count} 人局需要 {good_count} 好 {evil_count} 坏，当前 {good} 好 {count - good} 坏")
+
+
+def roles_for(player_count: int, options: dict | None = None) -> tuple[str, ...]:
+    """The role multiset for a room's options (default: classic)."""
+    options = options or {}
+    key = options.get("variant") or CLASSIC
+    variant = VARIANTS.get(key)
+    if variant is None:
+        raise RoleTableError(f"未知板子: {key}")
+
+    if key == CUSTOM:
+        roles = tuple(options.get("preset") or ())
+        if len(roles) != player_count:
+            raise RoleTableError(f"自定义板子是 {len(roles)} 人的，当前 {player_count} 人")
+        validate(roles)
+        return roles
+
+    roles = variant.tables.get(player_count)
+    if roles is None:
+        raise RoleTableError(f"{variant.label}板子不支持 {player_count} 人（支持: {'/'.join(str(n) for n in sorted(variant.tables))}）")
+    return roles
+
+
+def deal(roles: Sequence[str], rng) -> list[str]:
+    """One uniformly random permutation of `roles`: the role per seat."""
+    return rng.sample(roles, len(roles))
+
+
+def _validate_tables() -> None:
+    for variant in VARIANTS.values():
+        for count, roles in variant.tables.items():
+            try:
+                if len(roles) != count:
+                    raise RoleTableError(f"{len(roles)} roles")
+                validate(roles)
+            except RoleTableError as e:
+                raise RoleTableError(f"Invalid role table {variant.key}/{count}: {e}") from None
+
+
+_validate_tables()
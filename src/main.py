@@ -8,17 +8,22 @@ root_dir = str(Path(__file__).resolve().parents[1])
 if root_dir not in sys.path:
     sys.path.insert(0, root_dir)
 
+import click  # noqa: E402
+
 from src.app_factory import create_app  # noqa: E402
 
 app = create_app()
 
 
 @app.cli.command("cleanup-rooms")
-def cleanup_rooms_command():
+@click.option("--batch-size", type=int, help="每批扫描的房间数（默认 CLEANUP_BATCH_SIZE）")
+@click.option("--sleep", "sleep_seconds", type=float, help="批与批之间停顿的秒数（默认 CLEANUP_BATCH_SLEEP_SECONDS）")
+@click.option("--restart", is_flag=True, help="丢弃上次中断留下的断点，从头扫描")
+def cleanup_rooms_command(batch_size, sleep_seconds, restart):
     """清理过期房间（使用新的cleanup_service）"""
     from src.services.cleanup_service import cleanup_service
 
-    stats = cleanup_service.cleanup_expired_rooms()
+    stats = cleanup_service.cleanup_expired_rooms(batch_size=batch_size, sleep_seconds=sleep_seconds, resume=not restart)
     print(f"Successfully cleaned up {stats['total']} rooms:")
     for key, value in stats.items():
         if key != "total":
@@ -26,10 +31,14 @@ def cleanup_rooms_command():
 
 
 @app.cli.command("room-stats")
-def room_stats_command():
+@click.option("--reconcile", is_flag=True, help="先用一条分组查询校准 Redis 中的房间计数")
+def room_stats_command(reconcile):
     """查看房间统计信息"""
     from src.services.cleanup_service import cleanup_service
+    from src.services.room_gauge_service import room_gauge_service
 
+    if reconcile:
+        room_gauge_service.reconcile()
     stats = cleanup_service.get_room_statistics()
     print("Room statistics:")
     for key, value in stats.items():
@@ -45,6 +54,72 @@ def check_timeouts_command():
     print(f"Processed {count} timed out games.")
 
 
+@app.cli.command("reconcile-stats")
+@click.option("--batch-size", default=500, show_default=True, help="每批扫描的行数")
+@click.option("--dry-run", is_flag=True, help="只报告偏差，不写回")
+def reconcile_stats_command(batch_size, dry_run):
+    """从对局历史校准用户战绩计数器"""
+    from src.services.stats_service import stats_service
+
+    result = stats_service.reconcile_user_counters(batch_size=batch_size, fix=not dry_run)
+    print(f"Scanned {result['histories']} histories and {result['users']} users.")
+    for openid, diff in result["drift"].items():
+        changes = ", ".join(f"{column}: {actual} -> {expected}" for column, (actual, expected) in diff.items())
+        print(f"  {openid}: {changes}")
+    action = "Reported" if dry_run else "Fixed"
+    print(f"{action} drift for {result['drifted']} users.")
+
+
+@app.cli.command("rebuild-leaderboards")
+@click.option("--batch-size", default=500, show_default=True, help="每批扫描的用户数")
+def rebuild_leaderboards_command(batch_size):
+    """从 MySQL 全量重建 Redis 排行榜"""
+    from src.services.leaderboard_service import leaderboard_service
+
+    count = leaderboard_service.rebuild(batch_size=batch_size)
+    print(f"Rebuilt leaderboards from {count} users.")
+
+
+@app.cli.command("simulate")
+@click.option("--games", default=10000, show_default=True, help="每个人数模拟的局数")
+@click.option("--players", default="5-10", show_default=True, help="人数，如 5-10 或 5,7,10")
+@click.option("--policy", default="heuristic", show_default=True, help="机器人策略（random / autoplay / heuristic）")
+@click.option("--workers", default=os.cpu_count() or 1, show_default=True, help="进程数")
+@click.option("--seed", default=0, show_default=True, help="随机种子（相同种子结果可复现）")
+@click.option("--chunk-size", default=2000, show_default=True, help="每个进程池任务的局数")
+@click.option("--variant", default="classic", show_default=True, help="板子（classic / no_percival / lady）")
+def simulate_command(games, players, policy, workers, seed, chunk_size, variant):
+    """蒙特卡洛批量对局，输出各人数 / 角色配置的胜率与吞吐"""
+    from src.services.simulation_service import simulation_service
+
+    if "-" in players:
+        low, high = players.split("-")
+        player_counts = list(range(int(low), int(high) + 1))
+    else:
+        player_counts = [int(p) for p in players.split(",")]
+
+    result = simulation_service.run(games, player_counts, policy=policy, seed=seed, workers=workers, chunk_size=chunk_size, variant=variant)
+    print(f"Policy: {policy}, variant: {variant}, seed: {seed}, workers: {workers}")
+    for line in simulation_service.format_report(result):
+        print(line)
+
+
+@app.cli.command("archive-worker")
+def archive_worker_command():
+    """以独立进程运行对局归档消费者"""
+    from src.services.archive_service import archive_service
+
+    archive_service.run_worker()
+
+
+@app.cli.command("push-worker")
+def push_worker_command():
+    """以独立进程运行阶段通知发送者"""
+    from src.services.notification_service import notification_service
+
+    notification_service.run_worker()
+
+
 def main():
     """启动应用"""
     port = int(os.environ.get("PORT", 8000))
@@ -4,6 +4,6 @@
 from . import sql_models
 
 # Also expose the models directly
-from .sql_models import GameHistory, GameState, Room, User
+from .sql_models import ArchiveOutbox, GameEvent, GameHistory, GameState, Room, User
 
-__all__ = ["User", "Room", "GameState", "GameHistory", "sql_models"]
\ No newline at end of file
+__all__ = ["User", "Room", "GameState", "GameEvent", "GameHistory", "ArchiveOutbox", "sql_models"]
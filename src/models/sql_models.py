@@ -3,6 +3,7 @@ from datetime import UTC, datetime
 from sqlalchemy.dialects.mysql import JSON
 
 from src.app_factory import db
+from src.fsm.avalon_fsm import ALL_ROLES
 
 
 class User(db.Model):
@@ -15,11 +16,39 @@ class User(db.Model):
     total_games = db.Column(db.Integer, default=0)
     wins_good = db.Column(db.Integer, default=0)
     wins_evil = db.Column(db.Integer, default=0)
+    # Counters below are maintained incrementally by the archive worker
+    # (see ArchiveService.process / UserRepository.apply_game_result); `flask reconcile-stats` rebuilds them from history.
+    games_good = db.Column(db.Integer, default=0, server_default="0")
+    games_evil = db.Column(db.Integer, default=0, server_default="0")
+    games_as_merlin = db.Column(db.Integer, default=0, server_default="0")
+    wins_as_merlin = db.Column(db.Integer, default=0, server_default="0")
+    games_as_percival = db.Column(db.Integer, default=0, server_default="0")
+    wins_as_percival = db.Column(db.Integer, default=0, server_default="0")
+    games_as_loyal = db.Column(db.Integer, default=0, server_default="0")
+    wins_as_loyal = db.Column(db.Integer, default=0, server_default="0")
+    games_as_morgana = db.Column(db.Integer, default=0, server_default="0")
+    wins_as_morgana = db.Column(db.Integer, default=0, server_default="0")
+    games_as_assassin = db.Column(db.Integer, default=0, server_default="0")
+    wins_as_assassin = db.Column(db.Integer, default=0, server_default="0")
+    games_as_mordred = db.Column(db.Integer, default=0, server_default="0")
+    wins_as_mordred = db.Column(db.Integer, default=0, server_default="0")
+    games_as_minion = db.Column(db.Integer, default=0, server_default="0")
+    wins_as_minion = db.Column(db.Integer, default=0, server_default="0")
+    games_as_oberon = db.Column(db.Integer, default=0, server_default="0")
+    wins_as_oberon = db.Column(db.Integer, default=0, server_default="0")
     current_room_id = db.Column(db.Integer, db.ForeignKey("rooms.id"), nullable=True)
 
     def __repr__(self):
         return f"<User {self.nickname} ({self.openid})>"
 
+    @staticmethod
+    def counter_columns() -> list[str]:
+        """All game counter columns, in display order."""
+        columns = ["total_games", "wins_good", "wins_evil", "games_good", "games_evil"]
+        for role in ALL_ROLES:
+            columns += [f"games_as_{role.lower()}", f"wins_as_{role.lower()}"]
+        return columns
+
 
 class Room(db.Model):
     __tablename__ = "rooms"
@@ -35,6 +64,7 @@ class Room(db.Model):
         onupdate=lambda: datetime.now(UTC),
     )
     version = db.Column(db.Integer, default=1)
+    options = db.Column(JSON)  # {"variant": "classic", "preset": [role, ...]}, see src.fsm.role_tables
 
     game_state = db.relationship("GameState", backref="room", uselist=False, cascade="all, delete-orphan")
 
@@ -57,17 +87,50 @@ class GameState(db.Model):
     players = db.Column(JSON)  # List of openids in order
     votes = db.Column(JSON)  # Dict {openid: vote_value}
     quest_votes = db.Column(JSON)  # List of success/fail (unordered for secrecy)
+    seat_of = db.Column(JSON)  # Dict {openid: seat}，开局时建立，座位查找 O(1)
+    night_info = db.Column(JSON)  # List[List[seat]]：每个座位夜间看到的座位，开局时计算，对局结束时清空
     phase_start_time = db.Column(db.DateTime, default=lambda: datetime.now(UTC))  # 阶段开始时间
     timeout_seconds = db.Column(db.Integer, default=60)  # 超时秒数（默认 60 秒）
+    # 上面的状态列是事件日志折叠到 log_seq 为止的快照（每次阶段切换时写入），之后的事件由 RoomRepository 在读取时补折叠
+    log_seq = db.Column(db.Integer, default=0, server_default="0")
+    # log_seq 及之前的事件压缩后存放于此（game_events 中只保留当前阶段的尾部），默认不加载
+    log_archive = db.deferred(db.Column(db.LargeBinary))
+
+
+class GameEvent(db.Model):
+    """对局事件日志（只追加），当前对局状态 = 快照 + 折叠其后的事件，见 src/fsm/game_log.py"""
+
+    __tablename__ = "game_events"
+    __table_args__ = (db.UniqueConstraint("room_id", "seq", name="uq_game_events_room_seq"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    room_id = db.Column(db.Integer, db.ForeignKey("rooms.id", ondelete="CASCADE"), nullable=False, index=True)
+    seq = db.Column(db.Integer, nullable=False)  # 房间内从 1 递增，(room_id, seq) 唯一约束兼作乐观锁
+    event_type = db.Column(db.String(32), nullable=False)
+    payload = db.Column(JSON)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(UTC))
+
+
+class ArchiveOutbox(db.Model):
+    """待归档的对局：与结束对局的最后一步在同一事务中写入，归档（GameHistory 写入）时在同一事务中删除"""
+
+    __tablename__ = "archive_outbox"
+
+    id = db.Column(db.Integer, primary_key=True)
+    archive_key = db.Column(db.String(64), unique=True, nullable=False, index=True)
+    payload = db.Column(JSON, nullable=False)  # 完整的归档事件，见 ArchiveService.stage
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(UTC), index=True)
 
 
 class GameHistory(db.Model):
     __tablename__ = "game_history"
 
     id = db.Column(db.Integer, primary_key=True)
+    archive_key = db.Column(db.String(64), unique=True, index=True)  # 归档事件幂等键
     room_id = db.Column(db.String(32))
     start_time = db.Column(db.DateTime)
     end_time = db.Column(db.DateTime, default=lambda: datetime.now(UTC))
     winner_team = db.Column(db.String(10))  # 'GOOD' or 'EVIL'
     players = db.Column(JSON)
     replay_data = db.Column(JSON)
+    replay_log = db.Column(db.LargeBinary)  # 完整事件日志（zlib 压缩），可用 game_log.decode_log 回放
@@ -1,15 +1,36 @@
+import copy
+from collections import defaultdict
+from collections.abc import Callable
+from datetime import UTC, datetime
 from typing import Any
 
-from sqlalchemy.orm.attributes import flag_modified
+from sqlalchemy import bindparam, case, delete, event, func, insert, inspect, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import flag_modified, set_committed_value
 
 from src.app_factory import db
+from src.exceptions.biz.room_exceptions import RoomStateError
 from src.extensions.redis_ext import redis_manager
-from src.models.sql_models import GameState, Room
+from src.fsm.game_log import STATE_FIELDS, GameEventType, decode_log, encode_log, fold
+from src.models.sql_models import GameEvent, GameState, Room, User
+from src.repositories.user_repository import user_repo
+from src.utils import metrics
 from src.utils.json_utils import json_dumps, json_loads
 from src.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# (head_seq, state) of the log as folded into an in-memory GameState; absent until the tail has been folded
+FOLDED_ATTR = "_folded_log"
+
+
+@event.listens_for(GameState, "refresh")
+def _reset_folded_log(target, context, attrs):
+    # A reload only sees the stored snapshot (state up to log_seq), so the tail has to be folded again
+    if attrs is None or set(attrs) & set(STATE_FIELDS):
+        target.__dict__.pop(FOLDED_ATTR, None)
+
 
 class RoomRepository:
     """
@@ -31,13 +52,16 @@ class RoomRepository:
                 logger.debug(f"Cache HIT for room {room_number}")
                 cached_room = self._deserialize_room(cached_data)
                 if cached_room:
+                    metrics.cache_lookup("room", hits=1)
                     return cached_room
         except Exception as e:
             logger.warning(f"Redis cache read failed for room {room_number}: {e}, falling back to DB")
+        metrics.cache_lookup("room", hits=0, misses=1)
 
         # 2. Try MySQL
         room = Room.query.filter_by(room_number=room_number).first()
         if room:
+            self._fold_tails([room])
             # 3. Fill Cache if found (async, don't block)
             try:
                 self._set_cache(room)
@@ -47,6 +71,45 @@ class RoomRepository:
 
         return None
 
+    def get_by_id(self, room_id: int) -> Room | None:
+        room = db.session.get(Room, room_id)
+        if room:
+            self._fold_tails([room])
+        return room
+
+    def get_playing_rooms(self) -> list[Room]:
+        """All PLAYING rooms with their live state, event tails folded with one query."""
+        # populate_existing: the timeout checker keeps one session for its whole life
+        rooms = Room.query.filter_by(status="PLAYING").options(selectinload(Room.game_state)).populate_existing().all()
+        self._fold_tails(rooms)
+        return rooms
+
+    def count_rooms_and_players(self) -> list[tuple[str, str | None, int, int, int]]:
+        """
+        (status, phase, rooms, players, rooms without players) grouped by status and phase, with one query.
+        Players are users whose current room is the room; phase is None for rooms without a game state.
+        """
+        players = (
+            db.session.query(User.current_room_id.label("room_id"), func.count(User.id).label("n"))
+            .filter(User.current_room_id.isnot(None))
+            .group_by(User.current_room_id)
+            .subquery()
+        )
+        rows = (
+            db.session.query(
+                Room.status,
+                GameState.phase,
+                func.count(Room.id),
+                func.coalesce(func.sum(players.c.n), 0),
+                func.sum(case((players.c.n.is_(None), 1), else_=0)),
+            )
+            .outerjoin(GameState, GameState.room_id == Room.id)
+            .outerjoin(players, players.c.room_id == Room.id)
+            .group_by(Room.status, GameState.phase)
+            .all()
+        )
+        return [(status, phase, int(rooms), int(members), int(empty or 0)) for status, phase, rooms, members, empty in rows]
+
     def save(self, room: Room) -> None:
         """
         Saves room with optimistic locking (handled by version field).
@@ -72,6 +135,45 @@ class RoomRepository:
             logger.error(f"Failed to save room {room.room_number}: {str(e)}")
             raise
 
+    def set_options(self, room: Room, options: dict[str, Any]) -> None:
+        """
+        Writes room.options with one UPDATE guarded by the room version, like append_events. Works on
+        the detached copy get_by_number returns on a cache hit, which save() would try to INSERT again.
+        """
+        room_number, version = room.room_number, room.version or 1
+        try:
+            result = db.session.execute(
+                update(Room)
+                .where(Room.id == room.id, Room.version == version)
+                .values(options=options, version=version + 1)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount != 1:
+                raise IntegrityError("room version check failed", None, None)
+            db.session.commit()
+        except IntegrityError as e:
+            db.session.rollback()
+            self._invalidate_cache(room_number)
+            logger.warning(f"Concurrent update on room {room_number} (v{version}), options update rejected")
+            raise RoomStateError("操作冲突，请重试") from e
+        except Exception:
+            db.session.rollback()
+            raise
+        self._keep_loaded(room, {"options": options, "version": version + 1})
+        self._invalidate_cache(room_number)
+
+    def bump_version(self, room_number: str) -> None:
+        """Moves the room to a new version without loading it, so caches keyed by version are no longer read."""
+        try:
+            db.session.execute(
+                update(Room).where(Room.room_number == room_number).values(version=Room.version + 1).execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        self._invalidate_cache(room_number)
+
     def delete(self, room: Room) -> None:
         room_number = room.room_number
         db.session.delete(room)
@@ -82,17 +184,73 @@ class RoomRepository:
         except Exception as e:
             logger.warning(f"Failed to invalidate cache for room {room_number}: {e}")
 
+    def delete_many(self, room_ids: list[int], room_numbers: list[str]) -> int:
+        """
+        Deletes rooms with their game states and event logs in bulk statements and one commit, after taking their
+        users out of them; the room caches and the users' room mappings are dropped in one Redis pipeline.
+        Returns the number of users taken out.
+        """
+        if not room_ids:
+            return 0
+        # Rows are removed without loading them; the commit expires whatever the session still holds
+        options = {"synchronize_session": False}
+        try:
+            members = [openid for (openid,) in db.session.query(User.openid).filter(User.current_room_id.in_(room_ids))]
+            db.session.execute(update(User).where(User.current_room_id.in_(room_ids)).values(current_room_id=None).execution_options(**options))
+            # Explicit rather than relying on ON DELETE CASCADE, which not every backend enforces
+            db.session.execute(delete(GameEvent).where(GameEvent.room_id.in_(room_ids)).execution_options(**options))
+            db.session.execute(delete(GameState).where(GameState.room_id.in_(room_ids)).execution_options(**options))
+            db.session.execute(delete(Room).where(Room.id.in_(room_ids)).execution_options(**options))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        try:
+            pipe = redis_manager.client.pipeline(transaction=False)
+            for room_number in room_numbers:
+                pipe.delete(f"{self.CACHE_PREFIX}{room_number}")
+            for openid in members:
+                pipe.delete(user_repo.room_key(openid))
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to invalidate cache for {len(room_numbers)} deleted rooms: {e}")
+        return len(members)
+
+    def count_dependents(self, room_ids: list[int]) -> dict[str, int]:
+        """Rows delete_many would touch besides the rooms themselves: game states, events and users taken out."""
+        if not room_ids:
+            return {"game_states": 0, "game_events": 0, "users": 0}
+        return {
+            "game_states": db.session.query(func.count(GameState.id)).filter(GameState.room_id.in_(room_ids)).scalar(),
+            "game_events": db.session.query(func.count(GameEvent.id)).filter(GameEvent.room_id.in_(room_ids)).scalar(),
+            "users": db.session.query(func.count(User.id)).filter(User.current_room_id.in_(room_ids)).scalar(),
+        }
+
+    def average_row_bytes(self) -> dict[str, int] | None:
+        """{table: average row length} as reported by MySQL's table statistics; None on other backends."""
+        if db.engine.dialect.name != "mysql":
+            return None
+        tables = [Room.__tablename__, GameState.__tablename__, GameEvent.__tablename__]
+        rows = db.session.execute(
+            text(
+                "SELECT TABLE_NAME, AVG_ROW_LENGTH FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN :tables"
+            ).bindparams(bindparam("tables", expanding=True)),
+            {"tables": tables},
+        ).all()
+        return {name: int(length or 0) for name, length in rows}
+
     def update_game_state(self, game_state: GameState) -> None:
         """
         Special helper for JSON fields in GameState.
         SQLAlchemy doesn't always detect internal JSON changes.
+        Writes the whole in-memory state as the snapshot, so it also covers any folded events.
         """
-        flag_modified(game_state, "current_team")
-        flag_modified(game_state, "quest_results")
-        flag_modified(game_state, "roles_config")
-        flag_modified(game_state, "players")
-        flag_modified(game_state, "votes")
-        flag_modified(game_state, "quest_votes")
+        for field in STATE_FIELDS:
+            flag_modified(game_state, field)
+        folded = game_state.__dict__.get(FOLDED_ATTR)
+        if folded:
+            game_state.log_seq = folded[0]
+            self._set_folded(game_state, folded[0], self._state_of(game_state))
         db.session.commit()
 
         # Invalidate associated room cache
@@ -103,6 +261,173 @@ class RoomRepository:
             except Exception as e:
                 logger.warning(f"Failed to invalidate cache: {e}")
 
+    def append_events(
+        self,
+        room: Room,
+        events: list[tuple[GameEventType, dict]],
+        snapshot: bool = False,
+        before_commit: Callable[[dict[str, Any]], None] | None = None,
+    ) -> dict[str, Any]:
+        """
+        Appends events to the room's log and folds them into room.game_state.
+        Within a phase only the small event rows are written. When the phase changes (or with
+        snapshot=True) the GameState columns are rewritten as a snapshot at the new head, room.status
+        is persisted and the events up to it are compacted into log_archive, so a load replays at
+        most the current phase.
+        Concurrent writers are rejected by the (room_id, seq) unique key and the room version check.
+        before_commit(state) runs inside the same transaction once everything is written, so whatever it
+        adds to the session commits or rolls back together with the move.
+        Returns:
+            dict: the new state (keys: STATE_FIELDS)
+        """
+        gs = room.game_state
+        self._fold_tails([room])
+        folded = gs.__dict__.get(FOLDED_ATTR)
+        head = folded[0] if folded else (gs.log_seq or 0)
+
+        now = datetime.now(UTC).replace(tzinfo=None)
+        state = self._state_of(gs)
+        phase = state["phase"]
+        rows = []
+        for kind, payload in events:
+            state = fold(state, kind.value, payload, now)
+            rows.append({"room_id": room.id, "seq": head + len(rows) + 1, "event_type": kind.value, "payload": payload, "created_at": now})
+        new_head = head + len(rows)
+        snapshot = snapshot or state["phase"] != phase
+
+        room_number, version, status = room.room_number, room.version or 1, room.status
+        room_values = {"version": version + 1}
+        if snapshot:
+            room_values["status"] = status
+        try:
+            if rows:
+                db.session.execute(insert(GameEvent), rows)
+            result = db.session.execute(
+                update(Room).where(Room.id == room.id, Room.version == version).values(**room_values).execution_options(synchronize_session=False)
+            )
+            if result.rowcount != 1:
+                raise IntegrityError("room version check failed", None, None)
+            if snapshot:
+                db.session.execute(
+                    update(GameState)
+                    .where(GameState.room_id == room.id)
+                    .values(**{field: state[field] for field in STATE_FIELDS}, log_seq=new_head, log_archive=self._compact(room.id))
+                    .execution_options(synchronize_session=False)
+                )
+            if before_commit:
+                before_commit(state)
+            db.session.commit()
+        except IntegrityError as e:
+            db.session.rollback()
+            self._invalidate_cache(room_number)
+            logger.warning(f"Concurrent update on room {room_number} (v{version}), event append rejected")
+            raise RoomStateError("操作冲突，请重试") from e
+        except Exception:
+            db.session.rollback()
+            raise
+
+        # The commit expired both objects; put back what we just wrote so reads don't reload them
+        self._keep_loaded(gs, {**state, "log_seq": new_head} if snapshot else state)
+        self._keep_loaded(room, {"version": version + 1, "status": status, "game_state": gs})
+        self._set_folded(gs, new_head, state)
+        self._invalidate_cache(room_number)
+        logger.debug(f"Room {room_number}: appended {[kind.value for kind, _ in events]} up to seq {new_head}")
+        return state
+
+    def snapshot(self, room: Room) -> dict[str, Any]:
+        """Writes a snapshot at the current head and compacts the log without appending anything."""
+        return self.append_events(room, [], snapshot=True)
+
+    def start_log(self, room: Room, kind: GameEventType, payload: dict) -> dict[str, Any]:
+        """Starts a new game log: drops the previous game's log and appends the first event as a snapshot."""
+        db.session.execute(delete(GameEvent).where(GameEvent.room_id == room.id))
+        db.session.execute(
+            update(GameState).where(GameState.room_id == room.id).values(log_archive=None).execution_options(synchronize_session=False)
+        )
+        self._set_folded(room.game_state, 0, self._state_of(room.game_state))
+        return self.append_events(room, [(kind, payload)], snapshot=True)
+
+    def load_events(self, room_id: int, after_seq: int = 0) -> list[dict[str, Any]]:
+        rows = (
+            db.session.query(GameEvent.seq, GameEvent.event_type, GameEvent.payload, GameEvent.created_at)
+            .filter(GameEvent.room_id == room_id, GameEvent.seq > after_seq)
+            .order_by(GameEvent.seq)
+            .all()
+        )
+        return [{"seq": r.seq, "type": r.event_type, "payload": r.payload, "ts": r.created_at} for r in rows]
+
+    def load_full_log(self, room_id: int) -> list[dict[str, Any]]:
+        """The whole log of the current game: the compacted part followed by the live tail."""
+        archived = db.session.query(GameState.log_archive).filter(GameState.room_id == room_id).scalar()
+        return (decode_log(archived) if archived else []) + self.load_events(room_id)
+
+    def _compact(self, room_id: int) -> bytes:
+        """
+        Moves every remaining event row of the room into the compressed archive (called while
+        writing a snapshot at the head, inside the same transaction) and returns the new archive.
+        """
+        events = self.load_full_log(room_id)
+        db.session.execute(delete(GameEvent).where(GameEvent.room_id == room_id))
+        return encode_log(events)
+
+    def _fold_tails(self, rooms: list[Room]) -> None:
+        """
+        Brings each in-memory GameState up to the head of its log with one query for all rooms:
+        events after the last folded seq, or after the stored snapshot (log_seq) for a freshly loaded state.
+        """
+        pending = {r.id: r for r in rooms if r.status == "PLAYING" and r.game_state is not None}
+        if not pending:
+            return
+
+        rows = (
+            db.session.query(GameEvent.room_id, GameEvent.seq, GameEvent.event_type, GameEvent.payload, GameEvent.created_at)
+            .join(GameState, GameState.room_id == GameEvent.room_id)
+            .filter(GameEvent.room_id.in_(list(pending)), GameEvent.seq > func.coalesce(GameState.log_seq, 0))
+            .order_by(GameEvent.room_id, GameEvent.seq)
+            .all()
+        )
+        tails = defaultdict(list)
+        for row in rows:
+            tails[row.room_id].append(row)
+
+        for room_id, room in pending.items():
+            gs = room.game_state
+            folded = gs.__dict__.get(FOLDED_ATTR)
+            head = folded[0] if folded else (gs.log_seq or 0)
+            tail = [row for row in tails[room_id] if row.seq > head]
+            if folded and not tail:
+                continue
+
+            state = self._state_of(gs)
+            for row in tail:
+                state, head = fold(state, row.event_type, row.payload, row.created_at), row.seq
+            if tail:
+                self._keep_loaded(gs, state)
+            self._set_folded(gs, head, state)
+
+    @staticmethod
+    def _state_of(game_state: GameState) -> dict[str, Any]:
+        return {field: getattr(game_state, field) for field in STATE_FIELDS}
+
+    @staticmethod
+    def _set_folded(game_state: GameState, head: int, state: dict[str, Any]) -> None:
+        game_state.__dict__[FOLDED_ATTR] = (head, copy.deepcopy(state))
+
+    @staticmethod
+    def _keep_loaded(obj, values: dict[str, Any]) -> None:
+        if inspect(obj).persistent:
+            for key, value in values.items():
+                set_committed_value(obj, key, value)
+        else:
+            for key, value in values.items():
+                setattr(obj, key, value)
+
+    def _invalidate_cache(self, room_number: str) -> None:
+        try:
+            redis_manager.client.delete(f"{self.CACHE_PREFIX}{room_number}")
+        except Exception as e:
+            logger.warning(f"Failed to invalidate cache for room {room_number}: {e}")
+
     def _serialize_room(self, room: Room) -> dict[str, Any]:
         """Serialize Room object to dict for Redis storage."""
         room_data = {
@@ -113,6 +438,7 @@ class RoomRepository:
             "created_at": room.created_at.isoformat() if room.created_at else None,
             "updated_at": room.updated_at.isoformat() if room.updated_at else None,
             "version": room.version,
+            "options": room.options,
         }
 
         # Serialize GameState if exists
@@ -130,15 +456,21 @@ class RoomRepository:
                 "players": room.game_state.players,
                 "votes": room.game_state.votes,
                 "quest_votes": room.game_state.quest_votes,
+                "seat_of": room.game_state.seat_of,
+                "night_info": room.game_state.night_info,
+                "phase_start_time": room.game_state.phase_start_time.isoformat() if room.game_state.phase_start_time else None,
+                "timeout_seconds": room.game_state.timeout_seconds,
+                "log_seq": room.game_state.log_seq,
             }
+            folded = room.game_state.__dict__.get(FOLDED_ATTR)
+            if folded:
+                room_data["game_state"]["log_head"] = folded[0]
 
         return room_data
 
     def _deserialize_room(self, cached_data: str) -> Room | None:
         """Deserialize cached JSON dict back to Room object."""
         try:
-            from datetime import datetime
-
             data = json_loads(cached_data)
             if not data:
                 return None
@@ -150,6 +482,7 @@ class RoomRepository:
                 owner_id=data.get("owner_id"),
                 status=data.get("status"),
                 version=data.get("version", 1),
+                options=data.get("options"),
             )
 
             # Parse datetime fields
@@ -174,7 +507,15 @@ class RoomRepository:
                     players=game_state_data.get("players", []),
                     votes=game_state_data.get("votes", {}),
                     quest_votes=game_state_data.get("quest_votes", []),
+                    seat_of=game_state_data.get("seat_of"),
+                    night_info=game_state_data.get("night_info"),
+                    timeout_seconds=game_state_data.get("timeout_seconds", 60),
+                    log_seq=game_state_data.get("log_seq", 0),
                 )
+                if game_state_data.get("phase_start_time"):
+                    game_state.phase_start_time = datetime.fromisoformat(game_state_data["phase_start_time"])
+                # The cached state is already folded up to log_head
+                self._set_folded(game_state, game_state_data.get("log_head", game_state.log_seq or 0), self._state_of(game_state))
                 room.game_state = game_state
 
             return room
@@ -1,5 +1,10 @@
+from sqlalchemy import case, func
+
 from src.app_factory import db
+from src.extensions.redis_ext import redis_manager
+from src.fsm.avalon_fsm import AvalonFSM
 from src.models.sql_models import Room, User
+from src.utils import metrics
 from src.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -14,20 +19,86 @@ class UserRepository:
 
     CACHE_PREFIX = "cache:user:"
     CACHE_TTL = 86400  # 24 hours
+    # openid -> room_number of the user's current room, kept on join and leave so the rate limiter
+    # can key room buckets without a MySQL lookup
+    ROOM_KEY_PREFIX = "user:room:"
 
     def get_by_openid(self, openid: str) -> User | None:
         # Implementation of cache-aside for User
         user = User.query.filter_by(openid=openid).first()
         return user
 
+    def get_many(self, openids: list[str]) -> dict[str, User]:
+        """Loads several users with one IN query, keyed by openid."""
+        if not openids:
+            return {}
+        users = User.query.filter(User.openid.in_(set(openids))).all()
+        return {u.openid: u for u in users}
+
+    def get_nicknames(self, openids: list[str]) -> dict[str, str | None]:
+        """
+        Nicknames of several users: one MGET on the per-user cache, then one IN query for the misses.
+        Users without a nickname are cached as "" so they do not miss every time.
+        """
+        if not openids:
+            return {}
+        found: dict[str, str] = {}
+        try:
+            cached = redis_manager.client.mget([f"{self.CACHE_PREFIX}{openid}:nickname" for openid in openids])
+            found = {openid: value for openid, value in zip(openids, cached, strict=False) if value is not None}
+        except Exception as e:
+            logger.warning(f"Nickname cache read failed: {e}")
+
+        missing = [openid for openid in openids if openid not in found]
+        metrics.cache_lookup("nickname", hits=len(openids) - len(missing), misses=len(missing))
+        if missing:
+            rows = db.session.query(User.openid, User.nickname).filter(User.openid.in_(set(missing))).all()
+            loaded = {row.openid: row.nickname or "" for row in rows}
+            found.update(loaded)
+            try:
+                pipe = redis_manager.client.pipeline(transaction=False)
+                for openid, nickname in loaded.items():
+                    pipe.set(f"{self.CACHE_PREFIX}{openid}:nickname", nickname, ex=self.CACHE_TTL)
+                pipe.execute()
+            except Exception as e:
+                logger.warning(f"Nickname cache write failed: {e}")
+
+        return {openid: found.get(openid) or None for openid in openids}
+
     def get_current_room(self, openid: str) -> Room | None:
         user = self.get_by_openid(openid)
         if user and user.current_room_id:
-            from src.models.sql_models import Room
+            from src.repositories.room_repository import room_repo
 
-            return Room.query.get(user.current_room_id)
+            return room_repo.get_by_id(user.current_room_id)
         return None
 
+    def room_key(self, openid: str) -> str:
+        return f"{self.ROOM_KEY_PREFIX}{openid}"
+
+    def remember_room(self, openid: str, room_number: str) -> None:
+        try:
+            redis_manager.client.set(self.room_key(openid), room_number, ex=self.CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"Failed to record current room of {openid}: {e}")
+
+    def forget_rooms(self, openids: list[str]) -> None:
+        if not openids:
+            return
+        try:
+            redis_manager.client.delete(*[self.room_key(openid) for openid in openids])
+        except Exception as e:
+            logger.warning(f"Failed to clear current room of {len(openids)} users: {e}")
+
+    def get_cached_room_number(self, openid: str) -> str | None:
+        """Room number from Redis only (None when unknown); raises if Redis is unavailable."""
+        return redis_manager.client.get(self.room_key(openid))
+
+    def get_current_room_version(self, openid: str) -> tuple[str, int] | None:
+        """(room_number, version) of the user's current room with one light query, without loading the room."""
+        row = db.session.query(Room.room_number, Room.version).join(User, User.current_room_id == Room.id).filter(User.openid == openid).first()
+        return (row.room_number, row.version or 1) if row else None
+
     def create_or_update(self, openid: str, nickname: str | None = None) -> User:
         user = self.get_by_openid(openid)
         if not user:
@@ -39,12 +110,61 @@ class UserRepository:
 
         try:
             db.session.commit()
-            # Invalidate cache if implemented for users
+            if nickname:
+                self._invalidate_nickname(openid)
             return user
         except Exception as e:
             db.session.rollback()
             logger.error(f"Error saving user {openid}: {e}")
             raise
 
+    @staticmethod
+    def counter_increments(roles: dict[str, str], winner_team: str) -> dict[str, list[str]]:
+        """
+        Maps each User counter column to the openids that gain +1 for a finished game.
+        Shared by the incremental update and the reconcile job so both count the same way.
+        """
+        increments: dict[str, list[str]] = {}
+        for openid, role in roles.items():
+            team = AvalonFSM.get_team(role)
+            columns = ["total_games", f"games_{team.lower()}"]
+            if role:
+                columns.append(f"games_as_{role.lower()}")
+            if team == winner_team:
+                columns.append(f"wins_{team.lower()}")
+                if role:
+                    columns.append(f"wins_as_{role.lower()}")
+            for column in columns:
+                if hasattr(User, column):
+                    increments.setdefault(column, []).append(openid)
+        return increments
+
+    def apply_game_result(self, roles: dict[str, str], winner_team: str) -> int:
+        """
+        Increments the counters of every participant with a single bulk UPDATE.
+        Does not commit: the caller commits it together with the GameHistory row.
+        """
+        if not roles:
+            return 0
+
+        values = {}
+        for column, openids in self.counter_increments(roles, winner_team).items():
+            attr = getattr(User, column)
+            if len(openids) == len(roles):
+                delta = 1
+            else:
+                delta = case((User.openid.in_(openids), 1), else_=0)
+            values[attr] = func.coalesce(attr, 0) + delta
+
+        updated = User.query.filter(User.openid.in_(list(roles))).update(values, synchronize_session=False)
+        logger.debug(f"Incremented game counters for {updated} users (winner: {winner_team})")
+        return updated
+
+    def _invalidate_nickname(self, openid: str) -> None:
+        try:
+            redis_manager.client.delete(f"{self.CACHE_PREFIX}{openid}:nickname")
+        except Exception as e:
+            logger.warning(f"Failed to invalidate nickname cache for {openid}: {e}")
+
 
 user_repo = UserRepository()
@@ -0,0 +1,235 @@
+"""
+对局归档服务
+结束对局的请求把归档事件写入 archive_outbox（与对局结束同一事务），提交后投递到 Redis Stream，
+由后台消费者批量写入 GameHistory 并更新派生统计
+"""
+
+import base64
+import os
+import socket
+import time
+import uuid
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import delete, insert
+
+from src.app_factory import db
+from src.config.settings import settings
+from src.extensions.redis_ext import redis_manager
+from src.fsm.game_log import encode_log
+from src.models.sql_models import ArchiveOutbox, GameHistory
+from src.repositories.room_repository import room_repo
+from src.repositories.user_repository import user_repo
+from src.services.leaderboard_service import leaderboard_service
+from src.utils.json_utils import json_dumps, json_loads
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class ArchiveService:
+    """
+    Redis Stream + 消费者组实现的持久化归档队列
+    - 幂等: 每个事件带 archive_key，GameHistory.archive_key 唯一，重复投递直接跳过
+    - 重试: 处理失败的事件不 ACK，空闲超过 RETRY_IDLE_MS 后被 XAUTOCLAIM 重新领取
+    - 死信: 投递次数达到 MAX_DELIVERIES 的事件转入死信流，避免阻塞队列
+    - 不丢: 事件先与对局结束在同一事务中写入 archive_outbox，入队失败或进程崩溃时由 sweep 补归档
+    """
+
+    STREAM_KEY = "stream:game_archive"
+    DEAD_LETTER_KEY = "stream:game_archive:dead"
+    GROUP = "archivers"
+    STREAM_MAXLEN = 100000
+    BATCH_SIZE = 50
+    BLOCK_MS = 5000
+    RETRY_IDLE_MS = 60000
+    MAX_DELIVERIES = 5
+    OUTBOX_GRACE_SECONDS = 300  # 超过此时间仍在 outbox 中的事件由 sweep 直接归档（重复投递按 archive_key 跳过）
+    SWEEP_INTERVAL_SECONDS = 60
+
+    def __init__(self):
+        self.consumer_name = f"{socket.gethostname()}-{os.getpid()}"
+        self._group_ready = False
+
+    def stage(self, room, state: dict, winner_team: str) -> dict:
+        """
+        生成归档事件并写入 archive_outbox（不提交）：在结束对局的最后一步的事务中调用（RoomRepository.append_events 的
+        before_commit），对局结束与待归档记录一起提交或回滚。archive_key 随记录持久化，重试归档不会重复计分
+        """
+        event = {
+            "archive_key": uuid.uuid4().hex,
+            "room_number": str(room.room_number),
+            "start_time": room.created_at,
+            "end_time": datetime.now(UTC).replace(tzinfo=None),
+            "winner_team": winner_team,
+            "players": list(state["players"] or []),
+            "roles": dict(state["roles_config"] or {}),
+            "quest_results": list(state["quest_results"] or []),
+            # 完整事件日志随事件一起入队（压缩后 base64）；同一事务中读取，包含本次追加的事件
+            "replay_log": base64.b64encode(encode_log(room_repo.load_full_log(room.id))).decode(),
+        }
+        event = json_loads(json_dumps(event))
+        db.session.add(ArchiveOutbox(archive_key=event["archive_key"], payload=event))
+        return event
+
+    def emit(self, event: dict) -> None:
+        """
+        提交后投递已写入 archive_outbox 的事件：入队，队列不可用时同步归档
+        尽力而为：失败只记日志，对局结束已经提交，事件留在 outbox 中由 sweep 补归档
+        """
+        try:
+            if settings.ARCHIVE_ASYNC:
+                try:
+                    redis_manager.client.xadd(self.STREAM_KEY, {"data": json_dumps(event)}, maxlen=self.STREAM_MAXLEN, approximate=True)
+                    logger.info(f"Queued archive {event['archive_key']} for room {event['room_number']}")
+                    return
+                except Exception as e:
+                    logger.warning(f"Failed to queue archive for room {event['room_number']}: {e}, archiving inline")
+            self.process([event])
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Archive {event['archive_key']} of room {event['room_number']} failed, left in the outbox: {e}", exc_info=True)
+
+    def sweep(self, older_than_seconds: int = OUTBOX_GRACE_SECONDS) -> int:
+        """归档在 outbox 中停留超过 older_than_seconds 的事件（投递失败或队列积压），返回新归档的对局数"""
+        threshold = datetime.now(UTC).replace(tzinfo=None) - timedelta(seconds=older_than_seconds)
+        rows = ArchiveOutbox.query.filter(ArchiveOutbox.created_at < threshold).order_by(ArchiveOutbox.id).limit(self.BATCH_SIZE).all()
+        if not rows:
+            return 0
+        logger.warning(f"Sweeping {len(rows)} pending archives from the outbox")
+        return self.process([row.payload for row in rows])
+
+    def process(self, events: list[dict]) -> int:
+        """
+        批量归档：一次 INSERT 写入所有新的 GameHistory，与计数器更新在同一事务中提交
+        Returns:
+            int: 本次新归档的对局数（已归档过的事件被跳过）
+        """
+        unique = {e["archive_key"]: e for e in events}
+        existing = {key for (key,) in db.session.query(GameHistory.archive_key).filter(GameHistory.archive_key.in_(list(unique))).all()}
+        new_events = [e for key, e in unique.items() if key not in existing]
+        if not new_events:
+            self._clear_outbox(list(unique))
+            db.session.commit()
+            return 0
+
+        try:
+            # 已归档的事件不再待处理（与 GameHistory 同一事务）
+            self._clear_outbox(list(unique))
+            db.session.execute(
+                insert(GameHistory),
+                [
+                    {
+                        "archive_key": e["archive_key"],
+                        "room_id": e["room_number"],
+                        "start_time": self._parse_time(e.get("start_time")),
+                        "end_time": self._parse_time(e.get("end_time")),
+                        "winner_team": e["winner_team"],
+                        "players": e["players"],
+                        "replay_data": {"roles": e["roles"], "quest_results": e["quest_results"]},
+                        "replay_log": base64.b64decode(e["replay_log"]) if e.get("replay_log") else None,
+                    }
+                    for e in new_events
+                ],
+            )
+            for e in new_events:
+                user_repo.apply_game_result(e["roles"], e["winner_team"])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        # 派生数据在提交后用最新计数器刷新（幂等，可重复执行）
+        openids = {openid for e in new_events for openid in e["roles"]}
+        users = list(user_repo.get_many(list(openids)).values())
+        leaderboard_service.update_users(users)
+
+        from src.services.game_service import game_service
+
+        # Everyone checks /profile right after a game ends, so render it for them now
+        game_service.prewarm_profiles(users)
+
+        logger.info(f"Archived {len(new_events)} games ({len(existing)} duplicates skipped)")
+        return len(new_events)
+
+    def consume(self, block_ms: int = BLOCK_MS) -> int:
+        """领取一批事件（先重试超时未 ACK 的，再读新事件）并归档，返回处理的事件数"""
+        client = redis_manager.client
+        self._ensure_group()
+
+        _, entries, *_ = client.xautoclaim(self.STREAM_KEY, self.GROUP, self.consumer_name, min_idle_time=self.RETRY_IDLE_MS, count=self.BATCH_SIZE)
+        if not entries:
+            response = redis_manager.blocking_client.xreadgroup(
+                self.GROUP, self.consumer_name, {self.STREAM_KEY: ">"}, count=self.BATCH_SIZE, block=block_ms
+            )
+            entries = response[0][1] if response else []
+        entries = [(entry_id, fields) for entry_id, fields in entries if fields]
+        if not entries:
+            return 0
+
+        try:
+            self.process([json_loads(fields["data"]) for _, fields in entries])
+            client.xack(self.STREAM_KEY, self.GROUP, *[entry_id for entry_id, _ in entries])
+            return len(entries)
+        except Exception as e:
+            logger.warning(f"Batch archive of {len(entries)} events failed: {e}, retrying one by one")
+
+        # 逐条重试，隔离出有问题的事件；失败的保持未 ACK，等待下次 XAUTOCLAIM
+        failed = []
+        for entry_id, fields in entries:
+            try:
+                self.process([json_loads(fields["data"])])
+                client.xack(self.STREAM_KEY, self.GROUP, entry_id)
+            except Exception as e:
+                logger.error(f"Failed to archive event {entry_id}, will retry: {e}", exc_info=True)
+                failed.append((entry_id, fields))
+        if failed:
+            self._dead_letter_exhausted(failed)
+        return len(entries)
+
+    def run_worker(self):
+        """后台消费循环（在 app context 中运行），每 SWEEP_INTERVAL_SECONDS 秒顺带清扫一次 outbox"""
+        logger.info(f"Archive worker {self.consumer_name} started")
+        next_sweep = 0.0
+        while True:
+            try:
+                if time.monotonic() >= next_sweep:
+                    next_sweep = time.monotonic() + self.SWEEP_INTERVAL_SECONDS
+                    self.sweep()
+                self.consume()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Error in archive worker: {e}")
+                time.sleep(1)
+
+    @staticmethod
+    def _clear_outbox(keys: list[str]) -> None:
+        db.session.execute(delete(ArchiveOutbox).where(ArchiveOutbox.archive_key.in_(keys)).execution_options(synchronize_session=False))
+
+    def _ensure_group(self):
+        if self._group_ready:
+            return
+        try:
+            redis_manager.client.xgroup_create(self.STREAM_KEY, self.GROUP, id="0", mkstream=True)
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_ready = True
+
+    def _dead_letter_exhausted(self, entries):
+        client = redis_manager.client
+        for entry_id, fields in entries:
+            pending = client.xpending_range(self.STREAM_KEY, self.GROUP, min=entry_id, max=entry_id, count=1)
+            deliveries = pending[0]["times_delivered"] if pending else 0
+            if deliveries >= self.MAX_DELIVERIES:
+                client.xadd(self.DEAD_LETTER_KEY, fields)
+                client.xack(self.STREAM_KEY, self.GROUP, entry_id)
+                logger.error(f"Archive event {entry_id} moved to dead letter after {deliveries} deliveries")
+
+    @staticmethod
+    def _parse_time(value):
+        return datetime.fromisoformat(value) if value else None
+
+
+# Singleton
+archive_service = ArchiveService()
@@ -1,14 +1,38 @@
 """定时清理服务 - 自动清理过期房间"""
 
+import time
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
 from datetime import UTC, datetime, timedelta
 
-from src.models.sql_models import Room, User
+from sqlalchemy import and_, not_, or_
+from sqlalchemy.orm import Query
+
+from src.app_factory import db
+from src.config.settings import settings
+from src.extensions.redis_ext import redis_manager
+from src.models.sql_models import GameState, Room, User
 from src.repositories.room_repository import room_repo
+from src.services.room_gauge_service import room_gauge_service
 from src.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
 
+@dataclass(frozen=True)
+class CleanupPass:
+    """一条清理策略：候选查询（列元组，按 Room.id 分页）与逐行的附加条件"""
+
+    name: str  # CLEANUP_POLICIES 中的键
+    query: Query
+    keep: Callable | None = None
+
+    @property
+    def category(self) -> str:
+        """清理统计中的分类：ENDED / WAITING / PLAYING / ORPHANED"""
+        return self.name.split("_")[0]
+
+
 class CleanupService:
     """房间清理服务，根据不同状态和活跃度清理过期房间"""
 
@@ -20,13 +44,29 @@ class CleanupService:
         "PLAYING_STALLED": 72,  # 游戏中异常长时间：3天后清理 (可能是卡住的房间)
         "ORPHANED": 0,  # 孤儿房间（无玩家）：立即清理
     }
+    ORPHAN_GRACE_MINUTES = 5  # 孤儿房间至少这么久没有更新才清理，避免误删刚创建的房间
+
+    # 清理结果（清理在 CronJob 进程中执行，/metrics 从 Redis 读取）
+    LAST_RESULT_KEY = "stats:cleanup:last"  # 最近一次: {分类: 数量, "finished_at": 时间戳}
+    TOTALS_KEY = "stats:cleanup:total"  # 累计: {分类: 数量}
 
-    def cleanup_expired_rooms(self) -> dict[str, int]:
+    # 中断续跑：每一批处理完后记下该策略扫描到的房间 id，下次从这里继续；策略跑完时删除
+    CHECKPOINT_KEY = "cleanup:checkpoint"  # {策略名: 最后处理的房间 id}
+    CHECKPOINT_TTL = 24 * 3600  # 过期的断点不再使用，避免长期跳过前面的房间
+
+    def cleanup_expired_rooms(self, batch_size: int | None = None, sleep_seconds: float | None = None, resume: bool = True) -> dict[str, int]:
         """
         清理所有过期房间，返回清理统计
+        每条策略按房间 id 分批（keyset 分页）流式扫描候选房间，每批删除后单独提交
+        Args:
+            batch_size: 每批扫描的房间数，默认 settings.CLEANUP_BATCH_SIZE
+            sleep_seconds: 批与批之间的停顿，减轻对数据库的持续压力，默认 settings.CLEANUP_BATCH_SLEEP_SECONDS
+            resume: 从上次中断处继续；False 时丢弃断点从头扫描
         Returns:
             Dict[str, int]: 按状态分类的清理数量
         """
+        batch_size = batch_size or settings.CLEANUP_BATCH_SIZE
+        sleep_seconds = settings.CLEANUP_BATCH_SLEEP_SECONDS if sleep_seconds is None else sleep_seconds
         stats = {
             "total": 0,
             "ENDED": 0,
@@ -36,141 +76,213 @@ class CleanupService:
         }
 
         try:
-            # 1. 清理已结束超过7天的房间
-            ended_count = self._cleanup_ended_rooms()
-            stats["ENDED"] = ended_count
-            stats["total"] += ended_count
-
-            # 2. 清理等待中的房间（无玩家或长时间未开始）
-            waiting_count = self._cleanup_waiting_rooms()
-            stats["WAITING"] = waiting_count
-            stats["total"] += waiting_count
-
-            # 3. 清理异常的游戏中房间（超过3天未更新）
-            playing_count = self._cleanup_stalled_playing_rooms()
-            stats["PLAYING"] = playing_count
-            stats["total"] += playing_count
-
-            # 4. 清理孤儿房间（无玩家关联的房间）
-            orphaned_count = self._cleanup_orphaned_rooms()
-            stats["ORPHANED"] = orphaned_count
-            stats["total"] += orphaned_count
+            if not resume:
+                self._clear_checkpoint()
+            for cleanup_pass in self.passes():
+                count = self._run_pass(cleanup_pass, batch_size, sleep_seconds)
+                stats[cleanup_pass.category] += count
+                stats["total"] += count
 
             logger.info(f"Cleanup completed: {stats}")
+            self._record_result(stats)
             return stats
 
         except Exception as e:
             logger.error(f"Error during cleanup: {e}", exc_info=True)
             raise
 
-    def _cleanup_ended_rooms(self) -> int:
-        """清理已结束超过7天的房间"""
-        threshold = datetime.now(UTC).replace(tzinfo=None) - timedelta(hours=self.CLEANUP_POLICIES["ENDED"])
-        rooms = Room.query.filter(Room.status == "ENDED", Room.updated_at < threshold).all()
-
-        count = 0
-        for room in rooms:
-            if self._delete_room_safely(room):
-                count += 1
-
-        if count > 0:
-            logger.info(f"Cleaned {count} ENDED rooms (updated before {threshold})")
-
-        return count
-
-    def _cleanup_waiting_rooms(self) -> int:
-        """清理等待状态的房间（无玩家或长时间未开始）"""
-        count = 0
-        now = datetime.now(UTC).replace(tzinfo=None)
-
-        # 获取所有等待中的房间
-        rooms = Room.query.filter_by(status="WAITING").all()
-
-        for room in rooms:
-            # 检查是否有玩家
-            players = room.game_state.players if room.game_state else []
-
-            if not players or len(players) == 0:
-                # 无玩家房间：1小时后清理
-                threshold = now - timedelta(hours=self.CLEANUP_POLICIES["WAITING_EMPTY"])
-                if room.updated_at < threshold:
-                    if self._delete_room_safely(room):
-                        count += 1
-                        logger.debug(f"Cleaned empty WAITING room {room.room_number}")
-            else:
-                # 有玩家但长时间未开始：24小时后清理
-                threshold = now - timedelta(hours=self.CLEANUP_POLICIES["WAITING_STALLED"])
-                if room.updated_at < threshold:
-                    if self._delete_room_safely(room):
-                        count += 1
-                        logger.debug(f"Cleaned stalled WAITING room {room.room_number} with {len(players)} players")
-
-        if count > 0:
-            logger.info(f"Cleaned {count} WAITING rooms")
-
-        return count
-
-    def _cleanup_stalled_playing_rooms(self) -> int:
-        """清理异常长时间未更新的游戏中房间"""
-        threshold = datetime.now(UTC).replace(tzinfo=None) - timedelta(hours=self.CLEANUP_POLICIES["PLAYING_STALLED"])
-        rooms = Room.query.filter(Room.status == "PLAYING", Room.updated_at < threshold).all()
+    def passes(self, now: datetime | None = None) -> list[CleanupPass]:
+        """
+        每条 CLEANUP_POLICIES 策略一个候选查询，按执行顺序排列
+        各策略互不重叠：孤儿房间排除了前面策略已经覆盖的房间，每个房间至多归入一条策略
+        """
+        now = now or datetime.now(UTC).replace(tzinfo=None)
+        policies = self.CLEANUP_POLICIES
+        ended = and_(Room.status == "ENDED", Room.updated_at < now - timedelta(hours=policies["ENDED"]))
+        # 有玩家但长时间未开始：24小时后清理（不论有无玩家）
+        stalled_at = now - timedelta(hours=policies["WAITING_STALLED"])
+        waiting_stalled = and_(Room.status == "WAITING", Room.updated_at < stalled_at)
+        # 无玩家房间：1小时后清理；玩家列表是 JSON，逐行判断
+        empty_at = now - timedelta(hours=policies["WAITING_EMPTY"])
+        waiting_empty = and_(Room.status == "WAITING", Room.updated_at >= stalled_at, Room.updated_at < empty_at)
+        # 确保房间没有活动（没有超时正在处理）
+        playing_stalled = and_(
+            Room.status == "PLAYING", Room.updated_at < now - timedelta(hours=policies["PLAYING_STALLED"]), GameState.phase.isnot(None)
+        )
+        # 孤儿房间至少 ORPHAN_GRACE_MINUTES 分钟没有更新（避免误删刚创建的房间）
+        orphaned_at = now - timedelta(hours=policies["ORPHANED"], minutes=self.ORPHAN_GRACE_MINUTES)
+
+        def no_players(row) -> bool:
+            return not row.players
+
+        def not_waiting_empty(row) -> bool:
+            return not (row.status == "WAITING" and stalled_at <= row.updated_at < empty_at and not row.players)
+
+        return [
+            CleanupPass("ENDED", self._candidates(ended)),
+            CleanupPass("WAITING_EMPTY", self._candidates(waiting_empty), no_players),
+            CleanupPass("WAITING_STALLED", self._candidates(waiting_stalled)),
+            CleanupPass("PLAYING_STALLED", self._candidates(playing_stalled)),
+            CleanupPass("ORPHANED", self._orphaned(orphaned_at).filter(not_(or_(ended, waiting_stalled, playing_stalled))), not_waiting_empty),
+        ]
+
+    @staticmethod
+    def _candidates(*conditions):
+        """列元组而不是 ORM 对象：候选行不进入 identity map"""
+        return (
+            db.session.query(Room.id, Room.room_number, Room.status, GameState.phase, GameState.players, Room.updated_at)
+            .outerjoin(GameState, GameState.room_id == Room.id)
+            .filter(*conditions)
+        )
+
+    def _orphaned(self, threshold: datetime):
+        """rooms LEFT JOIN users ... WHERE users.id IS NULL：没有任何玩家的当前房间指向它"""
+        return self._candidates(User.id.is_(None), Room.updated_at < threshold).outerjoin(User, User.current_room_id == Room.id)
+
+    def stream(self, cleanup_pass: CleanupPass, batch_size: int, after_id: int = 0) -> Iterator[tuple[int, list]]:
+        """按 id 升序分批产出 (本批最大 id, 本批需要删除的行)；每批一条带 LIMIT 的查询"""
+        last_id = after_id
+        while True:
+            rows = cleanup_pass.query.filter(Room.id > last_id).order_by(Room.id).limit(batch_size).all()
+            if not rows:
+                return
+            last_id = rows[-1].id
+            yield last_id, [row for row in rows if cleanup_pass.keep is None or cleanup_pass.keep(row)]
+            if len(rows) < batch_size:
+                return
+
+    def _run_pass(self, cleanup_pass: CleanupPass, batch_size: int, sleep_seconds: float) -> int:
+        after_id = self._load_checkpoint(cleanup_pass.name)
+        if after_id:
+            logger.info(f"Resuming {cleanup_pass.name} cleanup after room id {after_id}")
 
         count = 0
-        for room in rooms:
-            # 确保房间没有活动（没有超时正在处理）
-            if room.game_state and room.game_state.phase:
-                if self._delete_room_safely(room):
-                    count += 1
-                    logger.warning(
-                        f"Cleaned stalled PLAYING room {room.room_number} (phase: {room.game_state.phase}, last_update: {room.updated_at})"
-                    )
+        first = True
+        for last_id, rows in self.stream(cleanup_pass, batch_size, after_id):
+            if not first and sleep_seconds > 0:
+                time.sleep(sleep_seconds)
+            first = False
+            count += self._delete_rooms(rows)
+            self._save_checkpoint(cleanup_pass.name, last_id)
+            logger.debug(f"{cleanup_pass.name}: scanned up to room id {last_id}, deleted {len(rows)}")
+        self._clear_checkpoint(cleanup_pass.name)
 
         if count > 0:
-            logger.info(f"Cleaned {count} stalled PLAYING rooms")
-
+            logger.info(f"Cleaned {count} rooms by policy {cleanup_pass.name}")
         return count
 
-    def _cleanup_orphaned_rooms(self) -> int:
-        """清理孤儿房间（没有玩家关联的房间）"""
-        # 查找所有房间
-        all_rooms = Room.query.all()
-        count = 0
-
-        for room in all_rooms:
-            # 检查是否有玩家在这个房间
-            player_count = User.query.filter_by(current_room_id=room.id).count()
-
-            # 如果没有玩家，且不是刚刚创建的（避免误删）
-            if player_count == 0:
-                threshold = datetime.now(UTC).replace(tzinfo=None) - timedelta(minutes=5)
-                if room.updated_at < threshold:
-                    if self._delete_room_safely(room):
-                        count += 1
-                        logger.debug(f"Cleaned orphaned room {room.room_number}")
+    def _delete_rooms(self, rows: list) -> int:
+        """一批房间一次提交（room_repo.delete_many）；失败时跳过该批（下次运行时重新匹配），返回删除数"""
+        if not rows:
+            return 0
+        try:
+            cleared = room_repo.delete_many([row.id for row in rows], [row.room_number for row in rows])
+        except Exception as e:
+            logger.error(f"Failed to delete rooms {[row.room_number for row in rows]}: {e}")
+            return 0
+        room_gauge_service.rooms_deleted([(row.status, row.phase) for row in rows], cleared)
+        return len(rows)
 
-        if count > 0:
-            logger.info(f"Cleaned {count} orphaned rooms")
+    def _load_checkpoint(self, name: str) -> int:
+        try:
+            return int(redis_manager.client.hget(self.CHECKPOINT_KEY, name) or 0)
+        except Exception as e:
+            logger.warning(f"Failed to read cleanup checkpoint, scanning {name} from the start: {e}")
+            return 0
 
-        return count
+    def _save_checkpoint(self, name: str, last_id: int) -> None:
+        try:
+            pipe = redis_manager.client.pipeline(transaction=False)
+            pipe.hset(self.CHECKPOINT_KEY, name, last_id)
+            pipe.expire(self.CHECKPOINT_KEY, self.CHECKPOINT_TTL)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to save cleanup checkpoint {name}={last_id}: {e}")
 
-    def _delete_room_safely(self, room: Room) -> bool:
-        """安全删除房间，处理外键关联"""
+    def _clear_checkpoint(self, name: str | None = None) -> None:
         try:
-            # 1. 清理关联的用户的 current_room_id
-            User.query.filter_by(current_room_id=room.id).update({"current_room_id": None})
+            if name is None:
+                redis_manager.client.delete(self.CHECKPOINT_KEY)
+            else:
+                redis_manager.client.hdel(self.CHECKPOINT_KEY, name)
+        except Exception as e:
+            logger.warning(f"Failed to clear cleanup checkpoint: {e}")
 
-            # 2. 删除房间（cascade会删除关联的game_state）
-            room_repo.delete(room)
+    # 模拟运行时估算可释放空间用的平均行长（字节）；MySQL 上改用表统计信息中的 AVG_ROW_LENGTH
+    DEFAULT_ROW_BYTES = {"rooms": 256, "game_states": 2048, "game_events": 256}
+    PLAN_FIELDS = ("rooms", "game_states", "game_events", "users", "bytes")
 
-            logger.debug(f"Successfully deleted room {room.room_number}")
-            return True
+    def plan(self, batch_size: int | None = None, samples: int = 10, list_rooms: bool = False) -> Iterator[dict]:
+        """
+        模拟运行：用与实际清理相同的候选查询（passes / stream）逐条评估清理策略，不删除，也不读写断点
+        逐条产出记录，调用方边产出边输出；内存中只保留计数与示例房间号：
+          {"type": "rooms", "policy", "rooms": [...]}  每批一条待删除的房间号，仅 list_rooms 时产出
+          {"type": "policy", "policy", "category", "threshold_hours", "rooms", "game_states", "game_events", "users", "bytes", "samples"}
+          {"type": "total", "rooms", "game_states", "game_events", "users", "bytes", "bytes_source"}
+        users 是会被移出房间的用户数（只更新不删除，不计入 bytes）
+        """
+        batch_size = batch_size or settings.CLEANUP_BATCH_SIZE
+        row_bytes, bytes_source = self._row_bytes()
+        total = {"type": "total", **dict.fromkeys(self.PLAN_FIELDS, 0), "bytes_source": bytes_source}
+
+        for cleanup_pass in self.passes():
+            record = {
+                "type": "policy",
+                "policy": cleanup_pass.name,
+                "category": cleanup_pass.category,
+                "threshold_hours": self.CLEANUP_POLICIES[cleanup_pass.name],
+                **dict.fromkeys(self.PLAN_FIELDS, 0),
+                "samples": [],
+            }
+            for _, rows in self.stream(cleanup_pass, batch_size):
+                if not rows:
+                    continue
+                record["rooms"] += len(rows)
+                for table, count in room_repo.count_dependents([row.id for row in rows]).items():
+                    record[table] += count
+                record["samples"].extend(row.room_number for row in rows[: max(samples - len(record["samples"]), 0)])
+                if list_rooms:
+                    yield {"type": "rooms", "policy": cleanup_pass.name, "rooms": [row.room_number for row in rows]}
+
+            record["bytes"] = sum(record[table] * size for table, size in row_bytes.items())
+            for field in self.PLAN_FIELDS:
+                total[field] += record[field]
+            yield record
+
+        yield total
+
+    def _row_bytes(self) -> tuple[dict[str, int], str]:
+        """(各表平均行长, 来源)；表统计不可用或为 0 的表用 DEFAULT_ROW_BYTES"""
+        try:
+            measured = room_repo.average_row_bytes()
+        except Exception as e:
+            logger.warning(f"Failed to read table statistics, using default row sizes: {e}")
+            measured = None
+        if not measured:
+            return dict(self.DEFAULT_ROW_BYTES), "default"
+        return {table: measured.get(table) or size for table, size in self.DEFAULT_ROW_BYTES.items()}, "table_statistics"
 
+    def _record_result(self, stats: dict[str, int]) -> None:
+        try:
+            pipe = redis_manager.client.pipeline(transaction=False)
+            pipe.hset(self.LAST_RESULT_KEY, mapping={**stats, "finished_at": time.time()})
+            for category, count in stats.items():
+                if category != "total":
+                    pipe.hincrby(self.TOTALS_KEY, category, count)
+            pipe.execute()
         except Exception as e:
-            logger.error(f"Failed to delete room {room.room_number}: {e}")
-            return False
+            logger.warning(f"Failed to record cleanup result: {e}")
+
+    def get_cleanup_results(self) -> tuple[dict[str, float], dict[str, int]]:
+        """(最近一次的结果, 累计清理数)；没有记录时为空字典"""
+        pipe = redis_manager.client.pipeline(transaction=False)
+        pipe.hgetall(self.LAST_RESULT_KEY)
+        pipe.hgetall(self.TOTALS_KEY)
+        last, totals = pipe.execute()
+        return {k: float(v) for k, v in (last or {}).items()}, {k: int(v) for k, v in (totals or {}).items()}
 
     def get_room_statistics(self) -> dict[str, int]:
-        """获取当前房间统计信息"""
+        """获取当前房间统计信息（读取 Redis 中实时维护的房间计数；orphaned 为最近一次校准的值）"""
         try:
             stats = {
                 "total": 0,
@@ -178,21 +290,15 @@ class CleanupService:
                 "PLAYING": 0,
                 "ENDED": 0,
                 "orphaned": 0,
+                "players": 0,
             }
 
-            # 统计各状态房间数
-            stats["total"] = Room.query.count()
-            stats["WAITING"] = Room.query.filter_by(status="WAITING").count()
-            stats["PLAYING"] = Room.query.filter_by(status="PLAYING").count()
-            stats["ENDED"] = Room.query.filter_by(status="ENDED").count()
-
-            # 统计孤儿房间
-            orphaned_count = 0
-            for room in Room.query.all():
-                player_count = User.query.filter_by(current_room_id=room.id).count()
-                if player_count == 0:
-                    orphaned_count += 1
-            stats["orphaned"] = orphaned_count
+            values = room_gauge_service.read()
+            for (status, _phase), count in room_gauge_service.by_status_and_phase(values).items():
+                stats[status] = stats.get(status, 0) + count
+                stats["total"] += count
+            stats["orphaned"] = values.get("orphaned", 0)
+            stats["players"] = values.get("players", 0)
 
             logger.info(f"Room statistics: {stats}")
             return stats
@@ -1,18 +1,30 @@
 import random
-from datetime import UTC, datetime
+import time
 
 from src.exceptions.biz.room_exceptions import RoomStateError
-from src.fsm.avalon_fsm import AvalonFSM, GamePhase
+from src.extensions.redis_ext import redis_manager
+from src.fsm import engine, game_log, role_tables
+from src.fsm.avalon_fsm import ALL_ROLES, AvalonFSM, GamePhase
+from src.fsm.game_log import STATE_FIELDS, GameEventType
 from src.repositories.room_repository import room_repo
 from src.repositories.user_repository import user_repo
+from src.services.archive_service import archive_service
+from src.utils import deadline, instrumentation, metrics
+from src.utils.json_utils import json_dumps, json_loads
 from src.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
 
 class GameService:
+    PROFILE_CACHE_PREFIX = "cache:profile:"
+    PROFILE_CACHE_TTL = 86400  # 24 hours
+    NAMES_CACHE_PREFIX = "cache:names:"
+    NAMES_CACHE_TTL = 86400  # dropped at game over; the TTL only covers abandoned games
+
     def __init__(self):
         self.fsm = AvalonFSM()
+        self._listeners = []
 
     def start_game(self, room_number: str, operator_openid: str):
         room = room_repo.get_by_number(room_number)
@@ -29,351 +41,320 @@ class GameService:
 
         # 1. Shuffle players for leader order
         random.shuffle(players)
-        room.game_state.players = players
 
         # 2. Distribute Roles
-        roles = self._assign_roles(players)
-        room.game_state.roles_config = roles
-
-        # 3. Set initial state
-        room.game_state.phase = GamePhase.TEAM_SELECTION.value
-        room.game_state.round_num = 1
-        room.game_state.vote_track = 0
-        room.game_state.leader_idx = 0
-        room.game_state.quest_results = []
-        room.game_state.votes = {}
-        room.status = "PLAYING"
+        roles = self._assign_roles(players, options=room.options)
 
-        room_repo.save(room)
+        # 3. Start a fresh event log; the first event carries the deal, so replays never re-shuffle
+        deadline.check("start_game")
+        previous = (room.status, room.game_state.phase)
+        room.status = "PLAYING"
+        started = (GameEventType.GAME_STARTED, {"players": players, "roles": [roles[p] for p in players]})
+        room_repo.start_log(room, *started)
+        self._cache_names(room_number, players)
+        self._notify(room, GamePhase.WAITING, game_log.to_game(self._state_of(room)), [started], previous)
         logger.info(f"Game started in room {room_number}")
         return room
 
     def pick_team(self, room_number: str, leader_openid: str, selected_player_indices: list[int]):
-        room = room_repo.get_by_number(room_number)
-        if not room or room.game_state.phase != GamePhase.TEAM_SELECTION.value:
-            raise RoomStateError("当前不是组队阶段")
-
-        players = room.game_state.players
-        if players[room.game_state.leader_idx] != leader_openid:
-            raise RoomStateError("你不是当前队长")
-
-        required_size = self.fsm.get_quest_size(len(players), room.game_state.round_num)
-        if len(selected_player_indices) != required_size:
-            raise RoomStateError(f"本轮任务需要选择 {required_size} 人")
-
-        selected_openids = []
-        for idx in selected_player_indices:
-            if idx < 1 or idx > len(players):
-                raise RoomStateError(f"非法的玩家编号: {idx}")
-            selected_openids.append(players[idx - 1])
-
-        room.game_state.current_team = selected_openids
-        room.game_state.phase = GamePhase.TEAM_VOTE.value
-        room.game_state.votes = {}  # Clear old votes
-        room.game_state.phase_start_time = datetime.now(UTC).replace(tzinfo=None)  # 更新超时开始时间
-
-        room_repo.update_game_state(room.game_state)
+        room, game, seat_of = self._load(room_number, "当前不是组队阶段")
+        self._transition(room, engine.pick, game, seat_of.get(leader_openid), [idx - 1 for idx in selected_player_indices])
         logger.info(f"Room {room_number}: Team selection → Vote phase, timeout started")
         return room
 
     def cast_vote(self, room_number: str, user_openid: str, vote_result: str):
-        room = room_repo.get_by_number(room_number)
-        if not room or room.game_state.phase != GamePhase.TEAM_VOTE.value:
-            raise RoomStateError("当前不是投票阶段")
-
-        if user_openid not in room.game_state.players:
-            raise RoomStateError("你不在该房间中")
-
-        votes = dict(room.game_state.votes or {})
-        votes[user_openid] = vote_result
-        room.game_state.votes = votes
-
-        room_repo.update_game_state(room.game_state)
-
-        # Check if all voted
-        if len(votes) == len(room.game_state.players):
-            self._process_vote_result(room)
-
+        room, game, seat_of = self._load(room_number, "当前不是投票阶段")
+        self._transition(room, engine.vote, game, seat_of.get(user_openid), vote_result == "yes")
         return room
 
     def perform_quest(self, room_number: str, user_openid: str, quest_vote: str):
-        room = room_repo.get_by_number(room_number)
-        if not room or room.game_state.phase != GamePhase.QUEST_PERFORM.value:
-            raise RoomStateError("当前不是任务执行阶段")
-
-        if user_openid not in room.game_state.current_team:
-            raise RoomStateError("你不在本次任务队伍中")
-
-        # In a real game, good players CANNOT fail quests (usually).
-        # But we'll allow it if they really want to (though it's usually considered throwing).
-        # Standard rule: Good must Success.
-        role = room.game_state.roles_config.get(user_openid)
-        if role not in ["LOYAL", "MERLIN", "PERCIVAL"] and quest_vote == "fail":
-            pass  # Evil can fail
-        elif quest_vote == "fail":
-            # Note: Some variants allow good to fail, but standard doesn't.
-            # We will just warn or enforce it. Let's enforce it for standard feel.
-            # raise RoomStateError("好人阵营必须选择成功")
-            pass  # Let's be flexible for now if the user didn't specify strict enforcement
-
-        # We need to track WHO has voted without revealing WHAT they voted.
-        # Actually, let's just store a list of results and a set of who has voted.
-        # I'll repurpose votes field or use a new one.
-        # I added quest_votes as a list. I'll need a way to track who already voted.
-        # Let's use a dict temporarily and scramble at the end.
-
-        # Re-using the logic: I want to know if everyone in current_team has voted.
-        # I'll store it as a dict {openid: value} then take values() and shuffle.
-        # But I need to preserve anonymity in the DB if possible.
-        # Actually if I store {openid: value} anyone with DB access can see.
-        # For simplicity of this MVP, I'll store {openid: value} in a hidden way.
-
-        q_votes = dict(room.game_state.quest_votes or {}) if isinstance(room.game_state.quest_votes, dict) else {}
-        q_votes[user_openid] = quest_vote
-        room.game_state.quest_votes = q_votes
-
-        room_repo.update_game_state(room.game_state)
-
-        if len(q_votes) == len(room.game_state.current_team):
-            self._process_quest_result(room)
-
+        # Standard rule says Good must succeed; we stay flexible and accept any card (see engine.quest).
+        room, game, seat_of = self._load(room_number, "当前不是任务执行阶段")
+        self._transition(room, engine.quest, game, seat_of.get(user_openid), quest_vote == "success")
         return room
 
-    def _process_quest_result(self, room):
-        q_votes = list(room.game_state.quest_votes.values())
-        random.shuffle(q_votes)  # Anonymize for logs/display
-
-        fails = sum(1 for v in q_votes if v == "fail")
-        player_count = len(room.game_state.players)
-        round_num = room.game_state.round_num
-
-        # Quest 4 Rule: 7+ players need 2 fails
-        required_fails = 1
-        if player_count >= 7 and round_num == 4:
-            required_fails = 2
-
-        success = fails < required_fails
-
-        # Record result
-        results = list(room.game_state.quest_results)
-        results.append(success)
-        room.game_state.quest_results = results
-
-        logger.info(f"Quest {round_num} result: {'SUCCESS' if success else 'FAIL'} (Fails: {fails})")
-
-        # Check game over
-        success_count = sum(1 for r in results if r is True)
-        fail_count = sum(1 for r in results if r is False)
-
-        if fail_count >= 3:
-            room.game_state.phase = GamePhase.GAME_OVER.value
-            room.status = "ENDED"
-            self._archive_game(room, "EVIL")
-            logger.info("EVIL wins by 3 failed quests")
-        elif success_count >= 3:
-            # Good reached 3 wins -> Assassination Phase
-            room.game_state.phase = GamePhase.ASSASSINATION.value
-            room.game_state.phase_start_time = datetime.now(UTC).replace(tzinfo=None)  # 更新超时开始时间
-            logger.info("GOOD reached 3 wins. Entering ASSASSINATION phase.")
-        else:
-            # Next round
-            room.game_state.round_num += 1
-            room.game_state.vote_track = 0
-            room.game_state.leader_idx = (room.game_state.leader_idx + 1) % player_count
-            room.game_state.phase = GamePhase.TEAM_SELECTION.value
-            room.game_state.phase_start_time = datetime.now(UTC).replace(tzinfo=None)  # 更新超时开始时间
-            room.game_state.quest_votes = {}  # Reset for next
-
-        room_repo.update_game_state(room.game_state)
-
     def shoot_player(self, room_number: str, assassin_openid: str, target_idx: int):
-        room = room_repo.get_by_number(room_number)
-        if not room or room.game_state.phase != GamePhase.ASSASSINATION.value:
-            raise RoomStateError("当前不是刺杀阶段")
-
-        role = room.game_state.roles_config.get(assassin_openid)
-        if role != "ASSASSIN":
-            raise RoomStateError("只有刺客可以执行刺杀")
+        room, game, seat_of = self._load(room_number, "当前不是刺杀阶段")
+        game = self._transition(room, engine.shoot, game, seat_of.get(assassin_openid), target_idx - 1)
+        target_name = self.player_names(room)[target_idx - 1]
 
-        players = room.game_state.players
-        if target_idx < 1 or target_idx > len(players):
-            raise RoomStateError(f"非法的玩家编号: {target_idx}")
+        target_openid = room.game_state.players[target_idx - 1]
+        target_role = game.roles[target_idx - 1]
+        if game.winner == "EVIL":
+            logger.info(f"Assassin shot MERLIN ({target_openid})! EVIL wins.")
+            return f"刺杀成功！刺客击杀了梅林 {target_name}，坏人反败为胜！"
+        logger.info(f"Assassin shot {target_role} ({target_openid}). GOOD wins.")
+        return f"刺杀失败！被刺杀的 {target_name} 是 {target_role}，好人获得最终胜利！"
+
+    def play_timeout(self, room, auto_votes: list[list]):
+        """
+        Plays [[seat, vote], ...] for the players who ran out of time (vote: yes/no or success/fail) and
+        resolves the vote / quest. Called by the timeout checker with a room it already loaded.
+        """
+        game = game_log.to_game(self._state_of(room))
+        self._transition(room, engine.timeout, game, [(seat, vote in ("yes", "success")) for seat, vote in auto_votes])
+        return room
 
-        target_openid = players[target_idx - 1]
-        target_role = room.game_state.roles_config.get(target_openid)
+    def _load(self, room_number: str, missing_msg: str):
+        """Loads the room and its engine state; returns (room, game, {openid: seat})."""
+        with instrumentation.phase("load"):
+            room = room_repo.get_by_number(room_number)
+        if not room or not room.game_state:
+            raise RoomStateError(missing_msg)
+        seat_of = game_log.seat_index(room.game_state)
+        return room, game_log.to_game(self._state_of(room)), seat_of
+
+    @staticmethod
+    def _state_of(room) -> dict:
+        return {field: getattr(room.game_state, field) for field in STATE_FIELDS}
+
+    def add_transition_listener(self, listener) -> None:
+        """
+        listener(room, before_phase, game, events, previous) is called once after the game starts and after every
+        persisted move. before_phase is WAITING for a start (also when an ended room starts over); previous is the
+        room's (status, phase) before the change.
+        """
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def _notify(self, room, before, game, events, previous) -> None:
+        for listener in self._listeners:
+            try:
+                listener(room, before, game, events, previous)
+            except Exception as e:
+                logger.warning(f"Transition listener failed for room {room.room_number}: {e}")
+
+    def _transition(self, room, move, game, *args):
+        """
+        The single path of every move: the engine validates it against the transition table and returns
+        the new state and events, _commit persists them with one append, then listeners are notified
+        once. Each step is timed. The request deadline is checked right before the write, so a move that
+        runs out of time changes nothing and can be replayed in the background.
+        """
+        before, previous = game.phase, (room.status, room.game_state.phase)
+        start = time.perf_counter()
+        game, events = self._play(move, game, *args)
+        decided = time.perf_counter()
+        deadline.check(move.__name__)
+        self._commit(room, game, events)
+        persisted = time.perf_counter()
+        self._notify(room, before, game, events, previous)
+        done = time.perf_counter()
+        instrumentation.record_phase("decide", decided - start)
+        instrumentation.record_phase("persist", persisted - decided)
+        instrumentation.record_phase("notify", done - persisted)
+
+        log = logger.info if game.phase is not before else logger.debug
+        log(
+            f"Room {room.room_number}: {move.__name__} {before.value} -> {game.phase.value} in {(done - start) * 1000:.1f}ms "
+            f"(decide {(decided - start) * 1000:.1f}, persist {(persisted - decided) * 1000:.1f}, notify {(done - persisted) * 1000:.1f})"
+        )
+        return game
 
-        success = target_role == "MERLIN"
+    @staticmethod
+    def _play(move, game, *args):
+        try:
+            return move(game, *args)
+        except engine.IllegalMove as e:
+            raise RoomStateError(str(e)) from e
 
-        room.status = "ENDED"
-        room.game_state.phase = GamePhase.GAME_OVER.value
+    def _commit(self, room, game, events):
+        """Persists the events of one move; the final move also snapshots, ends the room and archives."""
+        over = game.phase is GamePhase.GAME_OVER
+        staged = []
 
-        if success:
-            logger.info(f"Assassin shot MERLIN ({target_openid})! EVIL wins.")
-            result_msg = "刺杀成功！刺客击杀了梅林，坏人反败为胜！"
-        else:
-            logger.info(f"Assassin shot {target_role} ({target_openid}). GOOD wins.")
-            result_msg = f"刺杀失败！被刺杀的是 {target_role}，好人获得最终胜利！"
-
-        self._archive_game(room, "GOOD" if not success else "EVIL")
-        room_repo.update_game_state(room.game_state)
-        return result_msg
-
-    def _archive_game(self, room, winner_team: str):
-        from src.app_factory import db
-        from src.models.sql_models import GameHistory
-
-        history = GameHistory(
-            room_id=str(room.room_number),
-            start_time=room.created_at,
-            winner_team=winner_team,
-            players=room.game_state.players,
-            replay_data={
-                "roles": room.game_state.roles_config,
-                "quest_results": room.game_state.quest_results,
-            },
-        )
-        db.session.add(history)
+        def stage_archive(state):
+            staged.append(archive_service.stage(room, state, game.winner))
 
-        room_repo.update_game_state(room.game_state)
+        if over:
+            room.status = "ENDED"
+        room_repo.append_events(room, events, snapshot=over, before_commit=stage_archive if over else None)
+
+        for kind, payload in events:
+            if kind is GameEventType.TEAM_VOTE_RESOLVED:
+                if payload["approved"]:
+                    logger.info(f"Team vote PASSED in room {room.room_number}, started quest timeout")
+                elif over:
+                    logger.info(f"Vote track reached 5. EVIL wins in room {room.room_number}")
+                else:
+                    logger.info(f"Team vote FAILED in room {room.room_number}. Next leader idx: {game.leader}")
+            elif kind is GameEventType.QUEST_RESOLVED:
+                logger.info(f"Quest {len(game.results)} result: {'SUCCESS' if payload['success'] else 'FAIL'} (Fails: {payload['fails']})")
+                if over:
+                    logger.info("EVIL wins by 3 failed quests")
+                elif game.phase is GamePhase.ASSASSINATION:
+                    logger.info("GOOD reached 3 wins. Entering ASSASSINATION phase.")
+
+        if over:
+            self._archive_game(staged[0])
+            self._drop_names(room.room_number)
+
+    def player_names(self, room) -> list[str]:
+        """
+        Display name per seat, e.g. "玩家3(小明)". Resolved with one batched lookup at game start and
+        cached for the life of the game, so replies never query users seat by seat.
+        """
+        players = list(room.game_state.players or [])
+        key = f"{self.NAMES_CACHE_PREFIX}{room.room_number}"
+        try:
+            cached = json_loads(redis_manager.client.get(key))
+            if cached and len(cached) == len(players):
+                metrics.cache_lookup("names", hits=1)
+                return cached
+        except Exception as e:
+            logger.warning(f"Names cache read failed for room {room.room_number}: {e}")
+        metrics.cache_lookup("names", hits=0, misses=1)
+        if room.status == "PLAYING":
+            return self._cache_names(room.room_number, players)
+        return self._render_names(players)
+
+    def _cache_names(self, room_number: str, players: list[str]) -> list[str]:
+        names = self._render_names(players)
+        try:
+            redis_manager.client.set(f"{self.NAMES_CACHE_PREFIX}{room_number}", json_dumps(names), ex=self.NAMES_CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"Names cache write failed for room {room_number}: {e}")
+        return names
+
+    def player_renamed(self, openid: str) -> None:
+        """
+        A player in a room changed nickname: bump the room version so /status renders cached under the
+        old version are no longer read, and drop the game's names cache so replies pick up the new name.
+        """
+        head = user_repo.get_current_room_version(openid)
+        if not head:
+            return
+        room_repo.bump_version(head[0])
+        self._drop_names(head[0])
+
+    def _drop_names(self, room_number: str) -> None:
+        try:
+            redis_manager.client.delete(f"{self.NAMES_CACHE_PREFIX}{room_number}")
+        except Exception as e:
+            logger.warning(f"Failed to drop names cache for room {room_number}: {e}")
+
+    @staticmethod
+    def _render_names(players: list[str]) -> list[str]:
+        nicknames = user_repo.get_nicknames(players)
+        return [f"玩家{seat + 1}({nicknames[openid]})" if nicknames.get(openid) else f"玩家{seat + 1}" for seat, openid in enumerate(players)]
+
+    def _archive_game(self, event: dict):
+        # History insert, counters, leaderboards and profile prewarm all happen in the
+        # archive worker; the request that ended the game only enqueues the event. The event
+        # was committed to the outbox with the final move, so a failure here never fails the move.
+        archive_service.emit(event)
 
     def get_user_stats(self, openid: str) -> str:
-        from src.models.sql_models import GameHistory
+        cache_key = f"{self.PROFILE_CACHE_PREFIX}{openid}"
+        try:
+            cached = json_loads(redis_manager.client.get(cache_key))
+            if cached:
+                metrics.cache_lookup("profile", hits=1)
+                return cached["text"]
+        except Exception as e:
+            logger.warning(f"Profile cache read failed for {openid}: {e}")
+        metrics.cache_lookup("profile", hits=0, misses=1)
 
         user = user_repo.get_by_openid(openid)
         if not user:
             return "未找到用户信息"
 
-        # Get history where user participated
-        # Since players is JSON, we can use JSON_CONTAINS if MySQL, or iterate in Python
-        # For SQLite/Compatibility, let's do Python filtering for now
-        all_history = GameHistory.query.all()
-        user_history = [h for h in all_history if openid in (h.players or [])]
-
-        total = len(user_history)
+        text = self._render_user_stats(user)
+        try:
+            # NX: a reader that loaded counters before an archive must not overwrite the prewarmed entry
+            redis_manager.client.set(cache_key, json_dumps({"text": text}), ex=self.PROFILE_CACHE_TTL, nx=True)
+        except Exception as e:
+            logger.warning(f"Profile cache write failed for {openid}: {e}")
+        return text
+
+    def prewarm_profiles(self, users: list) -> None:
+        """Overwrites the cached /profile block of each user with one rendered from the fresh counters."""
+        if not users:
+            return
+        try:
+            pipe = redis_manager.client.pipeline(transaction=False)
+            for user in users:
+                payload = json_dumps({"text": self._render_user_stats(user)})
+                pipe.set(f"{self.PROFILE_CACHE_PREFIX}{user.openid}", payload, ex=self.PROFILE_CACHE_TTL)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to prewarm profiles: {e}")
+            self.invalidate_profiles([user.openid for user in users])
+
+    def invalidate_profiles(self, openids: list[str]) -> None:
+        if not openids:
+            return
+        try:
+            redis_manager.client.delete(*[f"{self.PROFILE_CACHE_PREFIX}{openid}" for openid in openids])
+        except Exception as e:
+            logger.warning(f"Failed to invalidate profiles {openids}: {e}")
+
+    def _render_user_stats(self, user) -> str:
+        # Counters are maintained by _archive_game, no history scan needed
+        total = user.total_games or 0
         if total == 0:
             return f"【{user.nickname or '玩家'} 的战绩代报】\n暂无比赛记录。"
 
-        wins = 0
-        good_games = 0
-        evil_games = 0
-        good_wins = 0
-        evil_wins = 0
-
-        for h in user_history:
-            roles = h.replay_data.get("roles", {})
-            user_role = roles.get(openid, "UNKNOWN")
-            is_good = user_role in ["MERLIN", "PERCIVAL", "LOYAL"]
-
-            if is_good:
-                good_games += 1
-            else:
-                evil_games += 1
-
-            if h.winner_team == ("GOOD" if is_good else "EVIL"):
-                wins += 1
-                if is_good:
-                    good_wins += 1
-                else:
-                    evil_wins += 1
-
-        win_rate = (wins / total) * 100
+        good_wins = user.wins_good or 0
+        evil_wins = user.wins_evil or 0
+        win_rate = ((good_wins + evil_wins) / total) * 100
 
         stats = [
             f"【{user.nickname or '玩家'} 的战绩总览】",
             f"总局数: {total}",
             f"总胜率: {win_rate:.1f}%",
             "--- 阵营统计 ---",
-            f"好人局: {good_games} (胜 {good_wins})",
-            f"坏人局: {evil_games} (胜 {evil_wins})",
+            f"好人局: {user.games_good or 0} (胜 {good_wins})",
+            f"坏人局: {user.games_evil or 0} (胜 {evil_wins})",
         ]
-        return "\n".join(stats)
 
-    def _process_vote_result(self, room):
-        votes = room.game_state.votes
-        yes_count = sum(1 for v in votes.values() if v == "yes")
-        no_count = sum(1 for v in votes.values() if v == "no")
-
-        if yes_count > no_count:
-            # Vote Passed
-            room.game_state.phase = GamePhase.QUEST_PERFORM.value
-            room.game_state.vote_track = 0
-            room.game_state.phase_start_time = datetime.now(UTC).replace(tzinfo=None)  # 更新超时开始时间
-            logger.info(f"Team vote PASSED in room {room.room_number}, started quest timeout")
-        else:
-            # Vote Failed
-            room.game_state.vote_track += 1
-            if room.game_state.vote_track >= 5:
-                # Hammer failed 5 times -> Evil wins
-                room.game_state.phase = GamePhase.GAME_OVER.value
-                room.status = "ENDED"
-                logger.info(f"Vote track reached 5. EVIL wins in room {room.room_number}")
-            else:
-                # Next leader
-                room.game_state.leader_idx = (room.game_state.leader_idx + 1) % len(room.game_state.players)
-                room.game_state.phase = GamePhase.TEAM_SELECTION.value
-                room.game_state.phase_start_time = datetime.now(UTC).replace(tzinfo=None)  # 更新超时开始时间
-                logger.info(f"Team vote FAILED in room {room.room_number}. Next leader idx: {room.game_state.leader_idx}")
-
-        room_repo.update_game_state(room.game_state)
-
-    def get_player_info(self, room, user_openid: str) -> str:
-        roles = room.game_state.roles_config
-        role = roles.get(user_openid)
-        players = room.game_state.players
+        role_lines = []
+        for role in ALL_ROLES:
+            games = getattr(user, f"games_as_{role.lower()}") or 0
+            if games:
+                wins = getattr(user, f"wins_as_{role.lower()}") or 0
+                role_lines.append(f"{role}: {games} (胜 {wins})")
+        if role_lines:
+            stats.append("--- 角色统计 ---")
+            stats.extend(role_lines)
 
-        info = [f"你的身份是: {role}"]
+        return "\n".join(stats)
 
-        # Evil roles (common)
-        evil_common = ["MORGANA", "ASSASSIN", "MORDRED", "MINION"]
+    def get_player_info(self, room, user_openid: str, names: list[str] | None = None) -> str:
+        """names: display name per seat (see player_names); plain 玩家N when omitted."""
+        gs = room.game_state
+        role = gs.roles_config.get(user_openid)
+        seat_of = game_log.seat_index(gs)
+        seat = seat_of.get(user_openid)
 
+        # Night knowledge is computed once at game start; states stored before that get it worked out here
+        night_info = getattr(gs, "night_info", None)
+        if night_info is None:
+            night_info = engine.night_knowledge([gs.roles_config.get(openid) for openid in gs.players])
+        seen = " ".join(f"【{names[s] if names else f'玩家{s + 1}'}】" for s in night_info[seat]) if seat is not None else ""
+
+        info = [f"你的身份是: {role}"]
         if role == "MERLIN":
             # Sees all evil EXCEPT Mordred (Oberon IS seen)
-            seen = [p for p, r in roles.items() if r in ["MORGANA", "ASSASSIN", "MINION", "OBERON"]]
-            names = [f"【玩家{players.index(p) + 1}】" for p in seen]
-            info.append(f"你看到的坏人(不含莫德雷德): {' '.join(names) or '无'}")
+            info.append(f"你看到的坏人(不含莫德雷德): {seen or '无'}")
         elif role == "PERCIVAL":
             # Sees Merlin and Morgana (undistinguished)
-            seen = [p for p, r in roles.items() if r in ["MERLIN", "MORGANA"]]
-            names = [f"【玩家{players.index(p) + 1}】" for p in seen]
-            info.append(f"你看到的候选梅林(含莫甘娜): {' '.join(names) or '无'}")
-        elif role in evil_common:
+            info.append(f"你看到的候选梅林(含莫甘娜): {seen or '无'}")
+        elif role in engine.EVIL_TEAM:
             # Evil see each other (except Oberon)
-            # Oberon doesn't see them, and they don't see Oberon
-            allies = [p for p, r in roles.items() if r in evil_common and p != user_openid]
-            names = [f"【玩家{players.index(p) + 1}】" for p in allies]
-            info.append(f"你的坏人盟友(不含奥伯伦): {' '.join(names) or '无'}")
+            info.append(f"你的坏人盟友(不含奥伯伦): {seen or '无'}")
         elif role == "OBERON":
             info.append("（奥伯伦不认识其他坏人，坏人也不认识你）")
 
         return "\n".join(info)
 
-    def _assign_roles(self, players: list[str]) -> dict[str, str]:
-        count = len(players)
-        good_count, evil_count = self.fsm.get_role_distribution(count)
-
-        # 好人: MERLIN, PERCIVAL, LOYAL
-        # 坏人: MORGANA, ASSASSIN, MORDRED, MINION, OBERON
-        good_pool = ["MERLIN", "PERCIVAL"] + ["LOYAL"] * (good_count - 2)
-
-        evil_pool = ["ASSASSIN"]  # Always need Assassin
-        candidates = ["MORGANA", "MORDRED", "OBERON", "MINION"]
-        random.shuffle(candidates)
-        evil_pool += candidates[: evil_count - 1]
-
-        # Ensure pool matches player count
-        while len(good_pool) > good_count:
-            good_pool.pop()
-        while len(evil_pool) > evil_count:
-            evil_pool.pop()
-        while len(good_pool) < good_count:
-            good_pool.append("LOYAL")
-        while len(evil_pool) < evil_count:
-            evil_pool.append("MINION")
-
-        all_roles = good_pool + evil_pool
-        random.shuffle(all_roles)
-
-        return {players[i]: all_roles[i] for i in range(count)}
+    def _assign_roles(self, players: list[str], rng=random, options: dict | None = None) -> dict[str, str]:
+        """按房间板子 (room.options) 查表取角色，一次随机排列发到各座位"""
+        try:
+            roles = role_tables.roles_for(len(players), options)
+        except role_tables.RoleTableError as e:
+            raise RoomStateError(str(e)) from None
+        return dict(zip(players, role_tables.deal(roles, rng), strict=True))
 
 
 game_service = GameService()
@@ -0,0 +1,157 @@
+"""排行榜服务 - 基于 Redis 有序集合 (ZSET) 的增量排行榜"""
+
+from src.config.settings import settings
+from src.extensions.redis_ext import redis_manager
+from src.models.sql_models import User
+from src.repositories.user_repository import user_repo
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class LeaderboardService:
+    """
+    每个榜单是一个 ZSET: member=openid, score=榜单分数
+    归档时用 MySQL 中的计数器绝对值 ZADD（幂等），MySQL 为唯一事实来源，可随时全量重建
+    """
+
+    KEY_PREFIX = "leaderboard:"
+    TOP_N = 10
+
+    # board -> (标题, 分数单位)
+    BOARDS = {
+        "winrate": ("总胜率榜", "%"),
+        "good": ("好人胜场榜", "胜"),
+        "evil": ("坏人胜场榜", "胜"),
+        "merlin": ("梅林存活榜", "局"),
+    }
+    BOARD_ALIASES = {
+        "胜率": "winrate",
+        "好人": "good",
+        "坏人": "evil",
+        "梅林": "merlin",
+    }
+
+    def resolve_board(self, name: str | None) -> str | None:
+        if not name:
+            return "winrate"
+        name = name.lower()
+        board = self.BOARD_ALIASES.get(name, name)
+        return board if board in self.BOARDS else None
+
+    def scores_for(self, user: User) -> dict[str, float | None]:
+        """计算用户在各榜单的分数，None 表示不上榜"""
+        total = user.total_games or 0
+        wins = (user.wins_good or 0) + (user.wins_evil or 0)
+        scores = {
+            "winrate": round(wins / total * 100, 2) if total >= settings.LEADERBOARD_MIN_GAMES else None,
+            "good": user.wins_good or None,
+            "evil": user.wins_evil or None,
+            # 梅林存活 = 以梅林身份获胜（未被刺杀且好人获胜）的局数
+            "merlin": user.wins_as_merlin or None,
+        }
+        return scores
+
+    def update_users(self, users: list[User]) -> None:
+        """归档后用参与者最新的计数器刷新榜单分数，一个 pipeline 完成"""
+        if not users:
+            return
+        try:
+            pipe = redis_manager.client.pipeline(transaction=False)
+            self._stage_users(pipe, users, self.KEY_PREFIX)
+            pipe.execute()
+            logger.debug(f"Updated leaderboards for {len(users)} users")
+        except Exception as e:
+            # 排行榜只是派生数据，失败不影响对局归档，可通过 rebuild 恢复
+            logger.warning(f"Failed to update leaderboards for {[u.openid for u in users]}: {e}")
+
+    def top(self, board: str, n: int = TOP_N) -> list[tuple[str, float]]:
+        return redis_manager.client.zrevrange(self._key(board), 0, n - 1, withscores=True)
+
+    def rank(self, board: str, openid: str) -> tuple[int, float] | None:
+        """返回 (名次, 分数)，名次从 1 开始；不在榜上返回 None"""
+        pipe = redis_manager.client.pipeline(transaction=False)
+        pipe.zrevrank(self._key(board), openid)
+        pipe.zscore(self._key(board), openid)
+        rank, score = pipe.execute()
+        if rank is None:
+            return None
+        return rank + 1, score
+
+    def rebuild(self, batch_size: int = 500) -> int:
+        """
+        从 MySQL 全量重建所有榜单
+        先写入临时 key，完成后原子 RENAME 覆盖，重建期间读取不受影响
+        """
+        client = redis_manager.client
+        tmp_prefix = f"{self.KEY_PREFIX}rebuild:"
+        for board in self.BOARDS:
+            client.delete(self._key(board, tmp_prefix))
+
+        count = 0
+        last_id = 0
+        while True:
+            users = User.query.filter(User.id > last_id).order_by(User.id).limit(batch_size).all()
+            if not users:
+                break
+            last_id = users[-1].id
+            count += len(users)
+
+            pipe = client.pipeline(transaction=False)
+            self._stage_users(pipe, users, tmp_prefix)
+            pipe.execute()
+
+        pipe = client.pipeline(transaction=True)
+        for board in self.BOARDS:
+            if client.exists(self._key(board, tmp_prefix)):
+                pipe.rename(self._key(board, tmp_prefix), self._key(board))
+            else:
+                pipe.delete(self._key(board))
+        pipe.execute()
+
+        logger.info(f"Rebuilt leaderboards from {count} users")
+        return count
+
+    def render(self, openid: str, board_name: str | None = None) -> str:
+        board = self.resolve_board(board_name)
+        if not board:
+            return f"未知榜单: {board_name}\n可选: 胜率 / 好人 / 坏人 / 梅林"
+
+        title, unit = self.BOARDS[board]
+        top = self.top(board)
+        lines = [f"【{title}】"]
+        if board == "winrate":
+            lines.append(f"(至少 {settings.LEADERBOARD_MIN_GAMES} 局上榜)")
+
+        if not top:
+            lines.append("暂无数据")
+        else:
+            nicknames = user_repo.get_nicknames([m for m, _ in top])
+            for i, (member, score) in enumerate(top, start=1):
+                lines.append(f"{i}. {nicknames.get(member) or '玩家'} - {self._format_score(score)}{unit}")
+
+        mine = self.rank(board, openid)
+        if mine:
+            lines.append(f"--- 你的排名: 第 {mine[0]} 名 ({self._format_score(mine[1])}{unit})")
+        else:
+            lines.append("--- 你暂未上榜")
+        return "\n".join(lines)
+
+    def _stage_users(self, pipe, users: list[User], prefix: str) -> None:
+        for user in users:
+            for board, score in self.scores_for(user).items():
+                if score is None:
+                    pipe.zrem(self._key(board, prefix), user.openid)
+                else:
+                    pipe.zadd(self._key(board, prefix), {user.openid: score})
+
+    def _key(self, board: str, prefix: str | None = None) -> str:
+        return f"{prefix or self.KEY_PREFIX}{board}"
+
+    @staticmethod
+    def _format_score(score: float) -> str:
+        return f"{score:.1f}" if score != int(score) else str(int(score))
+
+
+# Singleton
+leaderboard_service = LeaderboardService()
@@ -0,0 +1,69 @@
+"""
+/metrics 服务：Prometheus 文本格式
+- 进程内指标（src.utils.metrics）：多进程部署时由 MultiProcessCollector 汇总 PROMETHEUS_MULTIPROC_DIR 中所有 worker 的值
+- 全局数据在抓取时从 Redis 读取，与哪个 worker 响应无关：
+  按状态与阶段的房间数与玩家数（room_gauge_service 实时维护）、房间清理结果（清理在 CronJob 进程中执行）
+"""
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector
+
+from src.services.cleanup_service import cleanup_service
+from src.services.room_gauge_service import room_gauge_service
+from src.utils import metrics
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class _ScrapeTimeCollector:
+    """每次抓取时读取 Redis；某项读取失败只跳过该项，其余指标照常输出"""
+
+    def collect(self):
+        try:
+            values = room_gauge_service.read()
+        except Exception as e:
+            logger.warning(f"Metrics: failed to read room gauges: {e}")
+        else:
+            rooms = GaugeMetricFamily("avalon_rooms", "房间数（按状态与对局阶段）", labels=["status", "phase"])
+            for (status, phase), count in room_gauge_service.by_status_and_phase(values).items():
+                rooms.add_metric([status, phase], count)
+            yield rooms
+            yield GaugeMetricFamily("avalon_room_players", "在房间中的玩家数", value=values.get("players", 0))
+            yield GaugeMetricFamily("avalon_rooms_orphaned", "没有玩家的房间数（最近一次校准）", value=values.get("orphaned", 0))
+
+        try:
+            last, totals = cleanup_service.get_cleanup_results()
+        except Exception as e:
+            logger.warning(f"Metrics: failed to read cleanup results: {e}")
+            return
+        deleted = CounterMetricFamily("avalon_cleanup_rooms_deleted", "房间清理累计删除数", labels=["category"])
+        for category, count in totals.items():
+            deleted.add_metric([category], count)
+        yield deleted
+        last_run = GaugeMetricFamily("avalon_cleanup_last_run_rooms", "最近一次房间清理删除数", labels=["category"])
+        for category, count in last.items():
+            if category != "finished_at":
+                last_run.add_metric([category], count)
+        yield last_run
+        if "finished_at" in last:
+            yield GaugeMetricFamily("avalon_cleanup_last_run_timestamp_seconds", "最近一次房间清理完成时间", value=last["finished_at"])
+
+
+class MetricsService:
+    def __init__(self):
+        self._scrape_registry = CollectorRegistry(auto_describe=False)
+        self._scrape_registry.register(_ScrapeTimeCollector())
+
+    def render(self) -> tuple[bytes, str]:
+        """返回 (响应体, Content-Type)"""
+        if metrics.MULTIPROC_DIR:
+            registry = CollectorRegistry()
+            MultiProcessCollector(registry, path=metrics.MULTIPROC_DIR)
+        else:
+            registry = REGISTRY
+        return generate_latest(registry) + generate_latest(self._scrape_registry), CONTENT_TYPE_LATEST
+
+
+metrics_service = MetricsService()
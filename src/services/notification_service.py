@@ -0,0 +1,207 @@
+"""
+阶段通知推送服务
+游戏开始和每次阶段变化时给房间内每位玩家生成一条通知（轮到谁、该发什么指令、上一步的结果），
+写入 Redis 队列；后台发送者按批取出，经限速后通过客服消息接口发送，失败的按指数退避重试。
+玩家不再需要反复 /status 轮询来得知投票开始、任务结果等变化。
+"""
+
+import threading
+import time
+import uuid
+
+from src.config.settings import settings
+from src.extensions.redis_ext import redis_manager
+from src.fsm.avalon_fsm import GamePhase
+from src.fsm.game_log import GameEventType
+from src.services.game_service import game_service
+from src.utils.json_utils import json_dumps, json_loads
+from src.utils.logger import get_logger
+from src.wechat.push_client import PushClient, PushRejected, create_push_client
+
+logger = get_logger(__name__)
+
+
+class _TokenBucket:
+    """进程内令牌桶：acquire() 在没有令牌时等待"""
+
+    def __init__(self, rate: float, burst: float | None = None):
+        self.rate = rate
+        self.capacity = burst or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+
+
+class NotificationService:
+    """
+    queue:push        待发送的消息（List，RPUSH 入队 / 批量 LPOP 出队）
+    queue:push:retry  发送失败、等待重试的消息（ZSET，分数为下次发送时间）
+    一条消息: {"id", "openid", "text", "attempts"}
+    """
+
+    QUEUE_KEY = "queue:push"
+    RETRY_KEY = "queue:push:retry"
+    BATCH_SIZE = 50
+    BLOCK_SECONDS = 5
+    MAX_ATTEMPTS = 5
+    RETRY_BASE_SECONDS = 2  # 第 n 次失败后等待 2^n 秒
+
+    def __init__(self, client: PushClient | None = None):
+        self._client = client
+        self._bucket = _TokenBucket(settings.PUSH_RATE_PER_SECOND)
+
+    @property
+    def client(self) -> PushClient:
+        if self._client is None:
+            self._client = create_push_client()
+        return self._client
+
+    def install(self) -> None:
+        """订阅对局状态变化与延迟指令的结果"""
+        from src.wechat.deferred import deferred_commands
+
+        game_service.add_transition_listener(self.on_transition)
+        deferred_commands.add_listener(self.notify)
+
+    # ------------------------------------------------------------------
+    # 入队
+    # ------------------------------------------------------------------
+
+    def on_transition(self, room, before: GamePhase, game, events, previous) -> None:
+        """GameService 的状态变化监听：只在开局和阶段变化时通知，阶段内的单张投票不推送"""
+        if not settings.PUSH_ENABLED or game.phase is before:
+            return
+        self.enqueue(self.render(room, before, game, events).items())
+
+    def notify(self, openid: str, text: str) -> None:
+        if settings.PUSH_ENABLED:
+            self.enqueue([(openid, text)])
+
+    def enqueue(self, messages) -> int:
+        """一次 RPUSH 写入这次变化的全部消息；队列不可用时丢弃（玩家仍可用 /status 查询）"""
+        payloads = [json_dumps({"id": uuid.uuid4().hex, "openid": openid, "text": text, "attempts": 0}) for openid, text in messages]
+        if not payloads:
+            return 0
+        try:
+            redis_manager.client.rpush(self.QUEUE_KEY, *payloads)
+        except Exception as e:
+            logger.warning(f"Failed to queue {len(payloads)} push messages: {e}")
+            return 0
+        return len(payloads)
+
+    def render(self, room, before: GamePhase, game, events) -> dict[str, str]:
+        """每位玩家的通知文本 {openid: text}"""
+        players = list(room.game_state.players or [])
+        names = game_service.player_names(room)
+        head = f"【房间 {room.room_number}】"
+        summary = self._summary(game, events, names)
+
+        personal: dict[int, str] = {}
+        if game.phase is GamePhase.TEAM_SELECTION:
+            progress = " ".join("成功" if ok else "失败" for ok in game.results) or "暂无"
+            common = f"第 {game.round_num} 局组队：队长 {names[game.leader]} 选择 {game.quest_size} 人（任务记录: {progress}）"
+            example = " ".join(str(seat + 1) for seat in range(game.quest_size))
+            personal[game.leader] = f"你是队长，请发送 /pick 选择 {game.quest_size} 名队员，如 /pick {example}"
+        elif game.phase is GamePhase.TEAM_VOTE:
+            common = f"队长 {names[game.leader]} 提议队伍 [{self._team(game, names)}]，请全体投票: /vote yes 或 /vote no"
+        elif game.phase is GamePhase.QUEST_PERFORM:
+            common = f"队伍 [{self._team(game, names)}] 出发执行第 {game.round_num} 个任务"
+            personal.update(dict.fromkeys(game.team, "你在任务队伍中，请发送 /quest success 或 /quest fail"))
+        elif game.phase is GamePhase.ASSASSINATION:
+            common = "好人完成了三次任务！等待刺客刺杀梅林"
+            personal[game.roles.index("ASSASSIN")] = "你是刺客，请发送 /shoot {编号} 刺杀梅林"
+        else:
+            reveal = "\n".join(f"{names[seat]}: {role}" for seat, role in enumerate(game.roles))
+            common = f"游戏结束，{'好人' if game.winner == 'GOOD' else '坏人'}获胜！\n{reveal}"
+
+        texts = {}
+        for seat, openid in enumerate(players):
+            parts = [head + summary if summary else head]
+            if before is GamePhase.WAITING:
+                parts.append(game_service.get_player_info(room, openid, names))
+            parts.append(common)
+            if seat in personal:
+                parts.append(personal[seat])
+            texts[openid] = "\n".join(parts)
+        return texts
+
+    @staticmethod
+    def _team(game, names: list[str]) -> str:
+        return "、".join(names[seat] for seat in game.team)
+
+    @staticmethod
+    def _summary(game, events, names: list[str]) -> str:
+        """上一步的结果（取本次变化中最后一个结算事件）"""
+        for kind, payload in reversed(events):
+            if kind is GameEventType.GAME_STARTED:
+                return "游戏开始！"
+            if kind is GameEventType.TEAM_VOTE_RESOLVED:
+                return "组队投票通过。" if payload["approved"] else f"组队投票未通过（连续否决 {game.vote_track}/5）。"
+            if kind is GameEventType.QUEST_RESOLVED:
+                return f"任务{'成功' if payload['success'] else '失败'}（失败票 {payload['fails']} 张）。"
+            if kind is GameEventType.ASSASSINATION:
+                return f"刺客刺杀了 {names[payload['seat']]}，{'正是梅林' if payload['hit'] else '不是梅林'}。"
+        return ""
+
+    # ------------------------------------------------------------------
+    # 发送
+    # ------------------------------------------------------------------
+
+    def consume(self, block_seconds: int = BLOCK_SECONDS) -> int:
+        """把到期的重试放回队列，再取一批发送，返回本批消息数"""
+        self._promote_due_retries()
+        first = redis_manager.blocking_client.blpop(self.QUEUE_KEY, timeout=block_seconds)
+        if not first:
+            return 0
+        batch = [first[1]] + (redis_manager.client.lpop(self.QUEUE_KEY, self.BATCH_SIZE - 1) or [])
+        for raw in batch:
+            self._send(json_loads(raw))
+        return len(batch)
+
+    def run_worker(self):
+        """后台发送循环（在 app context 中运行）"""
+        logger.info("Push sender started")
+        while True:
+            try:
+                self.consume()
+            except Exception as e:
+                logger.error(f"Error in push sender: {e}")
+                time.sleep(1)
+
+    def _send(self, message: dict) -> None:
+        self._bucket.acquire()
+        try:
+            self.client.send_text(message["openid"], message["text"])
+        except PushRejected as e:
+            logger.info(f"Push to {message['openid']} rejected, dropped: {e}")
+        except Exception as e:
+            message["attempts"] += 1
+            if message["attempts"] >= self.MAX_ATTEMPTS:
+                logger.error(f"Push {message['id']} to {message['openid']} failed {message['attempts']} times, dropped: {e}")
+                return
+            due = time.time() + self.RETRY_BASE_SECONDS ** message["attempts"]
+            try:
+                redis_manager.client.zadd(self.RETRY_KEY, {json_dumps(message): due})
+            except Exception as redis_error:
+                logger.warning(f"Failed to schedule retry of push {message['id']}: {redis_error}")
+            logger.warning(f"Push {message['id']} to {message['openid']} failed (attempt {message['attempts']}): {e}")
+
+    def _promote_due_retries(self) -> None:
+        client = redis_manager.client
+        for raw in client.zrangebyscore(self.RETRY_KEY, 0, time.time(), start=0, num=self.BATCH_SIZE):
+            # ZREM 成功的进程才放回队列，多个发送者不会重复投递
+            if client.zrem(self.RETRY_KEY, raw):
+                client.rpush(self.QUEUE_KEY, raw)
+
+
+notification_service = NotificationService()
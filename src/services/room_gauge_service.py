@@ -0,0 +1,138 @@
+"""
+房间计数：Redis 中实时维护的按状态与阶段的房间数、房间内的玩家数，替代统计时的 COUNT 查询
+- 建房、加入、开局与每次阶段变化（GameService 状态变化监听）、删除房间时按增量 HINCRBY
+- 定期校准：一条分组查询（room_repo.count_rooms_and_players）重算全部计数并整体替换，同时刷新空房间数
+  校准与增量之间没有加锁，期间的少量增量可能丢失或重复，下一次校准修正
+"""
+
+import time
+
+from src.config.settings import settings
+from src.extensions.redis_ext import redis_manager
+from src.fsm.avalon_fsm import GamePhase
+from src.repositories.room_repository import room_repo
+from src.services.game_service import game_service
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class RoomGaugeService:
+    """
+    stats:rooms  Hash
+      "{status}:{phase}"  该状态与阶段的房间数，如 "PLAYING:TEAM_VOTE"（没有对局状态的房间 phase 为空）
+      "players"           在房间中的玩家数（users.current_room_id 非空）
+      "orphaned"          没有玩家的房间数（只在校准时更新）
+      "reconciled_at"     最近一次校准的时间戳
+    """
+
+    KEY = "stats:rooms"
+    RECONCILE_LOCK_KEY = "stats:rooms:reconcile"
+    META_FIELDS = ("players", "orphaned", "reconciled_at")
+
+    @staticmethod
+    def field(status: str, phase: str | None) -> str:
+        return f"{status}:{phase or ''}"
+
+    def install(self) -> None:
+        """订阅对局状态变化（开局、阶段变化、结束）"""
+        game_service.add_transition_listener(self.on_transition)
+
+    # ------------------------------------------------------------------
+    # 增量
+    # ------------------------------------------------------------------
+
+    def on_transition(self, room, before: GamePhase, game, events, previous: tuple[str, str | None]) -> None:
+        """previous: 变化前房间的 (status, phase)，重开已结束的房间时为 ("ENDED", "GAME_OVER")"""
+        if game.phase is before:
+            return
+        self.apply({self.field(*previous): -1, self.field(*self.state_of(room)): 1})
+
+    def room_created(self, joined: bool) -> None:
+        """新房间处于 WAITING；joined: 房主此前不在任何房间"""
+        self.apply({self.field("WAITING", GamePhase.WAITING.value): 1, "players": int(joined)})
+
+    def player_joined(self) -> None:
+        """此前不在任何房间的玩家进入房间（从别的房间换过来的不改变玩家数）"""
+        self.apply({"players": 1})
+
+    @staticmethod
+    def state_of(room) -> tuple[str, str | None]:
+        """删除前记下房间的 (status, phase)，供 rooms_deleted 使用"""
+        return room.status, room.game_state.phase if room.game_state else None
+
+    def rooms_deleted(self, states: list[tuple[str, str | None]], players: int) -> None:
+        """states: 被删除房间的 (status, phase)；players: 随之离开房间的玩家数"""
+        deltas: dict[str, int] = {"players": -players}
+        for status, phase in states:
+            key = self.field(status, phase)
+            deltas[key] = deltas.get(key, 0) - 1
+        self.apply(deltas)
+
+    def apply(self, deltas: dict[str, int]) -> None:
+        """一次 pipeline 写入全部增量；Redis 不可用时跳过（由下一次校准修正）"""
+        deltas = {key: delta for key, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        try:
+            pipe = redis_manager.client.pipeline(transaction=False)
+            for key, delta in deltas.items():
+                pipe.hincrby(self.KEY, key, delta)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to update room gauges {deltas}: {e}")
+
+    # ------------------------------------------------------------------
+    # 读取与校准
+    # ------------------------------------------------------------------
+
+    def read(self) -> dict[str, int]:
+        """{字段: 值}；从未校准过或 Redis 不可用时用校准查询的结果"""
+        try:
+            values = redis_manager.client.hgetall(self.KEY)
+        except Exception as e:
+            logger.warning(f"Failed to read room gauges, counting from the database: {e}")
+            values = None
+        if not values:
+            return self.reconcile()
+        return {key: int(float(value)) for key, value in values.items()}
+
+    def by_status_and_phase(self, values: dict[str, int]) -> dict[tuple[str, str], int]:
+        rooms = {}
+        for key, count in values.items():
+            if key not in self.META_FIELDS:
+                status, _, phase = key.partition(":")
+                rooms[(status, phase)] = count
+        return rooms
+
+    def reconcile(self) -> dict[str, int]:
+        """一条分组查询重算全部计数，整体替换 Redis 中的值；返回新值"""
+        values: dict[str, int] = {"players": 0, "orphaned": 0}
+        for status, phase, rooms, players, empty in room_repo.count_rooms_and_players():
+            values[self.field(status, phase)] = rooms
+            values["players"] += players
+            values["orphaned"] += empty
+        values["reconciled_at"] = int(time.time())
+        try:
+            pipe = redis_manager.client.pipeline(transaction=True)
+            pipe.delete(self.KEY)
+            pipe.hset(self.KEY, mapping=values)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to store reconciled room gauges: {e}")
+        logger.info(f"Room gauges reconciled: {values}")
+        return values
+
+    def maybe_reconcile(self) -> bool:
+        """每 ROOM_GAUGE_RECONCILE_SECONDS 秒由一个进程校准一次（Redis SET NX 选出执行者）"""
+        try:
+            if not redis_manager.client.set(self.RECONCILE_LOCK_KEY, "1", nx=True, ex=settings.ROOM_GAUGE_RECONCILE_SECONDS):
+                return False
+        except Exception as e:
+            logger.warning(f"Room gauge reconcile lock failed: {e}")
+            return False
+        self.reconcile()
+        return True
+
+
+room_gauge_service = RoomGaugeService()
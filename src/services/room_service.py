@@ -4,9 +4,12 @@ from datetime import UTC
 
 from src.app_factory import db
 from src.exceptions.biz.room_exceptions import RoomFullError, RoomNotFoundError, RoomStateError
+from src.fsm import role_tables
 from src.models.sql_models import GameState, Room, User
 from src.repositories.room_repository import room_repo
 from src.repositories.user_repository import user_repo
+from src.services.room_gauge_service import room_gauge_service
+from src.utils import deadline
 from src.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -29,12 +32,20 @@ class RoomService:
         )
         room.game_state = game_state
 
-        # 4. Set user's current room
+        deadline.check("create_room")
+
+        # 4. Set user's current room (flush first: the room has no id until it is inserted)
         owner = user_repo.get_by_openid(owner_openid)
+        joined = bool(owner) and owner.current_room_id is None
         if owner:
+            db.session.add(room)
+            db.session.flush()
             owner.current_room_id = room.id
 
         room_repo.save(room)
+        if owner:
+            user_repo.remember_room(owner_openid, room_number)
+        room_gauge_service.room_created(joined)
         logger.info(f"Room {room_number} created by {owner_openid}")
         return room
 
@@ -57,17 +68,55 @@ class RoomService:
         # Update players list
         players.append(user_openid)
         room.game_state.players = players
+        # /status renders are cached per room version
+        room.version = (room.version or 1) + 1
 
         # Update user's current room
         user = user_repo.get_by_openid(user_openid)
+        joined = bool(user) and user.current_room_id is None
         if user:
             user.current_room_id = room.id
 
+        deadline.check("join_room")
         room_repo.update_game_state(room.game_state)
+        if user:
+            user_repo.remember_room(user_openid, room_number)
+        if joined:
+            room_gauge_service.player_joined()
 
         logger.info(f"User {user_openid} joined room {room_number}")
         return room
 
+    def set_role_variant(self, room_number: str, operator_openid: str, variant: str, preset: list[str] | None = None) -> Room:
+        """房主在开局前选择板子；自定义板子需给出完整角色列表"""
+        room = room_repo.get_by_number(room_number)
+        if not room:
+            raise RoomNotFoundError(room_number)
+
+        if room.owner_id != operator_openid:
+            raise RoomStateError("只有房主可以设置板子")
+
+        if room.status != "WAITING":
+            raise RoomStateError("游戏已经开始，无法更换板子")
+
+        key = role_tables.VARIANT_ALIASES.get(variant)
+        if key is None:
+            raise RoomStateError(f"未知板子: {variant}（可选: {'、'.join(role_tables.VARIANTS)}）")
+
+        options = {"variant": key}
+        if key == role_tables.CUSTOM:
+            roles = [r.upper() for r in preset or []]
+            try:
+                role_tables.validate(roles)
+            except role_tables.RoleTableError as e:
+                raise RoomStateError(str(e)) from None
+            options["preset"] = roles
+
+        deadline.check("set_role_variant")
+        room_repo.set_options(room, options)
+        logger.info(f"Room {room_number} role variant set to {key}")
+        return room
+
     def _generate_room_number(self) -> str:
         # Simple random 4-char digit string
         for _ in range(10):  # Try 10 times to find unique
@@ -84,9 +133,13 @@ class RoomService:
         stale_rooms = Room.query.filter(Room.updated_at < threshold).all()
         count = len(stale_rooms)
         for room in stale_rooms:
+            state = room_gauge_service.state_of(room)
             # Clear user current_room_id
+            members = [openid for (openid,) in User.query.filter_by(current_room_id=room.id).with_entities(User.openid)]
             User.query.filter_by(current_room_id=room.id).update({"current_room_id": None})
             room_repo.delete(room)
+            user_repo.forget_rooms(members)
+            room_gauge_service.rooms_deleted([state], len(members))
 
         db.session.commit()
         logger.info(f"Cleaned up {count} stale rooms inactive since {threshold}")
@@ -0,0 +1,169 @@
+"""
+蒙特卡洛对局模拟服务 - 用 src/strategies 中的机器人策略在进程池中批量对局，输出平衡性报告
+
+只依赖纯规则引擎 (src.fsm.engine)，不访问数据库 / Redis。
+同一个 seed 与 chunk_size 下结果完全一致，与 worker 数量无关（每个分块有自己的随机数种子）。
+"""
+
+import random
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from src.fsm import engine, role_tables
+from src.fsm.avalon_fsm import GOOD_ROLES, GamePhase
+from src.services.game_service import game_service
+from src.strategies import POLICIES
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 对局结局（胜方 + 胜利方式）
+OUTCOMES = ("GOOD", "EVIL_QUESTS", "EVIL_REJECTIONS", "EVIL_ASSASSIN")
+_ROLE_ORDER = ("MERLIN", "PERCIVAL", "LOYAL", "ASSASSIN", "MORGANA", "MORDRED", "OBERON", "MINION")
+
+
+def play_game(player_count: int, policy, rng: random.Random, variant: str = role_tables.CLASSIC) -> tuple[tuple[str, ...], str]:
+    """完整模拟一局，返回 (角色配置, 结局)"""
+    seats = list(range(player_count))
+    roles = game_service._assign_roles(seats, rng, {"variant": variant})
+    g = engine.new_game([roles[seat] for seat in seats])
+
+    while g.phase is not GamePhase.GAME_OVER:
+        if g.phase is GamePhase.TEAM_SELECTION:
+            g, _ = engine.pick(g, g.leader, policy.pick(g, g.leader, rng))
+        elif g.phase is GamePhase.TEAM_VOTE:
+            for seat in seats:
+                g, _ = engine.vote(g, seat, policy.vote(g, seat, rng))
+        elif g.phase is GamePhase.QUEST_PERFORM:
+            for seat in g.team:
+                g, _ = engine.quest(g, seat, policy.quest(g, seat, rng))
+        else:
+            assassin = g.roles.index("ASSASSIN")
+            g, _ = engine.shoot(g, assassin, policy.shoot(g, assassin, rng))
+
+    return g.roles, _outcome(g)
+
+
+def role_set(roles) -> str:
+    """与座位无关的角色配置，如 'MERLIN PERCIVAL LOYAL | ASSASSIN MORGANA'"""
+    good = sorted((r for r in roles if r in GOOD_ROLES), key=_ROLE_ORDER.index)
+    evil = sorted((r for r in roles if r not in GOOD_ROLES), key=_ROLE_ORDER.index)
+    return f"{' '.join(good)} | {' '.join(evil)}"
+
+
+def _outcome(g: engine.Game) -> str:
+    if g.winner == "GOOD":
+        return "GOOD"
+    if g.vote_track >= engine.MAX_REJECTIONS:
+        return "EVIL_REJECTIONS"
+    if g.results.count(False) >= 3:
+        return "EVIL_QUESTS"
+    return "EVIL_ASSASSIN"
+
+
+def _run_chunk(args: tuple[int, str, str, int, int, int]) -> tuple[Counter, float]:
+    """进程池任务：跑一个分块，返回 ({(人数, 角色配置, 结局): 局数}, CPU 秒数)"""
+    seed, policy_name, variant, player_count, chunk_index, games = args
+    rng = random.Random(f"{seed}:{player_count}:{chunk_index}")
+    policy = POLICIES[policy_name]()
+    tally: Counter = Counter()
+
+    start = time.process_time()
+    for _ in range(games):
+        roles, outcome = play_game(player_count, policy, rng, variant)
+        tally[player_count, role_set(roles), outcome] += 1
+    return tally, time.process_time() - start
+
+
+class SimulationService:
+    """批量对局模拟"""
+
+    DEFAULT_CHUNK_SIZE = 2000
+
+    def run(
+        self,
+        games: int,
+        player_counts: list[int],
+        policy: str = "heuristic",
+        seed: int = 0,
+        workers: int = 1,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        variant: str = role_tables.CLASSIC,
+    ) -> dict:
+        """
+        每个人数各模拟 games 局
+        Args:
+            games: 每个人数的对局数
+            player_counts: 人数列表（5-10）
+            policy: 策略名，见 src.strategies.POLICIES
+            seed: 随机种子
+            workers: 进程数；1 表示在当前进程内运行
+            chunk_size: 每个进程池任务的对局数（影响随机数流，复现时需保持一致）
+            variant: 板子，见 src.fsm.role_tables.VARIANTS（不含 custom）
+        Returns:
+            dict: tally {(人数, 角色配置, 结局): 局数}，games 总局数，wall_seconds，cpu_seconds
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy: {policy} (available: {', '.join(POLICIES)})")
+        tables = role_tables.VARIANTS[variant].tables if variant in role_tables.VARIANTS else {}
+        for count in player_counts:
+            if count not in tables:
+                raise ValueError(f"Unsupported player count for variant {variant!r}: {count}")
+
+        tasks = []
+        for count in player_counts:
+            for index, offset in enumerate(range(0, games, chunk_size)):
+                tasks.append((seed, policy, variant, count, index, min(chunk_size, games - offset)))
+
+        tally: Counter = Counter()
+        cpu_seconds = 0.0
+        start = time.perf_counter()
+        pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            for chunk_tally, chunk_cpu in (pool.map if pool else map)(_run_chunk, tasks):
+                tally.update(chunk_tally)
+                cpu_seconds += chunk_cpu
+        finally:
+            if pool:
+                pool.shutdown()
+        wall_seconds = time.perf_counter() - start
+
+        total = games * len(player_counts)
+        logger.info(f"Simulated {total} games ({policy}, {variant}, seed={seed}) in {wall_seconds:.2f}s on {workers} workers")
+        return {"tally": tally, "games": total, "wall_seconds": wall_seconds, "cpu_seconds": cpu_seconds}
+
+    def format_report(self, result: dict) -> list[str]:
+        """按人数 / 角色配置 / 任务人数表汇总胜率"""
+        tally = result["tally"]
+        by_count: dict[int, Counter] = {}
+        by_roles: dict[tuple[int, str], Counter] = {}
+        for (count, roles, outcome), n in tally.items():
+            by_count.setdefault(count, Counter())[outcome] += n
+            by_roles.setdefault((count, roles), Counter())[outcome] += n
+
+        lines = [f"{'人数':>4} {'任务人数表':<12} {'局数':>10} {'好人胜':>8} " + " ".join(f"{o:>16}" for o in OUTCOMES[1:])]
+        for count in sorted(by_count):
+            outcomes = by_count[count]
+            games = sum(outcomes.values())
+            sizes = "-".join(str(s) for s in engine.QUEST_SIZES[count])
+            evil = " ".join(f"{_pct(outcomes[o], games):>16}" for o in OUTCOMES[1:])
+            lines.append(f"{count:>4} {sizes:<12} {games:>10} {_pct(outcomes['GOOD'], games):>8} {evil}")
+
+        lines.append("")
+        lines.append("按角色配置:")
+        for (count, roles), outcomes in sorted(by_roles.items()):
+            games = sum(outcomes.values())
+            lines.append(f"  {count}人 {roles:<52} {games:>10} 局  好人胜 {_pct(outcomes['GOOD'], games)}")
+
+        cpu = result["cpu_seconds"] or float("nan")
+        lines.append("")
+        lines.append(f"共 {result['games']} 局，耗时 {result['wall_seconds']:.2f}s，单核吞吐 {result['games'] / cpu:,.0f} 局/秒")
+        return lines
+
+
+def _pct(part: int, whole: int) -> str:
+    return f"{part / whole * 100:.1f}%" if whole else "-"
+
+
+simulation_service = SimulationService()
@@ -0,0 +1,96 @@
+"""用户战绩统计服务 - 从对局历史校准 User 上的增量计数器"""
+
+from collections import Counter, defaultdict
+
+from sqlalchemy import update
+
+from src.app_factory import db
+from src.models.sql_models import GameHistory, User
+from src.repositories.user_repository import user_repo
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class StatsService:
+    """战绩计数器校准服务"""
+
+    DEFAULT_BATCH_SIZE = 500
+
+    def reconcile_user_counters(self, batch_size: int = DEFAULT_BATCH_SIZE, fix: bool = True) -> dict:
+        """
+        按批次从 game_history 重新计算每个用户的计数器，并与 users 表中的值比对
+        Args:
+            batch_size: 每批读取的历史/用户行数（按主键分页）
+            fix: 是否把偏差写回 users 表
+        Returns:
+            dict: histories / users 扫描数量，drifted 偏差用户数，drift 明细 {openid: {column: (actual, expected)}}
+        """
+        expected, history_count = self._recompute_from_history(batch_size)
+        columns = User.counter_columns()
+
+        drift: dict[str, dict[str, tuple[int, int]]] = {}
+        user_count = 0
+        last_id = 0
+        while True:
+            users = User.query.filter(User.id > last_id).order_by(User.id).limit(batch_size).all()
+            if not users:
+                break
+            last_id = users[-1].id
+            user_count += len(users)
+
+            fixes = []
+            for user in users:
+                want = expected.get(user.openid, Counter())
+                diff = {}
+                for column in columns:
+                    actual = getattr(user, column) or 0
+                    if actual != want[column]:
+                        diff[column] = (actual, want[column])
+                if diff:
+                    drift[user.openid] = diff
+                    fixes.append({"id": user.id, **{column: want[column] for column in columns}})
+
+            if fix and fixes:
+                # Bulk UPDATE by primary key (executemany), one commit per batch
+                db.session.execute(update(User), fixes)
+                db.session.commit()
+
+        if drift:
+            logger.warning(f"Counter drift found for {len(drift)} users (fixed: {fix})")
+        logger.info(f"Reconciled counters: {history_count} histories, {user_count} users, {len(drift)} drifted")
+
+        return {"histories": history_count, "users": user_count, "drifted": len(drift), "drift": drift}
+
+    def _recompute_from_history(self, batch_size: int) -> tuple[dict[str, Counter], int]:
+        expected: dict[str, Counter] = defaultdict(Counter)
+        history_count = 0
+        last_id = 0
+        while True:
+            # Column tuples instead of entities: nothing lands in the identity map
+            batch = (
+                db.session.query(GameHistory.id, GameHistory.players, GameHistory.winner_team, GameHistory.replay_data)
+                .filter(GameHistory.id > last_id)
+                .order_by(GameHistory.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+            history_count += len(batch)
+
+            for h in batch:
+                roles = dict((h.replay_data or {}).get("roles") or {})
+                # Players without a recorded role were counted as evil by the old history scan
+                for openid in h.players or []:
+                    roles.setdefault(openid, None)
+                for column, openids in user_repo.counter_increments(roles, h.winner_team).items():
+                    for openid in openids:
+                        expected[openid][column] += 1
+
+        return expected, history_count
+
+
+# Singleton
+stats_service = StatsService()
@@ -0,0 +1,115 @@
+"""房间状态 (/status) 渲染服务 - 按房间版本缓存渲染结果，并合并同一进程内的并发请求"""
+
+from src.extensions.redis_ext import redis_manager
+from src.fsm.game_log import seat_index
+from src.repositories.room_repository import room_repo
+from src.repositories.user_repository import user_repo
+from src.services.game_service import game_service
+from src.utils import deadline, metrics
+from src.utils.json_utils import json_dumps, json_loads
+from src.utils.logger import get_logger
+from src.utils.singleflight import SingleFlight
+
+logger = get_logger(__name__)
+
+
+class StatusService:
+    """
+    每次状态变化都会递增 room.version，所以 (房间号, 版本) 下的渲染结果永不过期，只需等 TTL 回收：
+    - 公共部分 cache:status:{房间号}:v{版本}        所有玩家相同（附带 openid -> 座位表）
+    - 座位部分 cache:status:{房间号}:v{版本}:{座位}  该座位的身份与夜间信息
+    未命中时加载一次房间，把公共部分和所有座位部分一起渲染写入。
+    """
+
+    CACHE_PREFIX = "cache:status:"
+    CACHE_TTL = 600  # 10 minutes
+
+    def __init__(self):
+        self._flight = SingleFlight()
+
+    def render(self, openid: str) -> str:
+        head = user_repo.get_current_room_version(openid)
+        if not head:
+            return "你当前不在任何房间中。"
+        room_number, version = head
+
+        cached = self._read_cache(room_number, version, openid)
+        metrics.cache_lookup("status", hits=int(bool(cached)), misses=int(not cached))
+        if cached:
+            return cached
+
+        # 阶段切换后的一波 /status：同一 worker 内只有第一个请求加载并渲染，其余等待共享结果
+        entry = self._flight.do((room_number, version), lambda: self._build(room_number))
+        if not entry:
+            return "你当前不在任何房间中。"
+        seat = entry["seats"].get(openid)
+        return self._compose(entry["text"], entry["seat_texts"].get(seat) if entry["playing"] else None)
+
+    def _read_cache(self, room_number: str, version: int, openid: str) -> str | None:
+        key = self._key(room_number, version)
+        try:
+            shared = json_loads(redis_manager.client.get(key))
+            if not shared:
+                return None
+            if not shared["playing"]:
+                return shared["text"]
+            seat = shared["seats"].get(openid)
+            seat_text = redis_manager.client.get(f"{key}:{seat}") if seat is not None else None
+            if seat is not None and seat_text is None:
+                return None
+            return self._compose(shared["text"], seat_text)
+        except Exception as e:
+            logger.warning(f"Status cache read failed for room {room_number}: {e}")
+            return None
+
+    def _build(self, room_number: str) -> dict | None:
+        deadline.check("status")
+        room = room_repo.get_by_number(room_number)
+        if not room or not room.game_state:
+            return None
+
+        gs = room.game_state
+        playing = room.status == "PLAYING"
+        seat_of = seat_index(gs)
+        names = game_service.player_names(room)
+        entry = {
+            "text": self._render_shared(room, seat_of, names),
+            "seats": seat_of,
+            "playing": playing,
+            "seat_texts": {seat: game_service.get_player_info(room, openid, names) for openid, seat in seat_of.items()} if playing else {},
+        }
+
+        key = self._key(room_number, room.version or 1)
+        try:
+            pipe = redis_manager.client.pipeline(transaction=False)
+            pipe.set(key, json_dumps({"text": entry["text"], "seats": seat_of, "playing": playing}), ex=self.CACHE_TTL)
+            for seat, text in entry["seat_texts"].items():
+                pipe.set(f"{key}:{seat}", text, ex=self.CACHE_TTL)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Status cache write failed for room {room_number}: {e}")
+        return entry
+
+    @staticmethod
+    def _render_shared(room, seat_of: dict[str, int], names: list[str]) -> str:
+        gs = room.game_state
+        text = f"【房间 {room.room_number} 状态】\n- 状态: {room.status}\n- 阶段: {gs.phase}\n- 玩家人数: {len(gs.players)}/10"
+        if room.status == "PLAYING":
+            text += f"\n- 当前轮次: 第 {gs.round_num} 局"
+            text += f"\n- 连续失败: {gs.vote_track}/5"
+            text += f"\n- 当前队长: {names[gs.leader_idx]}"
+            if gs.phase in ["TEAM_VOTE", "QUEST_PERFORM"]:
+                text += f"\n- 当前队伍: {'、'.join(names[seat_of[p]] for p in gs.current_team)}"
+        else:
+            text += f"\n- 玩家: {'、'.join(names)}"
+        return text
+
+    @staticmethod
+    def _compose(shared: str, seat_text: str | None) -> str:
+        return f"{shared}\n\n{seat_text}" if seat_text else shared
+
+    def _key(self, room_number: str, version: int) -> str:
+        return f"{self.CACHE_PREFIX}{room_number}:v{version}"
+
+
+status_service = StatusService()
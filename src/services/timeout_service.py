@@ -6,9 +6,12 @@
 import random
 from datetime import UTC, datetime
 
+from src.fsm.game_log import seat_index
 from src.models.sql_models import Room
 from src.repositories.room_repository import room_repo
 from src.services.game_service import game_service
+from src.strategies import AutoPlayPolicy
+from src.utils import metrics
 from src.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -27,16 +30,18 @@ class TimeoutService:
         检查并处理所有超时的游戏
         """
         try:
-            # 查询所有正在进行的游戏
-            active_rooms = Room.query.filter_by(status="PLAYING").all()
+            with metrics.TIMEOUT_TICK_SECONDS.time():
+                # 查询所有正在进行的游戏
+                active_rooms = room_repo.get_playing_rooms()
 
-            processed_count = 0
+                processed_count = 0
 
-            for room in active_rooms:
-                if self._check_room_timeout(room):
-                    processed_count += 1
+                for room in active_rooms:
+                    if self._check_room_timeout(room):
+                        processed_count += 1
 
             if processed_count > 0:
+                metrics.TIMEOUT_EXPIRED_ROOMS.inc(processed_count)
                 logger.info(f"Processed {processed_count} timed out rooms")
 
             return processed_count
@@ -93,30 +98,18 @@ class TimeoutService:
                 return False
 
             # 为未投票的玩家随机投票
+            seat_of = seat_index(gs)
+            auto_votes = []
             for player in not_voted:
                 # 好人倾向同意（70% yes），坏人倾向反对（60% no）
                 role = gs.roles_config.get(player)
-                if role in ["MERLIN", "PERCIVAL", "LOYAL"]:
-                    vote = "yes" if random.random() < 0.7 else "no"
-                else:
-                    vote = "no" if random.random() < 0.6 else "yes"
+                vote = AutoPlayPolicy.auto_vote(role, random)
 
-                votes[player] = vote
-                # 使用列表的 index 方法，而不是可能返回 Mock 的对象方法
-                try:
-                    player_num = players.index(player) + 1
-                except (ValueError, AttributeError):
-                    player_num = 1
-                logger.info(f"Auto-vote for player {player_num} ({role}): {vote} (timeout)")
+                auto_votes.append([seat_of[player], vote])
+                logger.info(f"Auto-vote for player {seat_of[player] + 1} ({role}): {vote} (timeout)")
 
-            gs.votes = votes
-            gs.phase_start_time = datetime.now(UTC).replace(tzinfo=None)  # 重置时间
-
-            # 保存并处理投票结果
-            room_repo.update_game_state(gs)
-
-            # 触发投票结果处理
-            game_service._process_vote_result(room)
+            # 交给引擎：记录超时事件（重置阶段时间）并结算投票
+            game_service.play_timeout(room, auto_votes)
 
             return True
 
@@ -145,32 +138,19 @@ class TimeoutService:
                 return False
 
             # 为未执行的玩家随机执行
+            seat_of = seat_index(gs)
+            auto_votes = []
             for player in not_voted:
                 role = gs.roles_config.get(player)
 
                 # 好人必须成功，坏人可以失败（40% 概率失败）
-                if role in ["MERLIN", "PERCIVAL", "LOYAL"]:
-                    vote = "success"
-                else:
-                    vote = "fail" if random.random() < 0.4 else "success"
-
-                quest_votes[player] = vote
-                players = gs.players
-                # 使用列表的 index 方法，而不是可能返回 Mock 的对象方法
-                try:
-                    player_num = players.index(player) + 1
-                except (ValueError, AttributeError):
-                    player_num = 1
-                logger.info(f"Auto-quest for player {player_num} ({role}): {vote} (timeout)")
-
-            gs.quest_votes = quest_votes
-            gs.phase_start_time = datetime.now(UTC).replace(tzinfo=None)  # 重置时间
-
-            # 保存并处理任务结果
-            room_repo.update_game_state(gs)
-
-            # 触发任务结果处理
-            game_service._process_quest_result(room)
+                vote = AutoPlayPolicy.auto_card(role, random)
+
+                auto_votes.append([seat_of[player], vote])
+                logger.info(f"Auto-quest for player {seat_of[player] + 1} ({role}): {vote} (timeout)")
+
+            # 交给引擎：记录超时事件（重置阶段时间）并结算任务
+            game_service.play_timeout(room, auto_votes)
 
             return True
 
@@ -0,0 +1,7 @@
+from src.strategies.base import Policy
+from src.strategies.bots import AutoPlayPolicy, HeuristicPolicy, RandomPolicy
+
+# name -> policy class, as accepted by `flask simulate --policy`
+POLICIES = {cls.name: cls for cls in (RandomPolicy, AutoPlayPolicy, HeuristicPolicy)}
+
+__all__ = ["POLICIES", "AutoPlayPolicy", "HeuristicPolicy", "Policy", "RandomPolicy"]
@@ -0,0 +1,48 @@
+"""
+Bot policy interface.
+
+A policy decides moves for any seat from the engine state alone (`src.fsm.engine.Game`), so the same
+object can drive every seat of a simulated game. `rng` is a `random.Random` (or the `random` module)
+owned by the caller, which keeps seeded runs reproducible.
+"""
+
+from abc import ABC, abstractmethod
+
+from src.fsm.avalon_fsm import AvalonFSM
+from src.fsm.engine import Game, night_knowledge
+
+
+class Policy(ABC):
+    name = "base"
+
+    @abstractmethod
+    def pick(self, g: Game, seat: int, rng) -> list[int]:
+        """Team proposed by the leader at `seat`; must have g.quest_size distinct seats."""
+
+    @abstractmethod
+    def vote(self, g: Game, seat: int, rng) -> bool:
+        """True = approve the current team."""
+
+    @abstractmethod
+    def quest(self, g: Game, seat: int, rng) -> bool:
+        """True = success card."""
+
+    @abstractmethod
+    def shoot(self, g: Game, seat: int, rng) -> int:
+        """Assassination target chosen by the assassin at `seat`."""
+
+
+def is_evil(role: str | None) -> bool:
+    return AvalonFSM.get_team(role) == "EVIL"
+
+
+def known_evil(g: Game, seat: int) -> set[int]:
+    """Seats `seat` knows to be evil after the night phase (Percival's candidates are not evil)."""
+    if g.roles[seat] == "PERCIVAL":
+        return set()
+    return set(night_knowledge(g.roles)[seat])
+
+
+def merlin_candidates(g: Game, seat: int) -> tuple[int, ...]:
+    """Percival's view: the seats that may be Merlin (Merlin and Morgana, undistinguished); empty for other roles."""
+    return night_knowledge(g.roles)[seat] if g.roles[seat] == "PERCIVAL" else ()
@@ -0,0 +1,156 @@
+"""
+Built-in bot policies.
+
+- RandomPolicy:    uniform random choices; good players still always succeed quests.
+- AutoPlayPolicy:  the odds the timeout checker uses when a player runs out of time.
+- HeuristicPolicy: plays on night knowledge and the quest record (good avoids known and suspected evil,
+                   evil fails every quest it joins).
+"""
+
+from src.fsm.avalon_fsm import GamePhase
+from src.fsm.engine import Game
+from src.strategies.base import Policy, is_evil, known_evil, merlin_candidates
+
+
+class RandomPolicy(Policy):
+    name = "random"
+
+    def pick(self, g: Game, seat: int, rng) -> list[int]:
+        return rng.sample(range(g.n), g.quest_size)
+
+    def vote(self, g: Game, seat: int, rng) -> bool:
+        return rng.random() < 0.5
+
+    def quest(self, g: Game, seat: int, rng) -> bool:
+        return not is_evil(g.roles[seat]) or rng.random() < 0.5
+
+    def shoot(self, g: Game, seat: int, rng) -> int:
+        return rng.choice([s for s in range(g.n) if s != seat])
+
+
+class AutoPlayPolicy(RandomPolicy):
+    """Timeout auto-play; `timeout_service` calls auto_vote / auto_card directly, so tuning here changes both."""
+
+    name = "autoplay"
+    GOOD_APPROVE = 0.7  # 好人倾向同意
+    EVIL_REJECT = 0.6  # 坏人倾向反对
+    EVIL_FAIL = 0.4  # 坏人出失败的概率
+
+    @classmethod
+    def auto_vote(cls, role: str | None, rng) -> str:
+        if not is_evil(role):
+            return "yes" if rng.random() < cls.GOOD_APPROVE else "no"
+        return "no" if rng.random() < cls.EVIL_REJECT else "yes"
+
+    @classmethod
+    def auto_card(cls, role: str | None, rng) -> str:
+        # 好人必须成功
+        if not is_evil(role):
+            return "success"
+        return "fail" if rng.random() < cls.EVIL_FAIL else "success"
+
+    def vote(self, g: Game, seat: int, rng) -> bool:
+        return self.auto_vote(g.roles[seat], rng) == "yes"
+
+    def quest(self, g: Game, seat: int, rng) -> bool:
+        return self.auto_card(g.roles[seat], rng) == "success"
+
+
+class HeuristicPolicy(Policy):
+    """
+    Evil fails every quest it joins and backs any team with an evil player on it. Good plays on what its
+    seat knows: Merlin's night view, the public record of which quest teams failed, and, for Percival,
+    which Merlin candidate that record clears.
+
+    The quest record is public information the engine state does not keep, so the policy collects it as
+    the game goes; one instance follows one game at a time and starts over when a new game shows up.
+    """
+
+    name = "heuristic"
+    SUCCESS_CREDIT = 0.5  # a success clears its team a little: evil may have played along
+
+    def __init__(self):
+        self._roles: tuple[str, ...] | None = None
+        self._quests: list[tuple[tuple[int, ...], bool]] = []  # (team, success) of each quest played
+        self._questing: tuple[int, ...] = ()
+
+    def pick(self, g: Game, seat: int, rng) -> list[int]:
+        self._observe(g)
+        if is_evil(g.roles[seat]):
+            # Evil leaders take themself plus anyone
+            return [seat] + rng.sample([s for s in range(g.n) if s != seat], g.quest_size - 1)
+        return self._best_team(g, seat, rng)
+
+    def vote(self, g: Game, seat: int, rng) -> bool:
+        self._observe(g)
+        if is_evil(g.roles[seat]):
+            # Approve any team with an evil player on it, and always on the fifth proposal
+            return g.vote_track == 4 or any(is_evil(g.roles[s]) for s in g.team)
+        if g.vote_track == 4:
+            return True
+        evil, suspicion = self._beliefs(g, seat)
+        if evil & set(g.team):
+            return False
+        if not self._quests and not evil:
+            # Nothing to go on yet
+            return True
+
+        # Approve a team no more suspect than the one this seat would propose (counting itself as clear)
+        def doubt(team):
+            return sum(suspicion[s] for s in team if s != seat)
+
+        return doubt(g.team) <= doubt(self._best_team(g, seat, rng))
+
+    def quest(self, g: Game, seat: int, rng) -> bool:
+        self._observe(g)
+        return not is_evil(g.roles[seat])
+
+    def shoot(self, g: Game, seat: int, rng) -> int:
+        self._observe(g)
+        # Anyone not known to be evil is a Merlin candidate
+        allies = known_evil(g, seat)
+        return rng.choice([s for s in range(g.n) if s != seat and s not in allies])
+
+    def _observe(self, g: Game) -> None:
+        """Records the team and outcome of each quest; every game has its own roles tuple."""
+        if g.roles is not self._roles:
+            self._roles, self._quests, self._questing = g.roles, [], ()
+        if len(g.results) > len(self._quests):
+            self._quests.append((self._questing, g.results[-1]))
+        if g.phase is GamePhase.QUEST_PERFORM:
+            self._questing = g.team
+
+    def _beliefs(self, g: Game, seat: int) -> tuple[set[int], dict[int, float]]:
+        """(seats `seat` takes to be evil, suspicion of every seat) from the night view and the quest record."""
+        evil = known_evil(g, seat)
+        suspicion = dict.fromkeys(range(g.n), 0.0)
+        for team, success in self._quests:
+            unknown = [s for s in team if s != seat and s not in evil]
+            if success:
+                for s in unknown:
+                    suspicion[s] -= self.SUCCESS_CREDIT
+            elif unknown and not evil & set(team):
+                if len(unknown) == 1:
+                    evil.add(unknown[0])  # the only one who can have failed it
+                for s in unknown:
+                    suspicion[s] += 1 / len(unknown)
+        suspicion[seat] = min(suspicion.values()) - 1
+
+        candidates = merlin_candidates(g, seat)
+        if candidates:
+            # Whichever candidate the record points at is Morgana; the other one is Merlin
+            a, b = candidates
+            if a in evil or suspicion[a] > suspicion[b]:
+                a, b = b, a
+            if b in evil or suspicion[b] > suspicion[a]:
+                evil.add(b)
+                suspicion[a] = suspicion[seat]
+        return evil, suspicion
+
+    def _best_team(self, g: Game, seat: int, rng) -> list[int]:
+        """`seat` plus the least suspect players it does not take to be evil (ties broken at random)."""
+        evil, suspicion = self._beliefs(g, seat)
+        others = [s for s in range(g.n) if s != seat]
+        rng.shuffle(others)
+        others.sort(key=lambda s: (s in evil, suspicion[s]))
+        return [seat] + others[: g.quest_size - 1]
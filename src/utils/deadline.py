@@ -0,0 +1,63 @@
+"""
+请求截止时间：微信 5 秒内收不到响应就重试，所以每条消息在一个截止时间内处理。
+- check(step): 在耗时步骤（尤其是命令唯一的那次写库）之前检查，剩余时间不足就抛 DeadlineExceededError，
+  此时尚未改变任何状态，调用方可以放到后台从头重做
+- MySQL 的 SELECT 带上 MAX_EXECUTION_TIME 提示，上限为剩余时间
+截止时间存放在 ContextVar 中，后台线程（超时检测、归档、延迟处理）没有截止时间，check 不生效。
+"""
+
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+from src.config.settings import settings
+from src.exceptions.server.server_exceptions import DeadlineExceededError
+
+_deadline: ContextVar[float | None] = ContextVar("deadline", default=None)
+
+_SELECT = re.compile(r"^\s*SELECT\b", re.IGNORECASE)
+MIN_STATEMENT_MS = 100
+
+
+@contextmanager
+def budget(seconds: float):
+    """在 seconds 秒的截止时间内执行 with 块"""
+    token = _deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> float | None:
+    """距截止时间的秒数；没有截止时间时返回 None"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def check(step: str, reserve: float | None = None) -> None:
+    """剩余时间不足 reserve 秒（默认 DEADLINE_RESERVE_SECONDS）时抛出 DeadlineExceededError"""
+    left = remaining()
+    if left is not None and left < (settings.DEADLINE_RESERVE_SECONDS if reserve is None else reserve):
+        raise DeadlineExceededError(step)
+
+
+def with_time_limit(statement: str, ms: int) -> str:
+    """给 SELECT 加上 MySQL 优化器提示 MAX_EXECUTION_TIME(ms)"""
+    return _SELECT.sub(f"SELECT /*+ MAX_EXECUTION_TIME({ms}) */", statement, count=1)
+
+
+def install_statement_limit(engine) -> None:
+    """MySQL: 请求内的每条 SELECT 最多执行到截止时间（其他方言不处理）"""
+    if engine.dialect.name != "mysql":
+        return
+
+    @event.listens_for(engine, "before_cursor_execute", retval=True)
+    def _limit_select(conn, cursor, statement, parameters, context, executemany):
+        left = remaining()
+        if left is None or executemany:
+            return statement, parameters
+        return with_time_limit(statement, max(int(left * 1000), MIN_STATEMENT_MS)), parameters
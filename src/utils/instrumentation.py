@@ -0,0 +1,127 @@
+"""
+指令级埋点：CommandDispatcher 为每条指令开启一个 CommandTrace（存放在 ContextVar 中）
+- 期间执行的数据库语句与 Redis 往返都计在当前 trace 上（install_db_counter / InstrumentedRedis）
+- phase(name) / record_phase(name, seconds) 记录分阶段耗时（加载房间、引擎判定、写库、通知）
+- 指令结束时按 CommandType 记入 Prometheus 直方图，异常按类型计数
+- 耗时超过 SLOW_COMMAND_MS 时输出一条慢指令日志，带上参数、分阶段耗时、调用次数和请求的 trace_id
+没有 trace 的代码路径（后台任务、CLI）计数与计时都直接跳过。
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from flask import g, has_app_context
+from sqlalchemy import event
+
+from src.config.settings import settings
+from src.utils import metrics
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class CommandTrace:
+    __slots__ = ("command", "args", "trace_id", "start", "phases", "db_calls", "redis_calls", "outcome")
+
+    def __init__(self, command: str, args: list[str], trace_id: str | None):
+        self.command = command
+        self.args = args
+        self.trace_id = trace_id
+        self.start = time.perf_counter()
+        self.phases: dict[str, float] = {}
+        self.db_calls = 0
+        self.redis_calls = 0
+        self.outcome = "ok"  # 处理器没有执行时由调用方改写，如 "throttled"
+
+
+_current: ContextVar[CommandTrace | None] = ContextVar("command_trace", default=None)
+
+
+def current() -> CommandTrace | None:
+    return _current.get()
+
+
+@contextmanager
+def trace_command(cmd):
+    """包住一条指令的处理过程，结束时记录指标（异常照常抛出）"""
+    trace_id = getattr(g, "trace_id", None) if has_app_context() else None
+    trace = CommandTrace(cmd.command_type.value, list(cmd.args), trace_id)
+    token = _current.set(trace)
+    error = None
+    try:
+        yield trace
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        _current.reset(token)
+        _finish(trace, time.perf_counter() - trace.start, error)
+
+
+def _finish(trace: CommandTrace, elapsed: float, error: str | None) -> None:
+    metrics.COMMANDS.labels(trace.command, "error" if error else trace.outcome).inc()
+    metrics.COMMAND_SECONDS.labels(trace.command).observe(elapsed)
+    metrics.COMMAND_DB_CALLS.labels(trace.command).observe(trace.db_calls)
+    metrics.COMMAND_REDIS_CALLS.labels(trace.command).observe(trace.redis_calls)
+    if error:
+        metrics.COMMAND_ERRORS.labels(trace.command, error).inc()
+
+    if elapsed * 1000 >= settings.SLOW_COMMAND_MS:
+        phases = ", ".join(f"{name} {seconds * 1000:.1f}" for name, seconds in trace.phases.items())
+        logger.warning(
+            f"Slow command {trace.command} {trace.args} took {elapsed * 1000:.1f}ms "
+            f"({phases or 'no phases'}; db {trace.db_calls}, redis {trace.redis_calls}"
+            f"{f', error {error}' if error else ''}) trace_id={trace.trace_id}",
+            extra={
+                "context": {
+                    "command": trace.command,
+                    "args": trace.args,
+                    "elapsed_ms": round(elapsed * 1000, 1),
+                    "phases_ms": {name: round(seconds * 1000, 1) for name, seconds in trace.phases.items()},
+                    "db_calls": trace.db_calls,
+                    "redis_calls": trace.redis_calls,
+                    "error": error,
+                    "trace_id": trace.trace_id,
+                }
+            },
+        )
+
+
+@contextmanager
+def phase(name: str):
+    """给当前指令记一段分阶段耗时（同名阶段累加）"""
+    if _current.get() is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(name, time.perf_counter() - start)
+
+
+def record_phase(name: str, seconds: float) -> None:
+    trace = _current.get()
+    if trace is not None:
+        trace.phases[name] = trace.phases.get(name, 0.0) + seconds
+
+
+def count_db_call() -> None:
+    trace = _current.get()
+    if trace is not None:
+        trace.db_calls += 1
+
+
+def count_redis_call() -> None:
+    trace = _current.get()
+    if trace is not None:
+        trace.redis_calls += 1
+
+
+def install_db_counter(engine) -> None:
+    """每条 SQL 语句计入当前指令"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        count_db_call()
@@ -0,0 +1,84 @@
+"""
+Prometheus 指标定义（prometheus_client 默认注册表）
+
+gunicorn 多 worker 部署时设置环境变量 PROMETHEUS_MULTIPROC_DIR（见 Dockerfile 与 gunicorn.conf.py）：
+每个进程把指标值写到该目录下的 mmap 文件，/metrics 由 MultiProcessCollector 汇总所有 worker 的值。
+Gauge 需要声明 multiprocess_mode，未设置该变量时（开发、测试）按普通单进程指标工作。
+"""
+
+import os
+import time
+
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import event
+
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+if MULTIPROC_DIR:
+    # 同一镜像的 CLI / CronJob 进程也会写指标文件，目录不存在时 prometheus_client 会直接报错
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+# 指令处理耗时（秒），微信 5 秒超时，预算 4 秒
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0)
+# 单条指令的数据库语句 / Redis 命令数
+CALL_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+HTTP_SECONDS = Histogram("avalon_http_request_duration_seconds", "HTTP 请求耗时", ["endpoint", "method", "status"], buckets=LATENCY_BUCKETS)
+
+COMMANDS = Counter("avalon_commands_total", "处理的指令数", ["command", "outcome"])  # outcome: ok / error / throttled
+COMMAND_SECONDS = Histogram("avalon_command_duration_seconds", "指令处理耗时", ["command"], buckets=LATENCY_BUCKETS)
+COMMAND_ERRORS = Counter("avalon_command_errors_total", "指令处理抛出的异常", ["command", "error"])
+COMMAND_DB_CALLS = Histogram("avalon_command_db_statements", "每条指令执行的数据库语句数", ["command"], buckets=CALL_BUCKETS)
+COMMAND_REDIS_CALLS = Histogram("avalon_command_redis_calls", "每条指令的 Redis 往返次数（pipeline 计一次）", ["command"], buckets=CALL_BUCKETS)
+
+CACHE_LOOKUPS = Counter("avalon_cache_lookups_total", "Redis 缓存查找", ["cache", "result"])  # result: hit / miss
+
+DB_POOL_CHECKED_OUT = Gauge("avalon_db_pool_checked_out", "正在使用的数据库连接", multiprocess_mode="livesum")
+DB_POOL_CONNECTIONS = Gauge("avalon_db_pool_connections", "连接池中已建立的数据库连接", multiprocess_mode="livesum")
+
+TIMEOUT_TICK_SECONDS = Histogram("avalon_timeout_check_duration_seconds", "超时检测一轮的耗时", buckets=LATENCY_BUCKETS)
+TIMEOUT_EXPIRED_ROOMS = Counter("avalon_timeout_expired_rooms_total", "因阶段超时被自动处理的房间")
+
+
+def cache_lookup(cache: str, hits: int, misses: int = 0) -> None:
+    """记录一次（批量）缓存查找的命中与未命中数"""
+    if hits:
+        CACHE_LOOKUPS.labels(cache, "hit").inc(hits)
+    if misses:
+        CACHE_LOOKUPS.labels(cache, "miss").inc(misses)
+
+
+def install_pool_metrics(engine) -> None:
+    """用连接池事件维护连接数（多进程下各 worker 的值相加）"""
+
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_connection, connection_record):
+        DB_POOL_CONNECTIONS.inc()
+
+    @event.listens_for(engine, "close")
+    def _close(dbapi_connection, connection_record):
+        DB_POOL_CONNECTIONS.dec()
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_POOL_CHECKED_OUT.inc()
+
+    @event.listens_for(engine, "checkin")
+    def _checkin(dbapi_connection, connection_record):
+        DB_POOL_CHECKED_OUT.dec()
+
+
+def install_http_metrics(app) -> None:
+    """按路由记录请求耗时（url_rule 而不是原始路径，避免标签基数失控）"""
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def _observe(response):
+        started = g.pop("request_started", None)
+        if started is not None:
+            endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+            HTTP_SECONDS.labels(endpoint, request.method, str(response.status_code)).observe(time.perf_counter() - started)
+        return response
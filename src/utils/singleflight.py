@@ -0,0 +1,47 @@
+"""
+进程内请求合并 (single flight)：同一个 key 的并发调用只执行一次，其余调用等待并共享结果
+"""
+
+import threading
+from collections.abc import Callable
+from typing import Any
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[Any, _Call] = {}
+
+    def do(self, key, fn: Callable[[], Any]) -> Any:
+        """执行 fn()；若同 key 的调用正在进行，则等待它完成并返回同一结果（或抛出同一异常）"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
@@ -10,12 +10,14 @@ class CommandType(Enum):
     JOIN_ROOM = "join_room"
     START_GAME = "start_game"
     SET_NICKNAME = "set_nickname"
+    SET_ROLES = "set_roles"
     STATUS = "status"
     PICK_TEAM = "pick_team"
     VOTE = "vote"
     QUEST = "quest"
     SHOOT = "shoot"  # Assassination
     PROFILE = "profile"
+    RANK = "rank"
     HELP = "help"
     UNKNOWN = "unknown"
 
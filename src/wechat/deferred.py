@@ -0,0 +1,58 @@
+"""
+延迟处理：请求在截止时间前没能完成时先回复"已受理"，由后台线程重新执行该指令。
+截止检查都放在指令唯一的写操作之前，抛出 DeadlineExceededError 时尚未改变任何状态，所以从头重做是安全的。
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from wechatpy import create_reply
+
+from src.exceptions.base import BizException, ClientException
+from src.utils.logger import get_logger
+from src.wechat.idempotency import reply_cache
+
+logger = get_logger(__name__)
+
+ACCEPTED_REPLY = "已收到你的指令，正在处理中，结果稍后发送给你。"
+
+
+class DeferredCommands:
+    MAX_WORKERS = 4
+
+    def __init__(self):
+        self._pool = ThreadPoolExecutor(max_workers=self.MAX_WORKERS, thread_name_prefix="DeferredCommand")
+        self._listeners = []
+
+    def add_listener(self, listener) -> None:
+        """listener(openid, reply_text) 在后台处理完成后调用，用于把结果推送给玩家"""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def submit(self, app, msg, content: str, openid: str):
+        return self._pool.submit(self.run, app, msg, content, openid)
+
+    def run(self, app, msg, content: str, openid: str) -> str:
+        """在新的 app context 中（没有截止时间）执行指令，回复写入幂等缓存并通知监听者"""
+        from src.wechat.handlers import dispatcher
+        from src.wechat.parser import parser
+
+        with app.app_context():
+            try:
+                reply_text = dispatcher.dispatch(parser.parse(content, openid))
+            except (BizException, ClientException) as e:
+                reply_text = f"提示: {e.message}"
+            except Exception as e:
+                logger.error(f"Deferred command from {openid} failed: {e}", exc_info=True)
+                reply_text = "系统繁忙，请稍后再试"
+
+            reply_cache.finish(msg.id, create_reply(reply_text, message=msg).render())
+            for listener in self._listeners:
+                try:
+                    listener(openid, reply_text)
+                except Exception as e:
+                    logger.warning(f"Deferred reply listener failed for {openid}: {e}")
+            logger.info(f"Deferred command from {openid} finished: {content}")
+            return reply_text
+
+
+deferred_commands = DeferredCommands()
@@ -1,9 +1,14 @@
 from abc import ABC, abstractmethod
 
+from src.fsm import role_tables
 from src.repositories.user_repository import user_repo
 from src.services.game_service import game_service
+from src.services.leaderboard_service import leaderboard_service
 from src.services.room_service import room_service
+from src.services.status_service import status_service
+from src.utils import instrumentation
 from src.wechat.commands import Command, CommandType
+from src.wechat.rate_limit import THROTTLED_REPLY, rate_limiter
 
 
 class CommandHandler(ABC):
@@ -32,36 +37,39 @@ class StartGameHandler(CommandHandler):
             return "你当前不在任何房间中。"
 
         room = game_service.start_game(room.room_number, cmd.user_openid)
-        role_info = game_service.get_player_info(room, cmd.user_openid)
-        return (
-            f"游戏开始！房间号: {room.room_number}\n\n{role_info}\n\n"
-            f"当前阶段: {room.game_state.phase}\n当前队长: 玩家{room.game_state.leader_idx + 1}"
-        )
+        names = game_service.player_names(room)
+        role_info = game_service.get_player_info(room, cmd.user_openid, names)
+        leader = names[room.game_state.leader_idx]
+        return f"游戏开始！房间号: {room.room_number}\n\n{role_info}\n\n当前阶段: {room.game_state.phase}\n当前队长: {leader}"
 
 
-class StatusHandler(CommandHandler):
+class SetRolesHandler(CommandHandler):
     def handle(self, cmd: Command) -> str:
         room = user_repo.get_current_room(cmd.user_openid)
         if not room:
             return "你当前不在任何房间中。"
 
-        players = room.game_state.players
-        players_count = len(players)
-        reply_text = f"【房间 {room.room_number} 状态】\n- 状态: {room.status}\n- 阶段: {room.game_state.phase}\n- 玩家人数: {players_count}/10"
+        if cmd.args:
+            room = room_service.set_role_variant(room.room_number, cmd.user_openid, cmd.args[0], cmd.args[1:])
 
-        if room.status == "PLAYING":
-            leader_name = f"玩家{room.game_state.leader_idx + 1}"
-            reply_text += f"\n- 当前轮次: 第 {room.game_state.round_num} 局"
-            reply_text += f"\n- 连续失败: {room.game_state.vote_track}/5"
-            reply_text += f"\n- 当前队长: {leader_name}"
+        options = room.options or {}
+        variant = role_tables.VARIANTS[options.get("variant") or role_tables.CLASSIC]
+        count = len(room.game_state.players)
+        try:
+            roles = " ".join(role_tables.roles_for(count, options))
+        except role_tables.RoleTableError as e:
+            roles = str(e)
+        choices = "、".join(f"{key}({v.label})" for key, v in role_tables.VARIANTS.items())
+        return (
+            f"当前板子: {variant.label}\n{count} 人角色: {roles}\n\n"
+            f"房主发送 /roles {{板子}} 更换，可选: {choices}\n"
+            "自定义: /roles custom merlin percival loyal assassin morgana"
+        )
 
-            if room.game_state.phase in ["TEAM_VOTE", "QUEST_PERFORM"]:
-                team_indices = [players.index(p) + 1 for p in room.game_state.current_team]
-                reply_text += f"\n- 当前队伍: {team_indices}"
 
-            role_info = game_service.get_player_info(room, cmd.user_openid)
-            reply_text += f"\n\n{role_info}"
-        return reply_text
+class StatusHandler(CommandHandler):
+    def handle(self, cmd: Command) -> str:
+        return status_service.render(cmd.user_openid)
 
 
 class PickTeamHandler(CommandHandler):
@@ -71,8 +79,9 @@ class PickTeamHandler(CommandHandler):
             return "你当前不在任何房间中。"
 
         indices = [int(i) for i in cmd.args]
-        game_service.pick_team(room.room_number, cmd.user_openid, indices)
-        return f"组队成功！请全体玩家对队伍 {indices} 进行投票。\n发送 '/vote yes' 或 '/vote no'。"
+        room = game_service.pick_team(room.room_number, cmd.user_openid, indices)
+        team = "、".join(game_service.player_names(room)[i - 1] for i in indices)
+        return f"组队成功！请全体玩家对队伍 [{team}] 进行投票。\n发送 '/vote yes' 或 '/vote no'。"
 
 
 class VoteHandler(CommandHandler):
@@ -113,19 +122,28 @@ class ProfileHandler(CommandHandler):
         return game_service.get_user_stats(cmd.user_openid)
 
 
+class RankHandler(CommandHandler):
+    def handle(self, cmd: Command) -> str:
+        board = cmd.args[0] if cmd.args else None
+        return leaderboard_service.render(cmd.user_openid, board)
+
+
 class HelpHandler(CommandHandler):
     def handle(self, cmd: Command) -> str:
         return (
             "【阿瓦隆指令帮助】\n"
             "- 建房: 创建房间\n"
             "- 加入 {房号}: 加入房间\n"
+            "- /roles [板子]: 查看/设置板子\n"
             "- /start: 开始游戏\n"
             "- /status: 状态查询\n"
             "- /profile: 个人战绩\n"
+            "- /rank [胜率/好人/坏人/梅林]: 排行榜\n"
             "- /pick 1 2 3: 队长组队\n"
             "- /vote yes/no: 组队投票\n"
             "- /quest success/fail: 任务执行\n"
-            "- /shoot {编号}: 刺杀梅林"
+            "- /shoot {编号}: 刺杀梅林\n"
+            "- 简写: /j /p /v /q /st /me /top"
         )
 
 
@@ -135,6 +153,9 @@ class SetNicknameHandler(CommandHandler):
         if not nickname:
             return "请输入有效的昵称。"
         user_repo.create_or_update(cmd.user_openid, nickname=nickname)
+        # The /profile header and the seat names in the player's room show the nickname
+        game_service.invalidate_profiles([cmd.user_openid])
+        game_service.player_renamed(cmd.user_openid)
         return f"昵称已成功设置为: {nickname}。"
 
 
@@ -150,25 +171,34 @@ class CommandDispatcher:
             CommandType.JOIN_ROOM: JoinRoomHandler(),
             CommandType.START_GAME: StartGameHandler(),
             CommandType.SET_NICKNAME: SetNicknameHandler(),
+            CommandType.SET_ROLES: SetRolesHandler(),
             CommandType.STATUS: StatusHandler(),
             CommandType.PICK_TEAM: PickTeamHandler(),
             CommandType.VOTE: VoteHandler(),
             CommandType.QUEST: QuestHandler(),
             CommandType.SHOOT: ShootHandler(),
             CommandType.PROFILE: ProfileHandler(),
+            CommandType.RANK: RankHandler(),
             CommandType.HELP: HelpHandler(),
             CommandType.UNKNOWN: UnknownHandler(),
         }
 
+    def throttle(self, cmd: Command) -> str | None:
+        """
+        限流检查，在创建用户等任何数据库访问之前调用；放行时返回 None，
+        被限流时返回固定回复，并按 "throttled" 计入指令指标（处理器不执行）
+        """
+        if rate_limiter.allow(cmd):
+            return None
+        with instrumentation.trace_command(cmd) as trace:
+            trace.outcome = "throttled"
+        return THROTTLED_REPLY
+
     def dispatch(self, cmd: Command) -> str:
-        handler = self._handlers.get(cmd.command_type, self._handlers[CommandType.UNKNOWN])
-        try:
+        """在 CommandTrace 中执行处理器（耗时、数据库 / Redis 调用数、慢指令日志），异常计数后原样抛给调用方"""
+        with instrumentation.trace_command(cmd):
+            handler = self._handlers.get(cmd.command_type, self._handlers[CommandType.UNKNOWN])
             return handler.handle(cmd)
-        except Exception as e:
-            # We can log the error here if needed, but we let the caller handle it or
-            # return a user-friendly error message if we want.
-            # In this refactoring, we mainly focus on the structure.
-            raise e
 
 
 dispatcher = CommandDispatcher()
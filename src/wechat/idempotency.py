@@ -0,0 +1,76 @@
+"""
+按微信 MsgId 的幂等层：微信 5 秒内收不到响应会重试同一条消息（最多 3 次），
+同一个 MsgId 只执行一次处理器，重试直接返回第一次渲染好的回复。
+"""
+
+import time
+
+from src.extensions.redis_ext import redis_manager
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 微信约定：回复 "success" 表示已收到、不回复用户，且不会再重试
+ACK = "success"
+
+
+class ReplyCache:
+    """
+    idem:wechat:{MsgId} 先以占位值 SET NX 抢占，处理完成后写入渲染好的回复 XML。
+    重试请求在占位期间轮询等待结果；等不到（第一次请求仍在处理）就回复 ACK，由第一次请求的响应作数。
+    Redis 不可用时不做去重，照常处理。
+    """
+
+    PREFIX = "idem:wechat:"
+    TTL = 60  # 覆盖微信三次重试（约 15 秒）
+    PENDING = "__pending__"
+    WAIT_SECONDS = 4.0  # 留出余量，保证重试请求本身在 5 秒内返回
+    POLL_INTERVAL = 0.1
+
+    def begin(self, msg_id) -> str | None:
+        """
+        抢占处理权
+        Returns:
+            None: 由本请求处理，完成后调用 finish（失败时调用 release）
+            str:  重复投递，直接返回该响应体
+        """
+        if not msg_id:
+            return None
+        key = f"{self.PREFIX}{msg_id}"
+        try:
+            if redis_manager.client.set(key, self.PENDING, nx=True, ex=self.TTL):
+                return None
+            deadline = time.monotonic() + self.WAIT_SECONDS
+            while True:
+                cached = redis_manager.client.get(key)
+                if cached is None:
+                    # 第一次请求失败并释放了占位：本次重新处理
+                    return None if redis_manager.client.set(key, self.PENDING, nx=True, ex=self.TTL) else ACK
+                if cached != self.PENDING:
+                    return cached
+                if time.monotonic() >= deadline:
+                    return ACK
+                time.sleep(self.POLL_INTERVAL)
+        except Exception as e:
+            logger.warning(f"Idempotency check failed for message {msg_id}: {e}")
+            return None
+
+    def finish(self, msg_id, rendered: str) -> None:
+        if not msg_id:
+            return
+        try:
+            redis_manager.client.set(f"{self.PREFIX}{msg_id}", rendered, ex=self.TTL)
+        except Exception as e:
+            logger.warning(f"Failed to store reply for message {msg_id}: {e}")
+
+    def release(self, msg_id) -> None:
+        """处理失败（未改变状态）时释放占位，让重试重新执行"""
+        if not msg_id:
+            return
+        try:
+            redis_manager.client.delete(f"{self.PREFIX}{msg_id}")
+        except Exception as e:
+            logger.warning(f"Failed to release message {msg_id}: {e}")
+
+
+reply_cache = ReplyCache()
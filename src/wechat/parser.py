@@ -5,6 +5,22 @@ from src.wechat.commands import Command, CommandType
 
 logger = get_logger(__name__)
 
+# Full-width ASCII (U+FF01-U+FF5E) and the ideographic space, as typed by Chinese IMEs: "／ｐｉｃｋ　１　２" -> "/pick 1 2"
+FULL_WIDTH = str.maketrans({**{chr(code): chr(code - 0xFEE0) for code in range(0xFF01, 0xFF5F)}, "　": " "})
+
+# First token, then the rest of the message as the argument string
+_TOKENS = re.compile(r"(\S+)\s*(.*)", re.DOTALL)
+
+# Argument patterns, matched against the whole argument string
+_NO_ARGS = re.compile(r"")
+_NUMBER = re.compile(r"(\d+)")
+_SEATS = re.compile(r"([\d\s]+)")
+_TEXT = re.compile(r"(.+)")
+_OPTIONAL_WORDS = re.compile(r"(.+)?")
+_OPTIONAL_WORD = re.compile(r"(\S+)?")
+_VOTE = re.compile(r"(yes|no|y|n|赞成|反对|同意|拒绝)", re.IGNORECASE)
+_QUEST = re.compile(r"(success|fail|成功|失败)", re.IGNORECASE)
+
 
 class CommandParser:
     """
@@ -14,60 +30,70 @@ class CommandParser:
     - "/join 1234" -> JOIN_ROOM, args=["1234"]
     - "/pick 1 2 3" -> PICK_TEAM, args=["1", "2", "3"]
     - "投票 yes" -> VOTE, args=["yes"]
+    - "/roles custom merlin loyal ..." -> SET_ROLES, args=["custom", "merlin", "loyal", ...]
+
+    The first token selects the command through a dict; the rest is checked by that
+    command's precompiled argument pattern. Full-width characters are folded first.
     """
 
-    def __init__(self):
-        # Map patterns to command types
-        self.patterns = [
-            # Pattern, CommandType
-            (r"^建房$|^创建房间$", CommandType.CREATE_ROOM),
-            (r"^/join\s+(\d+)$|^加入\s+(\d+)$", CommandType.JOIN_ROOM),
-            (r"^/start$|^开始游戏$", CommandType.START_GAME),
-            (r"^/nick\s+(.+)$|^昵称\s+(.+)$", CommandType.SET_NICKNAME),
-            (r"^/status$|^状态$", CommandType.STATUS),
-            (r"^/pick\s+([\d\s]+)$|^提议\s+([\d\s]+)$", CommandType.PICK_TEAM),
-            (
-                r"^/vote\s+(yes|no|赞成|反对)$|^投票\s+(yes|no|赞成|反对)$",
-                CommandType.VOTE,
-            ),
-            (
-                r"^/quest\s+(success|fail|成功|失败)$|^任务\s+(success|fail|成功|失败)$",
-                CommandType.QUEST,
-            ),
-            (r"^/shoot\s+(\d+)$|^刺杀\s+(\d+)$", CommandType.SHOOT),
-            (r"^/profile$|^我的战绩$|^战绩$", CommandType.PROFILE),
-            (r"^/help$|^帮助$|^菜单$", CommandType.HELP),
-        ]
+    # CommandType -> (keywords and aliases, argument pattern)
+    COMMANDS = {
+        CommandType.CREATE_ROOM: (("建房", "创建房间", "/create", "/new"), _NO_ARGS),
+        CommandType.JOIN_ROOM: (("/join", "加入", "/j", "进房"), _NUMBER),
+        CommandType.START_GAME: (("/start", "开始游戏", "开始"), _NO_ARGS),
+        CommandType.SET_NICKNAME: (("/nick", "昵称", "/name"), _TEXT),
+        CommandType.STATUS: (("/status", "状态", "/st"), _NO_ARGS),
+        CommandType.SET_ROLES: (("/roles", "板子"), _OPTIONAL_WORDS),
+        CommandType.PICK_TEAM: (("/pick", "提议", "/p", "组队"), _SEATS),
+        CommandType.VOTE: (("/vote", "投票", "/v"), _VOTE),
+        CommandType.QUEST: (("/quest", "任务", "/q"), _QUEST),
+        CommandType.SHOOT: (("/shoot", "刺杀"), _NUMBER),
+        CommandType.PROFILE: (("/profile", "我的战绩", "战绩", "/me"), _NO_ARGS),
+        CommandType.RANK: (("/rank", "排行榜", "/top"), _OPTIONAL_WORD),
+        CommandType.HELP: (("/help", "帮助", "菜单", "/h", "?"), _NO_ARGS),
+    }
 
-    def parse(self, text: str, openid: str) -> Command:
-        text = text.strip()
-        logger.debug(f"Parsing text: {text} from {openid}")
+    # Space-separated lists: seat numbers in /pick, variant and role names in /roles
+    SPLIT_ARGS = {CommandType.PICK_TEAM, CommandType.SET_ROLES}
 
-        for pattern, cmd_type in self.patterns:
-            match = re.match(pattern, text, re.IGNORECASE)
-            if match:
-                # Extract capture groups as arguments
-                args = [g for g in match.groups() if g is not None]
+    # Arguments are lowercased except free text (nicknames keep their case); aliases only apply to vote / quest cards
+    VERBATIM_ARGS = {CommandType.SET_NICKNAME}
+    ALIASED_ARGS = {CommandType.VOTE, CommandType.QUEST}
+    ARG_ALIASES = {"赞成": "yes", "同意": "yes", "y": "yes", "反对": "no", "拒绝": "no", "n": "no", "成功": "success", "失败": "fail"}
 
-                # Special handling for space-separated list of numbers (like in /pick)
-                if cmd_type == CommandType.PICK_TEAM and args:
-                    args = args[0].split()
+    def __init__(self):
+        self.keywords: dict[str, tuple[CommandType, re.Pattern]] = {}
+        for cmd_type, (keywords, pattern) in self.COMMANDS.items():
+            for keyword in keywords:
+                if keyword in self.keywords:
+                    raise ValueError(f"Duplicate command keyword: {keyword}")
+                self.keywords[keyword] = (cmd_type, pattern)
 
-                # Normalize common terms (e.g., '赞成' -> 'yes')
-                args = [self._normalize_arg(a) for a in args]
+    def parse(self, text: str, openid: str) -> Command:
+        text = text.translate(FULL_WIDTH).strip()
+        logger.debug(f"Parsing text: {text} from {openid}")
 
-                return Command(
-                    command_type=cmd_type,
-                    args=args,
-                    raw_content=text,
-                    user_openid=openid,
-                )
+        tokens = _TOKENS.fullmatch(text)
+        entry = self.keywords.get(tokens[1].lower()) if tokens else None
+        match = entry[1].fullmatch(tokens[2]) if entry else None
+        if match is None:
+            return Command(command_type=CommandType.UNKNOWN, raw_content=text, user_openid=openid)
 
-        return Command(command_type=CommandType.UNKNOWN, raw_content=text, user_openid=openid)
+        cmd_type = entry[0]
+        args = [g for g in match.groups() if g is not None]
+        if cmd_type in self.SPLIT_ARGS and args:
+            args = args[0].split()
+        if cmd_type not in self.VERBATIM_ARGS:
+            args = [a.lower() for a in args]
+        if cmd_type in self.ALIASED_ARGS:
+            args = [self.ARG_ALIASES.get(a, a) for a in args]
 
-    def _normalize_arg(self, arg: str) -> str:
-        mapping = {"赞成": "yes", "反对": "no", "成功": "success", "失败": "fail"}
-        return mapping.get(arg, arg).lower()
+        return Command(
+            command_type=cmd_type,
+            args=args,
+            raw_content=text,
+            user_openid=openid,
+        )
 
 
 # Singleton instance
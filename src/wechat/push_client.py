@@ -0,0 +1,64 @@
+"""
+主动推送客户端：把文本消息发给指定 openid
+- WeChatPushClient: 微信客服消息接口（需要 WECHAT_APPID / WECHAT_SECRET），access_token 存在 Redis 中共用
+- StubPushClient:   只记录最近发送的消息，本地开发与测试使用
+"""
+
+from abc import ABC, abstractmethod
+from collections import deque
+
+from src.config.settings import settings
+from src.extensions.redis_ext import redis_manager
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class PushRejected(Exception):
+    """对方无法接收（未关注、超过 48 小时未互动等），重试也不会成功"""
+
+
+class PushClient(ABC):
+    @abstractmethod
+    def send_text(self, openid: str, text: str) -> None:
+        """发送失败抛异常：PushRejected 表示不必重试，其他异常会稍后重试"""
+
+
+class StubPushClient(PushClient):
+    MAX_RECORDED = 1000  # 只保留最近的消息，长期运行的进程内存不增长
+
+    def __init__(self):
+        self.sent: deque[tuple[str, str]] = deque(maxlen=self.MAX_RECORDED)
+
+    def send_text(self, openid: str, text: str) -> None:
+        self.sent.append((openid, text))
+        logger.debug(f"[stub push] {openid}: {text}")
+
+
+class WeChatPushClient(PushClient):
+    # 43004 未关注, 45015 超过客服消息回复时限, 40003 openid 无效
+    PERMANENT_ERRORS = {40003, 43004, 45015}
+    # 每次获取新 access_token 都会让旧的失效：所有 Web worker 与 push-worker 进程必须共用一个，否则互相踢掉（40001）并耗尽每日获取次数
+    SESSION_PREFIX = "wechat:session"
+
+    def __init__(self, appid: str, secret: str):
+        from wechatpy import WeChatClient
+        from wechatpy.session.redisstorage import RedisStorage
+
+        self._client = WeChatClient(appid, secret, session=RedisStorage(redis_manager.client, prefix=self.SESSION_PREFIX))
+
+    def send_text(self, openid: str, text: str) -> None:
+        from wechatpy.exceptions import WeChatClientException
+
+        try:
+            self._client.message.send_text(openid, text)
+        except WeChatClientException as e:
+            if e.errcode in self.PERMANENT_ERRORS:
+                raise PushRejected(str(e)) from e
+            raise
+
+
+def create_push_client() -> PushClient:
+    if settings.PUSH_CLIENT == "wechat":
+        return WeChatPushClient(settings.WECHAT_APPID, settings.WECHAT_SECRET.get_secret_value())
+    return StubPushClient()
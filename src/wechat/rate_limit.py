@@ -0,0 +1,98 @@
+"""
+指令限流：按 (指令类型, openid) 和 (指令类型, 房间) 的 Redis 令牌桶，由 wechat_ctrl 在解析指令后、创建用户之前执行。
+被限流的请求直接回复固定文案，不访问数据库、不进入处理器：房间号取自 Redis 中的 openid -> 房间号映射（加入、离开房间时维护）。
+"""
+
+from src.config.settings import settings
+from src.extensions.redis_ext import redis_manager
+from src.repositories.user_repository import user_repo
+from src.utils.logger import get_logger
+from src.wechat.commands import Command, CommandType
+
+logger = get_logger(__name__)
+
+THROTTLED_REPLY = "操作太频繁，请稍后再试。"
+
+# 令牌桶: (每秒补充的令牌数, 桶容量)
+Bucket = tuple[float, float]
+
+# CommandType -> (按用户的桶, 按房间的桶 或 None)
+DEFAULT_LIMITS: dict[CommandType, tuple[Bucket, Bucket | None]] = {
+    CommandType.STATUS: ((0.2, 3), (1.0, 10)),
+    CommandType.PROFILE: ((0.1, 3), None),
+    CommandType.RANK: ((0.1, 3), None),
+    CommandType.HELP: ((0.2, 3), None),
+    CommandType.UNKNOWN: ((0.2, 5), None),
+    CommandType.CREATE_ROOM: ((1 / 60, 2), None),
+    CommandType.JOIN_ROOM: ((0.2, 3), None),
+    CommandType.SET_NICKNAME: ((0.1, 2), None),
+    CommandType.SET_ROLES: ((0.2, 3), None),
+    CommandType.START_GAME: ((0.2, 2), None),
+    CommandType.PICK_TEAM: ((1.0, 5), (5.0, 20)),
+    CommandType.VOTE: ((1.0, 5), (5.0, 20)),
+    CommandType.QUEST: ((1.0, 5), (5.0, 20)),
+    CommandType.SHOOT: ((1.0, 5), (5.0, 20)),
+}
+
+# KEYS[1]: 桶; ARGV: 每秒令牌数, 容量。用 Redis 服务器时间，多个 worker 之间没有时钟偏差
+_TOKEN_BUCKET = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return allowed
+"""
+
+
+class RateLimiter:
+    PREFIX = "rl:"
+
+    def __init__(self):
+        self._script = None  # (client, Script)：测试中每个 app 有自己的 Redis 客户端
+
+    def limits_for(self, command_type: CommandType) -> tuple[Bucket | None, Bucket | None]:
+        """默认限额，可由 RATE_LIMITS 按指令类型覆盖，如 {"status": [[0.2, 3], [1, 10]]}"""
+        override = settings.RATE_LIMITS.get(command_type.value)
+        if override is not None:
+            user, room = (list(override) + [None, None])[:2]
+            return (tuple(user) if user else None), (tuple(room) if room else None)
+        return DEFAULT_LIMITS.get(command_type, (None, None))
+
+    def allow(self, cmd: Command) -> bool:
+        """先扣用户桶，再扣房间桶（房间号只读 Redis，不知道房间时跳过房间桶）；Redis 不可用时放行"""
+        if not settings.RATE_LIMIT_ENABLED:
+            return True
+        user_limit, room_limit = self.limits_for(cmd.command_type)
+        try:
+            if user_limit and not self._take(f"{self.PREFIX}{cmd.command_type.value}:user:{cmd.user_openid}", user_limit):
+                logger.debug(f"Throttled {cmd.command_type.value} from {cmd.user_openid}")
+                return False
+            if room_limit:
+                room_number = user_repo.get_cached_room_number(cmd.user_openid)
+                if room_number and not self._take(f"{self.PREFIX}{cmd.command_type.value}:room:{room_number}", room_limit):
+                    logger.debug(f"Throttled {cmd.command_type.value} in room {room_number}")
+                    return False
+        except Exception as e:
+            logger.warning(f"Rate limiter unavailable, allowing {cmd.command_type.value} from {cmd.user_openid}: {e}")
+        return True
+
+    def _take(self, key: str, limit: Bucket) -> bool:
+        client = redis_manager.client
+        if self._script is None or self._script[0] is not client:
+            self._script = (client, client.register_script(_TOKEN_BUCKET))
+        rate, burst = limit
+        return bool(self._script[1](keys=[key], args=[rate, burst]))
+
+
+rate_limiter = RateLimiter()
@@ -22,6 +22,7 @@ def app():
         mock_redis = mock_from_url.return_value
         # Mock common methods
         mock_redis.get.return_value = None
+        mock_redis.hget.return_value = None
         mock_redis.set.return_value = True
         mock_redis.delete.return_value = True
 
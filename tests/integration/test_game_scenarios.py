@@ -1,4 +1,7 @@
+from unittest.mock import patch
+
 from src.fsm.avalon_fsm import GamePhase
+from src.repositories.room_repository import room_repo
 from src.repositories.user_repository import user_repo
 from src.services.game_service import game_service
 from src.services.room_service import room_service
@@ -146,3 +149,151 @@ def test_good_wins_by_assassination_fail(app):
         assert "刺杀失败" in msg
         assert room.game_state.phase == GamePhase.GAME_OVER.value
         assert room.status == "ENDED"
+
+
+def test_live_state_is_a_fold_of_the_event_log(app):
+    with app.app_context():
+        from src.app_factory import db
+        from src.fsm.game_log import replay
+        from src.models.sql_models import GameState
+        from src.repositories.room_repository import room_repo
+
+        users = setup_users(5)
+        room = room_service.create_room(users[0])
+        room_number = room.room_number
+        for u in users[1:]:
+            room_service.join_room(room_number, u)
+        game_service.start_game(room_number, users[0])
+
+        leader_openid = room.game_state.players[room.game_state.leader_idx]
+        game_service.pick_team(room_number, leader_openid, [1, 2])
+        for u in users[:3]:
+            game_service.cast_vote(room_number, u, "no")
+
+        # Votes only append events; the stored columns stay at the snapshot taken when the phase changed
+        stored = db.session.query(GameState.phase, GameState.log_seq).filter_by(room_id=room.id).one()
+        assert stored == (GamePhase.TEAM_VOTE.value, 2)
+        assert [e["seq"] for e in room_repo.load_events(room.id)] == [3, 4, 5]
+
+        events = room_repo.load_full_log(room.id)
+        assert [e["type"] for e in events] == ["game_started", "team_picked", "vote_cast", "vote_cast", "vote_cast"]
+        live = {field: getattr(room.game_state, field) for field in ("phase", "players", "current_team", "votes", "roles_config")}
+        replayed = replay(events)
+        assert {field: replayed[field] for field in live} == live
+
+        # A fresh load (new session) folds the tail onto the snapshot
+        db.session.remove()
+        reloaded = room_repo.get_by_number(room_number)
+        assert reloaded.game_state.phase == GamePhase.TEAM_VOTE.value
+        assert len(reloaded.game_state.votes) == 3
+
+        # The next phase boundary compacts the tail away
+        for u in users[3:]:
+            game_service.cast_vote(room_number, u, "no")
+        assert room_repo.load_events(reloaded.id) == []
+        assert len(room_repo.load_full_log(reloaded.id)) == 8
+
+
+def test_stale_writer_is_rejected(app):
+    with app.app_context():
+        import pytest
+        from sqlalchemy import update
+
+        from src.app_factory import db
+        from src.exceptions.biz.room_exceptions import RoomStateError
+        from src.models.sql_models import Room
+
+        users = setup_users(5)
+        room = room_service.create_room(users[0])
+        for u in users[1:]:
+            room_service.join_room(room.room_number, u)
+        game_service.start_game(room.room_number, users[0])
+
+        # Another worker wrote the room in the meantime
+        db.session.execute(update(Room).where(Room.id == room.id).values(version=Room.version + 1).execution_options(synchronize_session=False))
+        leader_openid = room.game_state.players[room.game_state.leader_idx]
+        with pytest.raises(RoomStateError):
+            game_service.pick_team(room.room_number, leader_openid, [1, 2])
+
+
+def test_finished_game_log_is_archived_compressed(app):
+    with app.app_context():
+        from unittest.mock import patch
+
+        from src.fsm.game_log import decode_log, replay
+        from src.models.sql_models import GameEvent, GameHistory
+
+        users = setup_users(5)
+        room = room_service.create_room(users[0])
+        room_number = room.room_number
+        for u in users[1:]:
+            room_service.join_room(room_number, u)
+
+        with patch("src.services.archive_service.settings") as mock_settings:
+            mock_settings.ARCHIVE_ASYNC = False
+            game_service.start_game(room_number, users[0])
+            for _ in range(5):
+                leader_openid = room.game_state.players[room.game_state.leader_idx]
+                game_service.pick_team(room_number, leader_openid, [1, 2])
+                for u in users:
+                    game_service.cast_vote(room_number, u, "no")
+
+        history = GameHistory.query.one()
+        log = decode_log(history.replay_log)
+        assert len(log) == 1 + 5 * (1 + 5 + 1)
+        assert replay(log)["phase"] == GamePhase.GAME_OVER.value
+        assert GameEvent.query.filter_by(room_id=room.id).count() == 0
+
+
+def test_night_knowledge_is_stored_at_start_and_dropped_at_game_over(app):
+    with app.app_context():
+        from src.app_factory import db
+        from src.models.sql_models import GameState
+
+        users = setup_users(5)
+        room = room_service.create_room(users[0])
+        room_number = room.room_number
+        for u in users[1:]:
+            room_service.join_room(room_number, u)
+        game_service.start_game(room_number, users[0])
+
+        gs = room.game_state
+        roles = [gs.roles_config[openid] for openid in gs.players]
+        merlin_seat = roles.index("MERLIN")
+        evil_seen = [seat for seat, role in enumerate(roles) if role in ("ASSASSIN", "MORGANA", "MINION", "OBERON")]
+        assert gs.night_info[merlin_seat] == evil_seen
+        stored = db.session.query(GameState.night_info).filter_by(room_id=room.id).scalar()
+        assert stored == gs.night_info
+
+        for _ in range(5):
+            leader_openid = room.game_state.players[room.game_state.leader_idx]
+            game_service.pick_team(room_number, leader_openid, [1, 2])
+            for u in users:
+                game_service.cast_vote(room_number, u, "no")
+
+        assert room.status == "ENDED"
+        assert db.session.query(GameState.night_info).filter_by(room_id=room.id).scalar() is None
+
+
+def test_every_move_is_one_append_and_one_notification(app):
+    with app.app_context():
+        users = setup_users(5)
+        room = room_service.create_room(users[0])
+        for u in users[1:]:
+            room_service.join_room(room.room_number, u)
+        game_service.start_game(room.room_number, users[0])
+
+        notified = []
+        game_service.add_transition_listener(lambda room, before, game, events, previous: notified.append((before, game.phase, len(events))))
+        try:
+            with patch.object(room_repo, "append_events", wraps=room_repo.append_events) as append:
+                leader = room.game_state.players[room.game_state.leader_idx]
+                game_service.pick_team(room.room_number, leader, [1, 2])
+                for u in users:
+                    game_service.cast_vote(room.room_number, u, "yes")
+        finally:
+            game_service._listeners.clear()
+
+        assert append.call_count == len(notified) == 6
+        assert notified[0] == (GamePhase.TEAM_SELECTION, GamePhase.TEAM_VOTE, 1)
+        assert notified[-1] == (GamePhase.TEAM_VOTE, GamePhase.QUEST_PERFORM, 2)  # last vote + resolution
@@ -0,0 +1,125 @@
+"""测试异步归档管道"""
+
+from unittest.mock import patch
+
+from src.models.sql_models import ArchiveOutbox, GameHistory, User
+from src.repositories.user_repository import user_repo
+from src.services.archive_service import archive_service
+from src.utils.json_utils import json_dumps
+
+ROLES = {"u1": "MERLIN", "u2": "PERCIVAL", "u3": "LOYAL", "u4": "ASSASSIN", "u5": "MORGANA"}
+
+
+def make_event(key="k1", winner="GOOD"):
+    return {
+        "archive_key": key,
+        "room_number": "1234",
+        "start_time": "2026-01-01T00:00:00",
+        "end_time": "2026-01-01T00:30:00",
+        "winner_team": winner,
+        "players": list(ROLES),
+        "roles": ROLES,
+        "quest_results": [True, True, True],
+    }
+
+
+def setup_users():
+    for openid in ROLES:
+        user_repo.create_or_update(openid)
+
+
+@patch("src.services.archive_service.redis_manager")
+def test_emit_only_enqueues(mock_redis, app):
+    with app.app_context():
+        archive_service.emit(make_event("k1"))
+
+        stream, fields = mock_redis.client.xadd.call_args.args
+        assert stream == "stream:game_archive"
+        assert "k1" in fields["data"]
+        assert GameHistory.query.count() == 0
+
+
+@patch("src.services.archive_service.redis_manager")
+def test_emit_archives_inline_when_queue_unavailable(mock_redis, app):
+    with app.app_context():
+        setup_users()
+        mock_redis.client.xadd.side_effect = ConnectionError("redis down")
+
+        archive_service.emit(make_event("k1", winner="EVIL"))
+
+        history = GameHistory.query.one()
+        assert history.archive_key == "k1"
+        assert history.replay_data["quest_results"] == [True, True, True]
+        assert User.query.filter_by(openid="u4").first().wins_evil == 1
+
+
+def test_process_is_idempotent(app):
+    with app.app_context():
+        setup_users()
+
+        assert archive_service.process([make_event("k1"), make_event("k1")]) == 1
+        assert archive_service.process([make_event("k1"), make_event("k2", winner="EVIL")]) == 1
+
+        assert GameHistory.query.count() == 2
+        merlin = User.query.filter_by(openid="u1").first()
+        assert merlin.total_games == 2
+        assert merlin.wins_as_merlin == 1
+
+
+@patch("src.services.archive_service.redis_manager")
+def test_consume_acks_processed_and_keeps_failed_pending(mock_redis, app):
+    with app.app_context():
+        setup_users()
+        client = mock_redis.client
+        client.xautoclaim.return_value = ["0-0", [], []]
+        mock_redis.blocking_client.xreadgroup.return_value = [
+            ["stream:game_archive", [("1-0", {"data": json_dumps(make_event("k1"))}), ("2-0", {"data": "{broken"})]]
+        ]
+        client.xpending_range.return_value = [{"message_id": "2-0", "times_delivered": 1}]
+
+        assert archive_service.consume(block_ms=1) == 2
+
+        client.xack.assert_called_once_with("stream:game_archive", "archivers", "1-0")
+        assert GameHistory.query.count() == 1
+
+        # 投递次数耗尽后转入死信流
+        client.xack.reset_mock()
+        client.xpending_range.return_value = [{"message_id": "2-0", "times_delivered": 5}]
+        client.xautoclaim.return_value = ["0-0", [("2-0", {"data": "{broken"})], []]
+        archive_service.consume(block_ms=1)
+
+        client.xadd.assert_called_once_with("stream:game_archive:dead", {"data": "{broken"})
+        client.xack.assert_called_once_with("stream:game_archive", "archivers", "2-0")
+
+
+@patch("src.services.archive_service.redis_manager")
+def test_failed_archive_does_not_fail_the_final_move_and_is_swept(mock_redis, app):
+    from src.services.game_service import game_service
+    from src.services.room_service import room_service
+
+    with app.app_context():
+        setup_users()
+        room = room_service.create_room("u1")
+        for openid in list(ROLES)[1:]:
+            room_service.join_room(room.room_number, openid)
+        game_service.start_game(room.room_number, "u1")
+
+        mock_redis.client.xadd.side_effect = ConnectionError("redis down")
+        with patch.object(archive_service, "process", side_effect=RuntimeError("db hiccup")):
+            for _ in range(5):  # five rejected teams: EVIL wins, the last vote ends the game
+                leader = room.game_state.players[room.game_state.leader_idx]
+                game_service.pick_team(room.room_number, leader, [1, 2])
+                for openid in ROLES:
+                    game_service.cast_vote(room.room_number, openid, "no")
+
+        assert room.status == "ENDED"
+        pending = ArchiveOutbox.query.one()
+        key, payload = pending.archive_key, pending.payload
+        assert payload["winner_team"] == "EVIL"
+        assert GameHistory.query.count() == 0
+
+        assert archive_service.sweep(older_than_seconds=-1) == 1
+        assert GameHistory.query.one().archive_key == key
+        assert ArchiveOutbox.query.count() == 0
+        # a late copy from the stream is skipped by its archive_key
+        assert archive_service.process([payload]) == 0
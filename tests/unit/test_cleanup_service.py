@@ -1,10 +1,19 @@
 from datetime import UTC, datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import event
 
 from src.app_factory import db
-from src.models.sql_models import GameState, Room
+from src.models.sql_models import GameEvent, GameState, Room, User
 from src.services.cleanup_service import cleanup_service
 
 
+def run_pass(name, batch_size=500):
+    cleanup_pass = next(p for p in cleanup_service.passes() if p.name == name)
+    return cleanup_service._run_pass(cleanup_pass, batch_size, sleep_seconds=0)
+
+
 def test_cleanup_ended_rooms(app):
     with app.app_context():
         # Create a room that ended more than 7 days ago
@@ -16,7 +25,7 @@ def test_cleanup_ended_rooms(app):
         room.updated_at = datetime.now(UTC).replace(tzinfo=None) - timedelta(days=8)
         db.session.commit()
 
-        count = cleanup_service._cleanup_ended_rooms()
+        count = run_pass("ENDED")
         assert count == 1
         assert Room.query.filter_by(room_number="1111").first() is None
 
@@ -33,7 +42,7 @@ def test_cleanup_waiting_rooms_empty(app):
         room.updated_at = datetime.now(UTC).replace(tzinfo=None) - timedelta(hours=2)
         db.session.commit()
 
-        count = cleanup_service._cleanup_waiting_rooms()
+        count = run_pass("WAITING_EMPTY")
         assert count == 1
         assert Room.query.filter_by(room_number="2222").first() is None
 
@@ -50,7 +59,7 @@ def test_cleanup_stalled_playing_rooms(app):
         room.updated_at = datetime.now(UTC).replace(tzinfo=None) - timedelta(days=4)
         db.session.commit()
 
-        count = cleanup_service._cleanup_stalled_playing_rooms()
+        count = run_pass("PLAYING_STALLED")
         assert count == 1
         assert Room.query.filter_by(room_number="3333").first() is None
 
@@ -67,7 +76,7 @@ def test_cleanup_orphaned_rooms(app):
         db.session.commit()
 
         # Ensure no user has current_room_id = room.id
-        count = cleanup_service._cleanup_orphaned_rooms()
+        count = run_pass("ORPHANED")
         assert count == 1
         assert Room.query.filter_by(room_number="4444").first() is None
 
@@ -78,3 +87,166 @@ def test_cleanup_all(app):
         stats = cleanup_service.cleanup_expired_rooms()
         assert isinstance(stats, dict)
         assert "total" in stats
+
+
+def _stale_rooms(count, minutes=10, status="WAITING"):
+    rooms = [Room(room_number=f"9{i:04d}", owner_id=f"owner{i}", status=status) for i in range(count)]
+    db.session.add_all(rooms)
+    db.session.commit()
+    for room in rooms:
+        room.updated_at = datetime.now(UTC).replace(tzinfo=None) - timedelta(minutes=minutes)
+    db.session.commit()
+    return rooms
+
+
+def test_orphaned_rooms_found_with_one_query(app):
+    with app.app_context():
+        rooms = _stale_rooms(6)
+        db.session.add(User(openid="member", current_room_id=rooms[0].id))
+        db.session.commit()
+
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", record)
+        try:
+            count = run_pass("ORPHANED")
+        finally:
+            event.remove(db.engine, "before_cursor_execute", record)
+
+        assert count == 5
+        assert [r.room_number for r in Room.query.all()] == [rooms[0].room_number]
+        # the candidate SELECT plus one batch of bulk statements (and its members SELECT), independent of the number of rooms
+        assert sum(s.lstrip().upper().startswith("SELECT") for s in statements) == 2
+        assert len(statements) <= 7
+
+
+def test_bulk_delete_in_batches(app):
+    with (
+        app.app_context(),
+        patch("src.repositories.room_repository.redis_manager") as mock_redis,
+    ):
+        rooms = _stale_rooms(5, minutes=60 * 24 * 8, status="ENDED")
+        room_id = rooms[0].id
+        db.session.add(User(openid="member", current_room_id=room_id))
+        db.session.add(GameEvent(room_id=room_id, seq=1, event_type="GAME_STARTED", payload={}))
+        db.session.commit()
+
+        assert run_pass("ENDED", batch_size=2) == 5
+        assert Room.query.count() == 0 and GameEvent.query.count() == 0
+        assert User.query.filter_by(openid="member").one().current_room_id is None
+        pipe = mock_redis.client.pipeline.return_value
+        assert pipe.execute.call_count == 3  # one cache pipeline per batch
+        deleted_keys = {c.args[0] for c in pipe.delete.call_args_list}
+        assert deleted_keys == {f"cache:room:9{i:04d}" for i in range(5)} | {"user:room:member"}
+
+
+class FakeCheckpoints:
+    """只实现断点用到的 hash 命令；pipeline 直接执行"""
+
+    def __init__(self):
+        self.hashes: dict[str, dict[str, str]] = {}
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def execute(self):
+        return []
+
+    def hget(self, key, field):
+        return self.hashes.get(key, {}).get(field)
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        self.hashes.setdefault(key, {}).update(mapping or {field: str(value)})
+
+    def hdel(self, key, field):
+        self.hashes.get(key, {}).pop(field, None)
+
+    def hincrby(self, key, field, delta):
+        pass
+
+    def expire(self, key, seconds):
+        pass
+
+    def delete(self, key):
+        self.hashes.pop(key, None)
+
+
+def test_interrupted_cleanup_resumes_from_checkpoint(app):
+    fake = FakeCheckpoints()
+    with app.app_context(), patch("src.services.cleanup_service.redis_manager") as mock_redis:
+        mock_redis.client = fake
+        rooms = _stale_rooms(5, minutes=60 * 24 * 8, status="ENDED")
+        ids = [room.id for room in rooms]
+
+        # killed while sleeping between the first and second batch
+        with patch("src.services.cleanup_service.time.sleep", side_effect=KeyboardInterrupt), pytest.raises(KeyboardInterrupt):
+            cleanup_service.cleanup_expired_rooms(batch_size=2, sleep_seconds=1)
+        assert fake.hget(cleanup_service.CHECKPOINT_KEY, "ENDED") == str(ids[1])
+        assert Room.query.count() == 3
+
+        # rooms before the checkpoint are not scanned again
+        with patch.object(cleanup_service, "stream", wraps=cleanup_service.stream) as stream:
+            stats = cleanup_service.cleanup_expired_rooms(batch_size=2, sleep_seconds=0)
+        assert stream.call_args_list[0].args[2] == ids[1]
+        assert stats["ENDED"] == 3 and Room.query.count() == 0
+        assert fake.hashes.get(cleanup_service.CHECKPOINT_KEY, {}) == {}
+
+
+def test_policies_do_not_overlap(app):
+    with app.app_context():
+        now = datetime.now(UTC).replace(tzinfo=None)
+        ages = {"5001": timedelta(hours=30), "5002": timedelta(hours=2), "5003": timedelta(hours=2)}
+        for number, age in ages.items():
+            room = Room(room_number=number, owner_id="owner", status="WAITING", updated_at=now - age)
+            db.session.add_all([room, GameState(room=room, players=["owner"] if number == "5003" else [])])
+        db.session.commit()
+
+        matched = {p.name: [row.room_number for _, rows in cleanup_service.stream(p, 500) for row in rows] for p in cleanup_service.passes()}
+        assert matched == {
+            "ENDED": [],
+            "WAITING_EMPTY": ["5002"],
+            "WAITING_STALLED": ["5001"],
+            "PLAYING_STALLED": [],
+            "ORPHANED": ["5003"],  # has players in its game state but no user points at it
+        }
+
+
+def test_plan_matches_real_run_without_deleting(app):
+    with app.app_context():
+        ended = _stale_rooms(3, minutes=60 * 24 * 8, status="ENDED")
+        db.session.add(GameState(room=ended[0], players=["member"]))
+        db.session.add(User(openid="member", current_room_id=ended[0].id))
+        db.session.add_all(GameEvent(room_id=ended[0].id, seq=seq, event_type="GAME_STARTED", payload={}) for seq in (1, 2))
+        db.session.add(Room(room_number="7777", owner_id="fresh", status="WAITING"))
+        db.session.commit()
+
+        records = list(cleanup_service.plan(batch_size=2, samples=2, list_rooms=True))
+        assert Room.query.count() == 4
+
+        policies = {r["policy"]: r for r in records if r["type"] == "policy"}
+        assert list(policies) == list(cleanup_service.CLEANUP_POLICIES)
+        assert policies["ENDED"] | {"samples": None} == {
+            "type": "policy",
+            "policy": "ENDED",
+            "category": "ENDED",
+            "threshold_hours": 168,
+            "rooms": 3,
+            "game_states": 1,
+            "game_events": 2,
+            "users": 1,
+            "bytes": 3 * 256 + 2048 + 2 * 256,
+            "samples": None,
+        }
+        assert policies["ENDED"]["samples"] == ["90000", "90001"]
+        assert [r["rooms"] for r in records if r["type"] == "rooms"] == [["90000", "90001"], ["90002"]]
+        total = records[-1]
+        assert total["type"] == "total" and total["rooms"] == 3 and total["bytes_source"] == "default"
+
+        stats = cleanup_service.cleanup_expired_rooms(sleep_seconds=0)
+        assert {category: stats[category] for category in ("ENDED", "WAITING", "PLAYING", "ORPHANED")} == {
+            category: sum(r["rooms"] for r in policies.values() if r["category"] == category)
+            for category in ("ENDED", "WAITING", "PLAYING", "ORPHANED")
+        }
@@ -0,0 +1,28 @@
+"""测试请求截止时间"""
+
+import time
+
+import pytest
+
+from src.exceptions.server.server_exceptions import DeadlineExceededError
+from src.utils import deadline
+
+
+def test_check_is_a_no_op_without_deadline():
+    assert deadline.remaining() is None
+    deadline.check("anything", reserve=100)
+
+
+def test_check_raises_when_less_than_reserve_is_left():
+    with deadline.budget(0.05):
+        deadline.check("early", reserve=0.01)
+        time.sleep(0.06)
+        with pytest.raises(DeadlineExceededError) as exc:
+            deadline.check("persist", reserve=0)
+    assert exc.value.details == {"step": "persist"}
+    assert deadline.remaining() is None
+
+
+def test_select_gets_execution_time_hint():
+    assert deadline.with_time_limit("SELECT rooms.id FROM rooms", 1500) == "SELECT /*+ MAX_EXECUTION_TIME(1500) */ rooms.id FROM rooms"
+    assert deadline.with_time_limit("UPDATE rooms SET version=2", 1500) == "UPDATE rooms SET version=2"
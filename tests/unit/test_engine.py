@@ -0,0 +1,134 @@
+"""测试纯规则引擎（无数据库、无 Redis）"""
+
+import time
+from unittest.mock import patch
+
+import pytest
+
+from src.fsm import engine
+from src.fsm.avalon_fsm import GamePhase
+from src.fsm.game_log import from_game, to_game
+
+ROLES_5 = ["MERLIN", "PERCIVAL", "LOYAL", "ASSASSIN", "MORGANA"]
+ROLES_7 = ["MERLIN", "PERCIVAL", "LOYAL", "LOYAL", "ASSASSIN", "MORGANA", "MORDRED"]
+
+
+def play_round(g, cards):
+    """队长选前 N 人，全员同意，队员按 cards 出牌"""
+    g, _ = engine.pick(g, g.leader, list(range(g.quest_size)))
+    for seat in range(g.n):
+        g, _ = engine.vote(g, seat, True)
+    for seat, card in zip(g.team, cards, strict=False):
+        g, events = engine.quest(g, seat, card)
+    return g, events
+
+
+def test_full_game_good_wins_when_assassin_misses():
+    g = engine.new_game(ROLES_5)
+    for _ in range(3):
+        g, _ = play_round(g, [True] * 3)
+
+    assert g.phase is GamePhase.ASSASSINATION
+    g, events = engine.shoot(g, 3, 2)
+    assert g.phase is GamePhase.GAME_OVER
+    assert g.winner == "GOOD"
+    assert events == [(engine.GameEventType.ASSASSINATION, {"seat": 2, "hit": False})]
+
+
+def test_transitions_do_not_mutate_input():
+    g = engine.new_game(ROLES_5)
+    after, _ = engine.pick(g, 0, [0, 1])
+    assert g.phase is GamePhase.TEAM_SELECTION
+    assert after.phase is GamePhase.TEAM_VOTE
+    assert after.team == (0, 1)
+
+
+def test_illegal_moves_raise_with_player_message():
+    g = engine.new_game(ROLES_5)
+    with pytest.raises(engine.IllegalMove, match="你不是当前队长"):
+        engine.pick(g, 1, [0, 1])
+    with pytest.raises(engine.IllegalMove, match="需要选择 2 人"):
+        engine.pick(g, 0, [0, 1, 2])
+    with pytest.raises(engine.IllegalMove, match="当前不是投票阶段"):
+        engine.vote(g, 0, True)
+
+    g, _ = engine.pick(g, 0, [0, 1])
+    with pytest.raises(engine.IllegalMove, match="你不在该房间中"):
+        engine.vote(g, None, True)
+
+
+def test_transition_table_guards_and_targets():
+    g = engine.new_game(ROLES_5)
+    with pytest.raises(engine.IllegalMove, match="TEAM_SELECTION 阶段没有超时处理"):
+        engine.timeout(g, [])
+
+    # every declared phase change is allowed by AvalonFSM.check_transition
+    fsm = engine.AvalonFSM()
+    for t in engine.TRANSITIONS.values():
+        assert all(fsm.check_transition(src.value, dst) for src in t.phases for dst in t.targets)
+
+    # the live path re-checks guards and targets for every emitted event
+    with pytest.raises(ValueError, match="assassination is not legal in TEAM_SELECTION"):
+        engine._emit(g, [(engine.GameEventType.ASSASSINATION, {"seat": 0, "hit": True})])
+    picked = engine.TRANSITIONS[engine.GameEventType.TEAM_PICKED]
+    rogue = engine.Transition(picked.phases, lambda g, payload: g.evolve(phase=GamePhase.GAME_OVER), picked.targets)
+    with patch.dict(engine.TRANSITIONS, {engine.GameEventType.TEAM_PICKED: rogue}):
+        with pytest.raises(ValueError, match="not a declared target"):
+            engine.pick(g, 0, [0, 1])
+
+
+def test_rejections_rotate_leader_and_fifth_rejection_ends_game():
+    g = engine.new_game(ROLES_5)
+    for rejection in range(5):
+        g, _ = engine.pick(g, g.leader, [0, 1])
+        for seat in range(5):
+            g, _ = engine.vote(g, seat, False)
+        if rejection < 4:
+            assert g.leader == rejection + 1
+            assert g.vote_track == rejection + 1
+
+    assert g.phase is GamePhase.GAME_OVER
+    assert g.winner == "EVIL"
+
+
+def test_fourth_quest_needs_two_fails_with_seven_players():
+    g = engine.new_game(ROLES_7)
+    for success in (True, False, True):
+        g, _ = play_round(g, [success] + [True] * 4)
+    assert g.round_num == 4
+
+    g, events = play_round(g, [False, True, True, True])
+    assert events[-1] == (engine.GameEventType.QUEST_RESOLVED, {"success": True, "fails": 1})
+    assert g.phase is GamePhase.ASSASSINATION
+
+
+def test_timeout_fills_missing_votes_and_resolves():
+    g, _ = engine.pick(engine.new_game(ROLES_5), 0, [0, 1])
+    g, _ = engine.vote(g, 0, True)
+    assert engine.pending_seats(g) == [1, 2, 3, 4]
+
+    g, events = engine.timeout(g, [(1, True), (2, True), (3, False), (4, False)])
+    assert [kind for kind, _ in events] == [engine.GameEventType.TIMEOUT, engine.GameEventType.TEAM_VOTE_RESOLVED]
+    assert g.phase is GamePhase.QUEST_PERFORM
+
+
+def test_stored_state_round_trips_through_engine():
+    players = [f"u{i}" for i in range(5)]
+    g, _ = engine.pick(engine.new_game(ROLES_5), 0, [2, 4])
+    g, _ = engine.vote(g, 3, False)
+
+    state = from_game(g, players)
+    assert state["current_team"] == ["u2", "u4"]
+    assert state["votes"] == {"u3": "no"}
+    assert to_game(state) == g
+
+
+def test_full_game_runs_in_microseconds():
+    # 不依赖任何 I/O：一整局（含 15 次投票 + 9 张任务牌）远低于 1 毫秒
+    start = time.perf_counter()
+    for _ in range(100):
+        g = engine.new_game(ROLES_5)
+        for _ in range(3):
+            g, _ = play_round(g, [True] * 3)
+        engine.shoot(g, 3, 0)
+    assert (time.perf_counter() - start) / 100 < 0.001
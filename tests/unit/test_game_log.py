@@ -0,0 +1,84 @@
+"""测试对局事件日志的折叠与压缩存储"""
+
+from datetime import datetime
+
+from src.fsm.avalon_fsm import GamePhase
+from src.fsm.game_log import GameEventType, decode_log, encode_log, fold, replay, seat_index
+
+PLAYERS = ["u1", "u2", "u3", "u4", "u5"]
+ROLES = ["MERLIN", "PERCIVAL", "LOYAL", "ASSASSIN", "MORGANA"]
+TS = datetime(2026, 1, 1, 0, 0, 0)
+
+
+def event(kind, payload):
+    return {"type": kind.value, "payload": payload, "ts": TS}
+
+
+def one_round(success=True):
+    events = [event(GameEventType.TEAM_PICKED, {"team": [0, 1]})]
+    events += [event(GameEventType.VOTE_CAST, {"seat": seat, "vote": "yes"}) for seat in range(5)]
+    events.append(event(GameEventType.TEAM_VOTE_RESOLVED, {"approved": True}))
+    events.append(event(GameEventType.QUEST_CAST, {"seat": 0, "vote": "success"}))
+    events.append(event(GameEventType.TIMEOUT, {"phase": GamePhase.QUEST_PERFORM.value, "votes": [[1, "success" if success else "fail"]]}))
+    events.append(event(GameEventType.QUEST_RESOLVED, {"success": success, "fails": 0 if success else 1}))
+    return events
+
+
+def test_fold_does_not_mutate_input():
+    state = fold({}, GameEventType.GAME_STARTED.value, {"players": PLAYERS, "roles": ROLES}, TS)
+    before = dict(state)
+    after = fold(state, GameEventType.VOTE_CAST.value, {"seat": 2, "vote": "no"}, TS)
+
+    assert state == before
+    assert after["votes"] == {"u3": "no"}
+    assert state["roles_config"]["u4"] == "ASSASSIN"
+
+
+def test_game_start_builds_seat_index_kept_for_the_whole_game():
+    state = replay([event(GameEventType.GAME_STARTED, {"players": PLAYERS, "roles": ROLES})] + one_round())
+
+    assert state["seat_of"] == {"u1": 0, "u2": 1, "u3": 2, "u4": 3, "u5": 4}
+
+    # A state stored before the index existed gets it rebuilt from players / roles_config
+    legacy = type("obj", (object,), {"players": PLAYERS, "roles_config": state["roles_config"], "seat_of": None})()
+    assert seat_index(legacy) == state["seat_of"]
+
+
+def test_replay_full_round_advances_to_next_leader():
+    state = replay([event(GameEventType.GAME_STARTED, {"players": PLAYERS, "roles": ROLES})] + one_round())
+
+    assert state["phase"] == GamePhase.TEAM_SELECTION.value
+    assert state["round_num"] == 2
+    assert state["leader_idx"] == 1
+    assert state["quest_results"] == [True]
+    assert state["quest_votes"] == {}
+
+
+def test_three_successes_lead_to_assassination_then_game_over():
+    events = [event(GameEventType.GAME_STARTED, {"players": PLAYERS, "roles": ROLES})]
+    for _ in range(3):
+        events += one_round()
+    assert replay(events)["phase"] == GamePhase.ASSASSINATION.value
+
+    events.append(event(GameEventType.ASSASSINATION, {"seat": 0, "hit": True}))
+    assert replay(events)["phase"] == GamePhase.GAME_OVER.value
+
+
+def test_fifth_rejection_ends_game():
+    events = [event(GameEventType.GAME_STARTED, {"players": PLAYERS, "roles": ROLES})]
+    for _ in range(5):
+        events.append(event(GameEventType.TEAM_PICKED, {"team": [0, 1]}))
+        events.append(event(GameEventType.TEAM_VOTE_RESOLVED, {"approved": False}))
+
+    state = replay(events)
+    assert state["vote_track"] == 5
+    assert state["phase"] == GamePhase.GAME_OVER.value
+
+
+def test_encoded_log_replays_to_same_state():
+    events = [event(GameEventType.GAME_STARTED, {"players": PLAYERS, "roles": ROLES})] + one_round(success=False)
+
+    decoded = decode_log(encode_log(events))
+
+    assert decoded == events
+    assert replay(decoded) == replay(events)
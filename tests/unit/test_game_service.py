@@ -1,3 +1,9 @@
+import random
+
+import pytest
+
+from src.exceptions.biz.room_exceptions import RoomStateError
+from src.fsm import role_tables
 from src.services.game_service import game_service
 
 
@@ -111,3 +117,33 @@ def test_oberon_vision(app):
         info_oberon = game_service.get_player_info(room_mock, "u2")
         assert "奥伯伦不认识其他坏人" in info_oberon
         assert "你的盟友" not in info_oberon
+
+
+@pytest.mark.parametrize("variant", ["classic", "no_percival", "lady"])
+def test_assign_roles_deals_the_variant_table(variant, app):
+    with app.app_context():
+        for count, table in role_tables.VARIANTS[variant].tables.items():
+            players = [f"u{i}" for i in range(count)]
+            roles = game_service._assign_roles(players, random.Random(count), {"variant": variant})
+            assert sorted(roles.values()) == sorted(table)
+
+
+def test_assign_roles_uses_owner_preset(app):
+    with app.app_context():
+        preset = ["MERLIN", "LOYAL", "LOYAL", "ASSASSIN", "OBERON"]
+        roles = game_service._assign_roles([f"u{i}" for i in range(5)], options={"variant": "custom", "preset": preset})
+        assert sorted(roles.values()) == sorted(preset)
+
+        with pytest.raises(RoomStateError, match="自定义板子是 5 人的"):
+            game_service._assign_roles([f"u{i}" for i in range(6)], options={"variant": "custom", "preset": preset})
+        with pytest.raises(RoomStateError, match="不支持 5 人"):
+            game_service._assign_roles([f"u{i}" for i in range(5)], options={"variant": "lady"})
+
+
+def test_role_tables_reject_illegal_deals():
+    with pytest.raises(role_tables.RoleTableError, match="需要 3 好 2 坏，当前 4 好 1 坏"):
+        role_tables.validate(["MERLIN", "PERCIVAL", "LOYAL", "LOYAL", "ASSASSIN"])
+    with pytest.raises(role_tables.RoleTableError, match="ASSASSIN"):
+        role_tables.validate(["MERLIN", "LOYAL", "LOYAL", "MINION", "MORGANA"])
+    with pytest.raises(role_tables.RoleTableError, match="MORGANA 最多"):
+        role_tables.validate(["MERLIN", "LOYAL", "LOYAL", "LOYAL", "ASSASSIN", "MORGANA", "MORGANA"])
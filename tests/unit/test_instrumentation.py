@@ -0,0 +1,93 @@
+"""测试指令埋点：耗时直方图、错误计数、数据库 / Redis 调用计数与慢指令日志"""
+
+from unittest.mock import patch
+
+import pytest
+from prometheus_client import REGISTRY
+from redis import Redis
+from redis.client import Pipeline
+
+from src.config.settings import settings
+from src.exceptions.biz.room_exceptions import RoomNotFoundError
+from src.extensions.redis_ext import InstrumentedRedis
+from src.repositories.user_repository import user_repo
+from src.services.room_service import room_service
+from src.utils import instrumentation
+from src.wechat.commands import Command, CommandType
+from src.wechat.handlers import dispatcher
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def command(kind: CommandType, *args: str, openid: str = "user_1") -> Command:
+    return Command(command_type=kind, args=list(args), raw_content=kind.value, user_openid=openid)
+
+
+def test_dispatch_records_latency_and_db_calls(app):
+    with app.app_context():
+        user_repo.create_or_update("user_1")
+        room_service.create_room("user_1")
+
+        count = sample("avalon_command_duration_seconds_count", command="status")
+        statements = sample("avalon_command_db_statements_sum", command="status")
+        dispatcher.dispatch(command(CommandType.STATUS))
+
+        assert sample("avalon_command_duration_seconds_count", command="status") == count + 1
+        assert sample("avalon_command_db_statements_sum", command="status") > statements
+
+
+def test_dispatch_counts_errors_by_type(app):
+    with app.app_context():
+        before = sample("avalon_command_errors_total", command="join_room", error="RoomNotFoundError")
+        with pytest.raises(RoomNotFoundError):
+            dispatcher.dispatch(command(CommandType.JOIN_ROOM, "999999"))
+        assert sample("avalon_command_errors_total", command="join_room", error="RoomNotFoundError") == before + 1
+
+
+def test_slow_command_log_has_args_phases_and_trace_id(app):
+    with app.test_request_context(headers={"X-Trace-Id": "trace-42"}):
+        app.preprocess_request()
+        with (
+            patch.object(settings, "SLOW_COMMAND_MS", 0),
+            patch.object(instrumentation.logger, "warning") as warning,
+        ):
+            with instrumentation.trace_command(command(CommandType.PICK_TEAM, "1", "2")):
+                instrumentation.record_phase("persist", 0.25)
+                instrumentation.count_db_call()
+
+    message = warning.call_args.args[0]
+    context = warning.call_args.kwargs["extra"]["context"]
+    assert "pick_team ['1', '2']" in message and "persist 250.0" in message and "trace-42" in message
+    assert context["phases_ms"] == {"persist": 250.0}
+    assert context["db_calls"] == 1
+    assert context["trace_id"] == "trace-42"
+
+
+def test_fast_command_is_not_logged_and_untraced_calls_are_ignored(app):
+    with app.app_context():
+        instrumentation.count_db_call()  # no trace: no-op
+        with patch.object(instrumentation.logger, "warning") as warning:
+            with instrumentation.trace_command(command(CommandType.HELP)) as trace:
+                with instrumentation.phase("render"):
+                    pass
+        assert "render" in trace.phases
+        warning.assert_not_called()
+
+
+def test_redis_round_trips_are_counted_per_command():
+    client = InstrumentedRedis()
+    with (
+        patch.object(Redis, "execute_command", return_value=None),
+        patch.object(Pipeline, "execute", return_value=[]),
+        patch.object(instrumentation.logger, "warning"),
+    ):
+        with instrumentation.trace_command(command(CommandType.VOTE, "yes")) as trace:
+            client.get("a")
+            client.set("b", 1)
+            with client.pipeline() as pipe:
+                pipe.get("c")
+                pipe.get("d")
+                pipe.execute()
+    assert trace.redis_calls == 3
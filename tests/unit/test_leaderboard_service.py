@@ -0,0 +1,77 @@
+"""测试 Redis 排行榜"""
+
+from unittest.mock import patch
+
+from src.app_factory import db
+from src.models.sql_models import User
+from src.repositories.user_repository import user_repo
+from src.services.leaderboard_service import leaderboard_service
+
+
+def make_user(openid, **counters):
+    user = User(openid=openid, nickname=f"N_{openid}", **counters)
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def test_scores_respect_min_games_threshold(app):
+    with app.app_context():
+        veteran = make_user("vet", total_games=10, wins_good=4, wins_evil=2, wins_as_merlin=3)
+        rookie = make_user("new", total_games=2, wins_good=2, wins_evil=0)
+
+        scores = leaderboard_service.scores_for(veteran)
+        assert scores == {"winrate": 60.0, "good": 4, "evil": 2, "merlin": 3}
+
+        scores = leaderboard_service.scores_for(rookie)
+        assert scores["winrate"] is None  # 不足 5 局不上胜率榜
+        assert scores["good"] == 2
+        assert scores["merlin"] is None
+
+
+@patch("src.services.leaderboard_service.redis_manager")
+def test_update_users_zadds_counters_from_db(mock_redis, app):
+    with app.app_context():
+        user = make_user("u1", total_games=5, wins_good=5, wins_evil=0, wins_as_merlin=1)
+        pipe = mock_redis.client.pipeline.return_value
+
+        leaderboard_service.update_users([user])
+
+        pipe.zadd.assert_any_call("leaderboard:winrate", {"u1": 100.0})
+        pipe.zadd.assert_any_call("leaderboard:good", {"u1": 5})
+        pipe.zrem.assert_any_call("leaderboard:evil", "u1")
+        pipe.execute.assert_called_once()
+
+
+@patch("src.services.leaderboard_service.redis_manager")
+def test_render_top_and_my_rank(mock_redis, app):
+    with app.app_context():
+        make_user("u1")
+        make_user("u2")
+        mock_redis.client.zrevrange.return_value = [("u2", 7.0), ("u1", 3.0)]
+        mock_redis.client.pipeline.return_value.execute.return_value = [1, 3.0]
+
+        text = leaderboard_service.render("u1", "好人")
+
+        mock_redis.client.zrevrange.assert_called_once_with("leaderboard:good", 0, 9, withscores=True)
+        assert "【好人胜场榜】" in text
+        assert "1. N_u2 - 7胜" in text
+        assert "你的排名: 第 2 名 (3胜)" in text
+
+        assert "未知榜单" in leaderboard_service.render("u1", "nope")
+
+
+def test_archive_refreshes_leaderboards(app):
+    with app.app_context():
+        roles = {"u1": "MERLIN", "u2": "ASSASSIN"}
+        for openid in roles:
+            user_repo.create_or_update(openid)
+        event = {"archive_key": "k1", "room_number": "1234", "winner_team": "GOOD", "players": list(roles), "roles": roles, "quest_results": []}
+        with patch.object(leaderboard_service, "update_users") as mock_update:
+            from src.services.archive_service import archive_service
+
+            archive_service.process([event])
+
+            users = mock_update.call_args.args[0]
+            assert sorted(u.openid for u in users) == ["u1", "u2"]
+            assert users[0].total_games == 1
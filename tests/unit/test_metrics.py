@@ -0,0 +1,89 @@
+"""测试 /api/metrics：进程内指标、抓取时读取的房间数与清理结果、多进程汇总"""
+
+import os
+import subprocess
+import sys
+from unittest.mock import patch
+
+from prometheus_client import REGISTRY
+
+from src.app_factory import db
+from src.models.sql_models import GameState, Room
+from src.services.cleanup_service import cleanup_service
+from src.services.metrics_service import metrics_service
+from src.utils import metrics
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+
+def test_metrics_endpoint_exports_rooms_and_cleanup_results(app, client):
+    with app.app_context():
+        db.session.add(Room(room_number="100001", owner_id="u1", status="WAITING"))
+        playing = Room(room_number="100002", owner_id="u2", status="PLAYING")
+        db.session.add_all([playing, GameState(room=playing, players=[], phase="TEAM_VOTE")])
+        db.session.commit()
+
+    results = ({"ENDED": 2.0, "total": 2.0, "finished_at": 1700000000.0}, {"ENDED": 5, "ORPHANED": 1})
+    with (
+        patch.object(cleanup_service, "get_cleanup_results", return_value=results),
+        patch("src.services.room_gauge_service.redis_manager") as gauge_redis,
+    ):
+        gauge_redis.client.hgetall.return_value = {}  # never reconciled: counted from the database
+        client.get("/api/ping")
+        response = client.get("/api/metrics")
+
+    body = response.data.decode()
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain")
+    assert 'avalon_rooms{phase="",status="WAITING"} 1.0' in body
+    assert 'avalon_rooms{phase="TEAM_VOTE",status="PLAYING"} 1.0' in body
+    assert "avalon_rooms_orphaned 2.0" in body
+    assert 'avalon_cleanup_rooms_deleted_total{category="ENDED"} 5.0' in body
+    assert 'avalon_cleanup_last_run_rooms{category="ENDED"} 2.0' in body
+    assert "avalon_cleanup_last_run_timestamp_seconds 1.7e+09" in body
+    assert 'avalon_http_request_duration_seconds_count{endpoint="/api/ping",method="GET",status="200"}' in body
+
+
+def test_scrape_time_failures_do_not_break_endpoint(app, client):
+    with (
+        patch("src.services.metrics_service.room_gauge_service.read", side_effect=RuntimeError("db down")),
+        patch.object(cleanup_service, "get_cleanup_results", side_effect=ConnectionError("redis down")),
+    ):
+        response = client.get("/api/metrics")
+    body = response.data.decode()
+    assert response.status_code == 200
+    assert "avalon_rooms{" not in body and "avalon_cleanup" not in body
+    assert "avalon_timeout_check_duration_seconds" in body
+
+
+def test_cleanup_records_result_in_redis(app):
+    with app.app_context(), patch("src.services.cleanup_service.redis_manager") as mock_redis:
+        stats = cleanup_service.cleanup_expired_rooms()
+        pipe = mock_redis.client.pipeline.return_value
+        pipe.hset.assert_called_once()
+        assert pipe.hset.call_args.kwargs["mapping"]["total"] == stats["total"]
+        assert {c.args[1] for c in pipe.hincrby.call_args_list} == {"ENDED", "WAITING", "PLAYING", "ORPHANED"}
+        pipe.execute.assert_called_once()
+
+
+def test_timeout_checker_tick_is_timed(app):
+    from src.services.timeout_service import timeout_service
+
+    before = REGISTRY.get_sample_value("avalon_timeout_check_duration_seconds_count") or 0
+    with app.app_context():
+        timeout_service.check_and_process_timeouts()
+    assert REGISTRY.get_sample_value("avalon_timeout_check_duration_seconds_count") == before + 1
+
+
+def test_values_are_summed_across_worker_processes(app, tmp_path):
+    """两个 worker 进程各自写指标文件，抓取时汇总（与 gunicorn 多 worker 部署相同）"""
+    worker = "from src.utils import metrics; metrics.COMMANDS.labels('vote', 'ok').inc(3); metrics.DB_POOL_CHECKED_OUT.inc()"
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}
+    for _ in range(2):
+        subprocess.run([sys.executable, "-c", worker], cwd=ROOT, env=env, check=True)
+
+    with app.app_context(), patch.object(metrics, "MULTIPROC_DIR", str(tmp_path)):
+        body = metrics_service.render()[0].decode()
+    assert 'avalon_commands_total{command="vote",outcome="ok"} 6.0' in body
+    # livesum: exited workers are dropped by gunicorn's child_exit hook; here their files are still present
+    assert "avalon_db_pool_checked_out 2.0" in body
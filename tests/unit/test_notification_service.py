@@ -0,0 +1,124 @@
+"""测试阶段通知的入队与批量发送"""
+
+import time
+from unittest.mock import MagicMock, patch
+
+from src.config.settings import settings
+from src.repositories.user_repository import user_repo
+from src.services.game_service import game_service
+from src.services.notification_service import NotificationService
+from src.services.room_service import room_service
+from src.utils.json_utils import json_dumps, json_loads
+from src.wechat.push_client import PushRejected, StubPushClient, WeChatPushClient
+
+
+def queued(mock_redis) -> list[dict]:
+    return [json_loads(raw) for call in mock_redis.client.rpush.call_args_list for raw in call.args[1:]]
+
+
+@patch("src.services.notification_service.redis_manager")
+def test_start_and_phase_changes_notify_every_player(mock_redis, app):
+    with app.app_context(), patch.object(settings, "PUSH_ENABLED", True):
+        users = [f"user_{i}" for i in range(1, 6)]
+        for u in users:
+            user_repo.create_or_update(u)
+        room = room_service.create_room(users[0])
+        for u in users[1:]:
+            room_service.join_room(room.room_number, u)
+
+        game_service.start_game(room.room_number, users[0])
+        started = {m["openid"]: m["text"] for m in queued(mock_redis)}
+        leader = room.game_state.players[room.game_state.leader_idx]
+        assert set(started) == set(users)
+        assert all("你的身份是" in text for text in started.values())
+        assert "/pick" in started[leader]
+        assert sum("/pick" in text for text in started.values()) == 1
+
+        mock_redis.client.rpush.reset_mock()
+        game_service.pick_team(room.room_number, leader, [1, 2])
+        assert mock_redis.client.rpush.call_count == 1  # one enqueue per transition
+        assert all("/vote yes" in m["text"] for m in queued(mock_redis))
+
+        # single votes stay within the phase: no push until the vote resolves
+        mock_redis.client.rpush.reset_mock()
+        for u in users[:4]:
+            game_service.cast_vote(room.room_number, u, "yes")
+        mock_redis.client.rpush.assert_not_called()
+        game_service.cast_vote(room.room_number, users[4], "yes")
+        texts = {m["openid"]: m["text"] for m in queued(mock_redis)}
+        team = room.game_state.current_team
+        assert all(text.startswith(f"【房间 {room.room_number}】组队投票通过。") for text in texts.values())
+        assert all(("/quest" in texts[u]) == (u in team) for u in users)
+
+
+def message(text="hi", attempts=0):
+    return json_dumps({"id": "m1", "openid": "u1", "text": text, "attempts": attempts})
+
+
+@patch("src.services.notification_service.redis_manager")
+def test_sender_sends_a_batch_through_the_client(mock_redis):
+    mock_redis.client.zrangebyscore.return_value = []
+    mock_redis.blocking_client.blpop.return_value = ("queue:push", message("a"))
+    mock_redis.client.lpop.return_value = [message("b"), message("c")]
+    client = StubPushClient()
+
+    assert NotificationService(client).consume(block_seconds=1) == 3
+    assert list(client.sent) == [("u1", "a"), ("u1", "b"), ("u1", "c")]
+    mock_redis.client.lpop.assert_called_once_with("queue:push", 49)
+
+
+@patch("src.services.notification_service.redis_manager")
+def test_failed_sends_back_off_and_rejections_are_dropped(mock_redis):
+    client = MagicMock()
+    service = NotificationService(client)
+
+    client.send_text.side_effect = ConnectionError("timeout")
+    service._send(json_loads(message(attempts=1)))
+    key, retry = mock_redis.client.zadd.call_args.args
+    ((raw, due),) = retry.items()
+    assert key == "queue:push:retry"
+    assert json_loads(raw)["attempts"] == 2
+    assert due > time.time() + 3  # 2^2 seconds
+
+    mock_redis.client.zadd.reset_mock()
+    service._send(json_loads(message(attempts=service.MAX_ATTEMPTS - 1)))
+    client.send_text.side_effect = PushRejected("43004")
+    service._send(json_loads(message()))
+    mock_redis.client.zadd.assert_not_called()
+
+
+@patch("src.services.notification_service.redis_manager")
+def test_due_retries_are_requeued_once(mock_redis):
+    mock_redis.client.zrangebyscore.return_value = [message("x"), message("y")]
+    mock_redis.client.zrem.side_effect = [1, 0]  # another sender already took "y"
+
+    NotificationService(StubPushClient())._promote_due_retries()
+
+    mock_redis.client.rpush.assert_called_once_with("queue:push", message("x"))
+
+
+def test_push_is_off_unless_a_real_client_is_configured():
+    from src.config.settings import Settings
+
+    assert Settings(PUSH_CLIENT="stub").PUSH_ENABLED is False
+    assert Settings(PUSH_CLIENT="wechat").PUSH_ENABLED is True
+    assert Settings(PUSH_CLIENT="stub", PUSH_ENABLED=True).PUSH_ENABLED is True
+
+
+def test_stub_client_keeps_only_recent_messages():
+    client = StubPushClient()
+    for i in range(StubPushClient.MAX_RECORDED + 5):
+        client.send_text("u1", str(i))
+    assert len(client.sent) == StubPushClient.MAX_RECORDED
+    assert client.sent[0] == ("u1", "5")
+
+
+def test_wechat_client_keeps_the_access_token_in_redis():
+    redis = MagicMock()
+    redis.get.return_value = json_dumps("shared-token")
+    with patch("src.wechat.push_client.redis_manager") as mock_redis:
+        mock_redis.client = redis
+        first, second = WeChatPushClient("appid", "secret"), WeChatPushClient("appid", "secret")
+
+    assert first._client.access_token == second._client.access_token == "shared-token"
+    redis.get.assert_any_call("wechat:session:appid_access_token")
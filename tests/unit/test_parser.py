@@ -36,6 +36,56 @@ def test_parse_vote():
     assert cmd.args == ["no"]
 
 
+def test_parse_rank():
+    cmd = parser.parse("/rank", "user1")
+    assert cmd.command_type == CommandType.RANK
+    assert cmd.args == []
+
+    cmd = parser.parse("排行榜 梅林", "user1")
+    assert cmd.command_type == CommandType.RANK
+    assert cmd.args == ["梅林"]
+
+
 def test_parse_unknown():
     cmd = parser.parse("乱七八糟的内容", "user1")
     assert cmd.command_type == CommandType.UNKNOWN
+
+
+def test_parse_roles():
+    cmd = parser.parse("/roles", "user1")
+    assert cmd.command_type == CommandType.SET_ROLES
+    assert cmd.args == []
+
+    cmd = parser.parse("板子 custom MERLIN Loyal loyal ASSASSIN minion", "user1")
+    assert cmd.command_type == CommandType.SET_ROLES
+    assert cmd.args == ["custom", "merlin", "loyal", "loyal", "assassin", "minion"]
+
+
+def test_parse_full_width_input():
+    cmd = parser.parse("／ｐｉｃｋ　１　３　５", "user1")
+    assert cmd.command_type == CommandType.PICK_TEAM
+    assert cmd.args == ["1", "3", "5"]
+
+    cmd = parser.parse("加入　１２３４", "user1")
+    assert cmd.command_type == CommandType.JOIN_ROOM
+    assert cmd.args == ["1234"]
+
+
+def test_parse_aliases_and_case():
+    assert parser.parse("/v Y", "user1").args == ["yes"]
+    assert parser.parse("/VOTE 同意", "user1").args == ["yes"]
+    assert parser.parse("/q 失败", "user1").args == ["fail"]
+    assert parser.parse("/j 1234", "user1").command_type == CommandType.JOIN_ROOM
+    assert parser.parse("/top 梅林", "user1").args == ["梅林"]
+    assert parser.parse("？", "user1").command_type == CommandType.HELP
+
+
+def test_aliases_only_apply_to_vote_and_quest():
+    assert parser.parse("/nick Y", "user1").args == ["Y"]
+    assert parser.parse("/nick 失败 Alice", "user1").args == ["失败 Alice"]
+    assert parser.parse("/top n", "user1").args == ["n"]
+
+
+def test_parse_rejects_bad_arguments():
+    for text in ["/join abc", "/vote maybe", "/start now", "/pick", "/shoot", "建房 1", ""]:
+        assert parser.parse(text, "user1").command_type == CommandType.UNKNOWN, text
@@ -0,0 +1,110 @@
+"""测试指令限流（令牌桶脚本用进程内计数代替：只扣不补）"""
+
+from unittest.mock import patch
+
+import pytest
+
+from src.config.settings import settings
+from src.wechat.commands import Command, CommandType
+from src.wechat.handlers import dispatcher
+from src.wechat.rate_limit import THROTTLED_REPLY, RateLimiter
+
+
+class FakeBuckets:
+    def __init__(self):
+        self.taken: dict[str, int] = {}
+
+    def register_script(self, source):
+        return self
+
+    def __call__(self, keys, args):
+        rate, burst = args
+        self.taken[keys[0]] = self.taken.get(keys[0], 0) + 1
+        return int(self.taken[keys[0]] <= burst)
+
+
+@pytest.fixture
+def buckets():
+    fake = FakeBuckets()
+    with patch("src.wechat.rate_limit.redis_manager") as mock_redis:
+        mock_redis.client = fake
+        yield fake
+
+
+def command(kind: CommandType, openid: str = "user_1") -> Command:
+    return Command(command_type=kind, raw_content=kind.value, user_openid=openid)
+
+
+def test_user_bucket_is_per_openid_and_command_type(buckets):
+    limiter = RateLimiter()
+    with patch("src.wechat.rate_limit.user_repo.get_cached_room_number", return_value=None):
+        assert [limiter.allow(command(CommandType.STATUS)) for _ in range(4)] == [True, True, True, False]
+        assert limiter.allow(command(CommandType.STATUS, "user_2"))
+        assert limiter.allow(command(CommandType.VOTE))
+    assert "rl:status:user:user_1" in buckets.taken
+
+
+def test_room_bucket_is_shared_by_players_in_room(buckets):
+    limiter = RateLimiter()
+    with (
+        patch.object(settings, "RATE_LIMITS", {"vote": [[1, 5], [1, 2]]}),
+        patch("src.wechat.rate_limit.user_repo.get_cached_room_number", return_value="123456"),
+    ):
+        assert limiter.allow(command(CommandType.VOTE, "user_1"))
+        assert limiter.allow(command(CommandType.VOTE, "user_2"))
+        assert not limiter.allow(command(CommandType.VOTE, "user_3"))
+    assert buckets.taken["rl:vote:room:123456"] == 3
+
+
+def test_commands_without_room_limit_skip_room_lookup(buckets):
+    with patch("src.wechat.rate_limit.user_repo.get_cached_room_number") as lookup:
+        assert RateLimiter().allow(command(CommandType.HELP))
+    lookup.assert_not_called()
+
+
+def test_limits_can_be_overridden_or_disabled():
+    limiter = RateLimiter()
+    with patch.object(settings, "RATE_LIMITS", {"help": [[2, 10]], "vote": [None, [1, 3]]}):
+        assert limiter.limits_for(CommandType.HELP) == ((2, 10), None)
+        assert limiter.limits_for(CommandType.VOTE) == (None, (1, 3))
+    with patch.object(settings, "RATE_LIMIT_ENABLED", False), patch("src.wechat.rate_limit.redis_manager") as mock_redis:
+        assert limiter.allow(command(CommandType.STATUS))
+    mock_redis.client.register_script.assert_not_called()
+
+
+def test_redis_failure_allows_command():
+    with patch("src.wechat.rate_limit.redis_manager") as mock_redis:
+        mock_redis.client.register_script.side_effect = ConnectionError("down")
+        assert RateLimiter().allow(command(CommandType.HELP))
+
+
+def test_throttle_replies_without_running_handler(app):
+    with (
+        patch("src.wechat.handlers.rate_limiter.allow", return_value=False),
+        patch.object(dispatcher._handlers[CommandType.HELP], "handle") as handle,
+    ):
+        assert dispatcher.throttle(command(CommandType.HELP)) == THROTTLED_REPLY
+    handle.assert_not_called()
+    with patch("src.wechat.handlers.rate_limiter.allow", return_value=True):
+        assert dispatcher.throttle(command(CommandType.HELP)) is None
+
+
+def test_room_mapping_follows_join_and_leave(app):
+    from src.repositories.user_repository import user_repo
+    from src.services.room_service import room_service
+
+    mapping = {}
+    with app.app_context(), patch("src.repositories.user_repository.redis_manager") as mock_redis:
+        mock_redis.client.set.side_effect = lambda key, value, ex=None: mapping.__setitem__(key, value)
+        mock_redis.client.delete.side_effect = lambda *keys: [mapping.pop(key, None) for key in keys]
+        mock_redis.client.get.side_effect = mapping.get
+        mock_redis.client.mget.return_value = []
+        for openid in ("owner", "guest"):
+            user_repo.create_or_update(openid)
+        room = room_service.create_room("owner")
+        room_service.join_room(room.room_number, "guest")
+        assert user_repo.get_cached_room_number("guest") == room.room_number
+
+        room_service.cleanup_stale_rooms(hours=-1)
+        assert user_repo.get_cached_room_number("owner") is None
+        assert user_repo.get_cached_room_number("guest") is None
@@ -0,0 +1,142 @@
+"""测试 Redis 房间计数：增量维护的值与分组查询校准的结果一致"""
+
+from datetime import UTC, datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+
+from src.app_factory import db
+from src.models.sql_models import Room
+from src.repositories.user_repository import user_repo
+from src.services.cleanup_service import cleanup_service
+from src.services.game_service import game_service
+from src.services.room_gauge_service import room_gauge_service
+from src.services.room_service import room_service
+
+
+class FakeHashes:
+    """只实现计数用到的 hash 命令；pipeline 直接执行"""
+
+    def __init__(self):
+        self.hashes: dict[str, dict[str, int]] = {}
+        self.locks: set[str] = set()
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def execute(self):
+        return []
+
+    def hincrby(self, key, field, delta):
+        h = self.hashes.setdefault(key, {})
+        h[field] = h.get(field, 0) + delta
+
+    def hset(self, key, mapping):
+        self.hashes.setdefault(key, {}).update(mapping)
+
+    def hgetall(self, key):
+        return {k: str(v) for k, v in self.hashes.get(key, {}).items()}
+
+    def delete(self, key):
+        self.hashes.pop(key, None)
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.locks:
+            return None
+        self.locks.add(key)
+        return True
+
+
+@pytest.fixture
+def gauges():
+    fake = FakeHashes()
+    with patch("src.services.room_gauge_service.redis_manager") as mock_redis:
+        mock_redis.client = fake
+        yield fake
+
+
+def live() -> dict[str, int]:
+    return {k: v for k, v in room_gauge_service.read().items() if v and k != "reconciled_at"}
+
+
+def reconciled() -> dict[str, int]:
+    return {k: v for k, v in room_gauge_service.reconcile().items() if v and k not in ("reconciled_at", "orphaned")}
+
+
+def test_live_counts_follow_rooms_and_games(app, gauges):
+    with app.app_context():
+        room_gauge_service.reconcile()  # empty baseline
+        users = [f"user_{i}" for i in range(1, 6)]
+        for u in users:
+            user_repo.create_or_update(u)
+        room = room_service.create_room(users[0])
+        for u in users[1:]:
+            room_service.join_room(room.room_number, u)
+        room_service.create_room("nobody")  # owner without a user row: room counted, no player
+
+        assert live() == {"WAITING:WAITING": 2, "players": 5}
+
+        game_service.start_game(room.room_number, users[0])
+        leader = room.game_state.players[room.game_state.leader_idx]
+        game_service.pick_team(room.room_number, leader, [1, 2])
+        counts = live()
+        assert counts == {"WAITING:WAITING": 1, "PLAYING:TEAM_VOTE": 1, "players": 5}
+        assert counts == reconciled()
+
+
+def test_restarting_an_ended_room_moves_it_out_of_ended(app, gauges):
+    with app.app_context():
+        users = [f"user_{i}" for i in range(1, 6)]
+        for u in users:
+            user_repo.create_or_update(u)
+        room = room_service.create_room(users[0])
+        for u in users[1:]:
+            room_service.join_room(room.room_number, u)
+        room_gauge_service.reconcile()
+        game_service.start_game(room.room_number, users[0])
+        for _ in range(5):  # five rejected teams end the game
+            game_service.pick_team(room.room_number, room.game_state.players[room.game_state.leader_idx], [1, 2])
+            for u in users:
+                game_service.cast_vote(room.room_number, u, "no")
+        assert live() == {"ENDED:GAME_OVER": 1, "players": 5}
+
+        game_service.start_game(room.room_number, users[0])
+        counts = live()
+        assert counts == {"PLAYING:TEAM_SELECTION": 1, "players": 5}
+        assert counts == reconciled()
+
+
+def test_deleted_rooms_leave_the_counts(app, gauges):
+    with app.app_context():
+        room_gauge_service.reconcile()
+        user_repo.create_or_update("owner")
+        room = room_service.create_room("owner")
+        room.status = "ENDED"
+        db.session.commit()
+        room.updated_at = datetime.now(UTC).replace(tzinfo=None) - timedelta(days=8)
+        db.session.commit()
+        room_gauge_service.reconcile()
+        assert live()["ENDED:WAITING"] == 1
+
+        cleanup_service.cleanup_expired_rooms()
+        assert Room.query.count() == 0
+        assert live() == {}
+
+
+def test_room_statistics_come_from_gauges(app, gauges):
+    with app.app_context():
+        user_repo.create_or_update("owner")
+        room_service.create_room("owner")
+        room_service.create_room("ghost")
+        room_gauge_service.maybe_reconcile()  # orphaned is only refreshed by reconciliation
+        with patch("src.services.cleanup_service.User.query") as user_query:
+            stats = cleanup_service.get_room_statistics()
+        user_query.assert_not_called()  # no per-room player COUNT
+        assert stats == {"total": 2, "WAITING": 2, "PLAYING": 0, "ENDED": 0, "orphaned": 1, "players": 1}
+
+
+def test_reconcile_runs_once_per_interval(app, gauges):
+    with app.app_context(), patch.object(room_gauge_service, "reconcile") as reconcile:
+        assert room_gauge_service.maybe_reconcile()
+        assert not room_gauge_service.maybe_reconcile()
+    reconcile.assert_called_once()
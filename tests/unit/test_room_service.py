@@ -1,12 +1,34 @@
 from datetime import UTC
+from unittest.mock import patch
 
 import pytest
+from sqlalchemy import inspect
 
-from src.exceptions.biz.room_exceptions import RoomFullError, RoomNotFoundError
+from src.app_factory import db
+from src.exceptions.biz.room_exceptions import RoomFullError, RoomNotFoundError, RoomStateError
+from src.models.sql_models import Room
+from src.repositories.room_repository import room_repo
 from src.repositories.user_repository import user_repo
 from src.services.room_service import room_service
 
 
+class FakeRoomCache:
+    """只实现房间缓存用到的命令"""
+
+    def __init__(self):
+        self.values: dict[str, str] = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def setex(self, key, ttl, value):
+        self.values[key] = value
+
+    def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key, None)
+
+
 def test_room_lifecycle(app):
     with app.app_context():
         # Create
@@ -61,3 +83,39 @@ def test_cleanup_stale_rooms(app):
         count = room_service.cleanup_stale_rooms(hours=2)
         assert count == 1
         assert Room.query.filter_by(room_number=room.room_number).first() is None
+
+
+def test_owner_sets_role_variant_before_start(app):
+    with app.app_context():
+        room = room_service.create_room("owner")
+
+        room = room_service.set_role_variant(room.room_number, "owner", "无派")
+        assert room.options == {"variant": "no_percival"}
+
+        room = room_service.set_role_variant(room.room_number, "owner", "custom", ["merlin", "loyal", "loyal", "assassin", "minion"])
+        assert room.options == {"variant": "custom", "preset": ["MERLIN", "LOYAL", "LOYAL", "ASSASSIN", "MINION"]}
+
+        with pytest.raises(RoomStateError, match="只有房主"):
+            room_service.set_role_variant(room.room_number, "someone", "classic")
+        with pytest.raises(RoomStateError, match="未知板子"):
+            room_service.set_role_variant(room.room_number, "owner", "chaos")
+        with pytest.raises(RoomStateError, match="必须且只能有一个 MERLIN"):
+            room_service.set_role_variant(room.room_number, "owner", "custom", ["loyal", "loyal", "loyal", "assassin", "minion"])
+
+
+def test_role_variant_on_a_room_served_from_the_cache(app):
+    with app.app_context(), patch("src.repositories.room_repository.redis_manager") as mock_redis:
+        mock_redis.client = cache = FakeRoomCache()
+        room = room_service.create_room("owner")
+        version = room.version
+        room_repo.get_by_number(room.room_number)  # miss: fills the cache
+        assert not inspect(room_repo.get_by_number(room.room_number)).persistent  # hit: a detached copy
+
+        updated = room_service.set_role_variant(room.room_number, "owner", "无派")
+
+        assert updated.options == {"variant": "no_percival"}
+        assert f"cache:room:{room.room_number}" not in cache.values
+        db.session.expire_all()
+        stored = Room.query.filter_by(room_number=room.room_number).one()
+        assert (stored.options, stored.version) == ({"variant": "no_percival"}, version + 1)
+        assert room_repo.get_by_number(room.room_number).options == {"variant": "no_percival"}
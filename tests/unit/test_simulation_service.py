@@ -0,0 +1,68 @@
+"""测试蒙特卡洛对局模拟与机器人策略"""
+
+import random
+
+import pytest
+
+from src.services.simulation_service import OUTCOMES, play_game, simulation_service
+from src.strategies import POLICIES, AutoPlayPolicy, Policy
+
+
+@pytest.mark.parametrize("policy", sorted(POLICIES))
+@pytest.mark.parametrize("player_count", [5, 7, 10])
+def test_every_policy_finishes_games(policy, player_count):
+    rng = random.Random(7)
+    for _ in range(50):
+        roles, outcome = play_game(player_count, POLICIES[policy](), rng)
+        assert len(roles) == player_count
+        assert outcome in OUTCOMES
+
+
+def test_same_seed_reproduces_results():
+    first = simulation_service.run(300, [5, 8], policy="autoplay", seed=42, chunk_size=100)
+    second = simulation_service.run(300, [5, 8], policy="autoplay", seed=42, chunk_size=100)
+    other = simulation_service.run(300, [5, 8], policy="autoplay", seed=43, chunk_size=100)
+
+    assert first["tally"] == second["tally"]
+    assert first["tally"] != other["tally"]
+    assert sum(first["tally"].values()) == first["games"] == 600
+
+
+def test_report_groups_by_player_count_and_role_set():
+    result = simulation_service.run(200, [5], policy="random", seed=1)
+    report = "\n".join(simulation_service.format_report(result))
+
+    assert "2-3-2-3-3" in report  # 5 人任务人数表
+    assert "MERLIN PERCIVAL LOYAL | ASSASSIN" in report
+    assert "局/秒" in report
+
+
+def test_variant_selects_the_role_table():
+    result = simulation_service.run(50, [7], policy="random", variant="no_percival")
+    assert {roles for _, roles, _ in result["tally"]} == {"MERLIN LOYAL LOYAL LOYAL | ASSASSIN MINION MINION"}
+
+    with pytest.raises(ValueError):
+        simulation_service.run(10, [5], variant="lady")
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        simulation_service.run(10, [5], policy="nope")
+
+
+def test_autoplay_odds_match_timeout_behaviour():
+    rng = random.Random(0)
+    votes = [AutoPlayPolicy.auto_vote("LOYAL", rng) for _ in range(5000)]
+    assert 0.65 < votes.count("yes") / len(votes) < 0.75
+    assert {AutoPlayPolicy.auto_card("MERLIN", rng) for _ in range(100)} == {"success"}
+
+
+def test_policy_interface_is_abstract():
+    with pytest.raises(TypeError):
+        Policy()
+
+
+def test_heuristic_good_side_plays_on_what_it_knows():
+    result = simulation_service.run(1000, [5, 7], policy="heuristic", seed=3)
+    good = sum(games for (_, _, outcome), games in result["tally"].items() if outcome == "GOOD")
+    assert good / result["games"] > 0.25
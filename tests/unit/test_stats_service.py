@@ -0,0 +1,110 @@
+from unittest.mock import patch
+
+from src.app_factory import db
+from src.models.sql_models import GameHistory, User
+from src.repositories.user_repository import user_repo
+from src.services.game_service import game_service
+from src.services.stats_service import stats_service
+from src.utils.json_utils import json_dumps, json_loads
+
+ROLES = {"u1": "MERLIN", "u2": "PERCIVAL", "u3": "LOYAL", "u4": "ASSASSIN", "u5": "MORGANA"}
+
+
+def setup_users():
+    for openid in ROLES:
+        user_repo.create_or_update(openid, nickname=f"N_{openid}")
+
+
+def test_apply_game_result_increments_all_participants(app):
+    with app.app_context():
+        setup_users()
+        user_repo.apply_game_result(ROLES, "GOOD")
+        user_repo.apply_game_result(ROLES, "EVIL")
+        db.session.commit()
+
+        merlin = User.query.filter_by(openid="u1").first()
+        assert merlin.total_games == 2
+        assert merlin.games_good == 2
+        assert merlin.wins_good == 1
+        assert merlin.games_as_merlin == 2
+        assert merlin.wins_as_merlin == 1
+
+        assassin = User.query.filter_by(openid="u4").first()
+        assert assassin.games_evil == 2
+        assert assassin.wins_evil == 1
+        assert assassin.wins_as_assassin == 1
+        assert assassin.games_as_merlin == 0
+
+
+def test_get_user_stats_reads_counters(app):
+    with app.app_context():
+        setup_users()
+        user_repo.apply_game_result(ROLES, "GOOD")
+        db.session.commit()
+
+        stats = game_service.get_user_stats("u1")
+        assert "总局数: 1" in stats
+        assert "总胜率: 100.0%" in stats
+        assert "MERLIN: 1 (胜 1)" in stats
+
+        user_repo.create_or_update("newbie")
+        assert "暂无比赛记录" in game_service.get_user_stats("newbie")
+
+
+def test_reconcile_reports_and_fixes_drift(app):
+    with app.app_context():
+        setup_users()
+        db.session.add(GameHistory(room_id="1234", winner_team="EVIL", players=list(ROLES), replay_data={"roles": ROLES}))
+        db.session.commit()
+
+        # Counters were never incremented for this game -> every participant drifts
+        result = stats_service.reconcile_user_counters(batch_size=2, fix=False)
+        assert result["histories"] == 1
+        assert result["drifted"] == 5
+        assert result["drift"]["u4"]["wins_as_assassin"] == (0, 1)
+        assert User.query.filter_by(openid="u4").first().total_games == 0
+
+        result = stats_service.reconcile_user_counters(batch_size=2)
+        assert result["drifted"] == 5
+        assert User.query.filter_by(openid="u4").first().wins_evil == 1
+
+        assert stats_service.reconcile_user_counters(batch_size=2)["drifted"] == 0
+
+
+@patch("src.services.game_service.redis_manager")
+def test_profile_served_from_cache(mock_redis, app):
+    with app.app_context():
+        mock_redis.client.get.return_value = json_dumps({"text": "cached profile"})
+        with patch("src.services.game_service.user_repo") as mock_user_repo:
+            assert game_service.get_user_stats("u1") == "cached profile"
+            mock_user_repo.get_by_openid.assert_not_called()
+
+
+@patch("src.services.game_service.redis_manager")
+def test_profile_miss_fills_cache_without_overwriting(mock_redis, app):
+    with app.app_context():
+        setup_users()
+        mock_redis.client.get.return_value = None
+
+        text = game_service.get_user_stats("u1")
+
+        key, payload = mock_redis.client.set.call_args.args
+        assert key == "cache:profile:u1"
+        assert json_loads(payload) == {"text": text}
+        assert mock_redis.client.set.call_args.kwargs["nx"] is True
+
+
+@patch("src.services.game_service.redis_manager")
+def test_prewarm_renders_fresh_counters(mock_redis, app):
+    with app.app_context():
+        setup_users()
+        user_repo.apply_game_result(ROLES, "EVIL")
+        db.session.commit()
+
+        game_service.prewarm_profiles(list(user_repo.get_many(["u4"]).values()))
+
+        pipe = mock_redis.client.pipeline.return_value
+        key, payload = pipe.set.call_args.args
+        assert key == "cache:profile:u4"
+        assert "总局数: 1" in json_loads(payload)["text"]
+        assert "ASSASSIN: 1 (胜 1)" in json_loads(payload)["text"]
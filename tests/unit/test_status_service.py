@@ -0,0 +1,123 @@
+"""测试 /status 渲染缓存与请求合并"""
+
+import threading
+import time
+from unittest.mock import patch
+
+from src.repositories.room_repository import room_repo
+from src.repositories.user_repository import user_repo
+from src.services.game_service import game_service
+from src.services.room_service import room_service
+from src.services.status_service import StatusService
+from src.utils.json_utils import json_dumps
+from src.wechat.commands import Command, CommandType
+from src.wechat.handlers import SetNicknameHandler
+
+
+def start_game(n=5):
+    users = [f"user_{i}" for i in range(1, n + 1)]
+    for u in users:
+        user_repo.create_or_update(u, nickname=f"N{u[-1]}")
+    room = room_service.create_room(users[0])
+    for u in users[1:]:
+        room_service.join_room(room.room_number, u)
+    game_service.start_game(room.room_number, users[0])
+    return room, users
+
+
+@patch("src.services.status_service.redis_manager")
+def test_miss_renders_shared_and_every_seat_under_room_version(mock_redis, app):
+    with app.app_context():
+        mock_redis.client.get.return_value = None
+        room, users = start_game()
+        service = StatusService()
+
+        text = service.render(users[1])
+
+        assert text.startswith(f"【房间 {room.room_number} 状态】")
+        assert "你的身份是:" in text
+        leader = room.game_state.players[room.game_state.leader_idx]
+        assert f"当前队长: 玩家{room.game_state.leader_idx + 1}(N{leader[-1]})" in text
+        pipe = mock_redis.client.pipeline.return_value
+        keys = [c.args[0] for c in pipe.set.call_args_list]
+        prefix = f"cache:status:{room.room_number}:v{room.version}"
+        assert keys == [prefix] + [f"{prefix}:{seat}" for seat in range(5)]
+
+
+class FakeRoomCache:
+    """只实现房间缓存用到的命令"""
+
+    def __init__(self):
+        self.values: dict[str, str] = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def setex(self, key, ttl, value):
+        self.values[key] = value
+
+    def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key, None)
+
+
+@patch("src.services.status_service.redis_manager")
+def test_rename_moves_the_room_to_a_new_status_version(mock_redis, app):
+    with app.app_context(), patch("src.repositories.room_repository.redis_manager") as room_redis:
+        room_redis.client = room_cache = FakeRoomCache()
+        mock_redis.client.get.return_value = None
+        room, users = start_game()
+        room_repo.get_by_number(room.room_number)  # the room is now served from the cache
+        _, version = user_repo.get_current_room_version(users[0])
+
+        reply = SetNicknameHandler().handle(
+            Command(command_type=CommandType.SET_NICKNAME, args=["Alice"], raw_content="/nick Alice", user_openid=users[2])
+        )
+
+        assert reply == "昵称已成功设置为: Alice。"
+        assert f"cache:room:{room.room_number}" not in room_cache.values
+        assert user_repo.get_current_room_version(users[0]) == (room.room_number, version + 1)
+        seat = room.game_state.players.index(users[2])
+        assert game_service.player_names(room)[seat] == f"玩家{seat + 1}(Alice)"
+        StatusService().render(users[0])
+        keys = [c.args[0] for c in mock_redis.client.pipeline.return_value.set.call_args_list]
+        assert keys[0] == f"cache:status:{room.room_number}:v{version + 1}"
+
+
+@patch("src.services.status_service.room_repo")
+@patch("src.services.status_service.user_repo")
+@patch("src.services.status_service.redis_manager")
+def test_hit_needs_no_room_load(mock_redis, mock_user_repo, mock_room_repo):
+    mock_user_repo.get_current_room_version.return_value = ("1234", 7)
+    shared = json_dumps({"text": "【房间 1234 状态】", "seats": {"u1": 0, "u2": 1}, "playing": True})
+    mock_redis.client.get.side_effect = lambda key: {"cache:status:1234:v7": shared, "cache:status:1234:v7:1": "你的身份是: MERLIN"}.get(key)
+
+    text = StatusService().render("u2")
+
+    assert text == "【房间 1234 状态】\n\n你的身份是: MERLIN"
+    mock_room_repo.get_by_number.assert_not_called()
+
+
+@patch("src.services.status_service.user_repo")
+@patch("src.services.status_service.redis_manager")
+def test_concurrent_misses_are_coalesced(mock_redis, mock_user_repo):
+    mock_user_repo.get_current_room_version.return_value = ("1234", 3)
+    mock_redis.client.get.return_value = None
+    service = StatusService()
+    builds = []
+
+    def slow_build(room_number):
+        builds.append(room_number)
+        time.sleep(0.2)
+        return {"text": "shared", "seats": {f"u{i}": i for i in range(10)}, "playing": True, "seat_texts": {i: f"seat {i}" for i in range(10)}}
+
+    results = {}
+    with patch.object(service, "_build", side_effect=slow_build):
+        threads = [threading.Thread(target=lambda i=i: results.update({i: service.render(f"u{i}")})) for i in range(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    assert builds == ["1234"]
+    assert results[4] == "shared\n\nseat 4"
@@ -87,6 +87,13 @@ def mock_room_with_quest_timeout():
     return room
 
 
+def appended_auto_votes(mock_game_service, room):
+    """超时处理交给引擎的自动投票 {openid: vote}"""
+    (played_room, auto_votes), _ = mock_game_service.play_timeout.call_args
+    assert played_room is room
+    return {room.game_state.players[seat]: vote for seat, vote in auto_votes}
+
+
 class TestVoteTimeout:
     """测试投票超时处理"""
 
@@ -201,7 +208,7 @@ class TestVoteTimeout:
         timeout_service_instance._handle_vote_timeout(mock_room_with_vote_timeout)
 
         # 检查未投票的好人被设置为 yes
-        updated_votes = mock_room_with_vote_timeout.game_state.votes
+        updated_votes = appended_auto_votes(mock_game_service, mock_room_with_vote_timeout)
         assert updated_votes["user3"] == "yes"  # LOYAL
 
     @patch("src.services.timeout_service.datetime")
@@ -227,7 +234,7 @@ class TestVoteTimeout:
         timeout_service_instance._handle_vote_timeout(mock_room_with_vote_timeout)
 
         # 检查未投票的坏人被设置为 no
-        updated_votes = mock_room_with_vote_timeout.game_state.votes
+        updated_votes = appended_auto_votes(mock_game_service, mock_room_with_vote_timeout)
         assert updated_votes["user4"] == "no"  # MORGANA
 
 
@@ -309,7 +316,7 @@ class TestQuestTimeout:
         timeout_service_instance._handle_quest_timeout(mock_room_with_quest_timeout)
 
         # 检查未执行的好人被设置为 success
-        updated_votes = mock_room_with_quest_timeout.game_state.quest_votes
+        updated_votes = appended_auto_votes(mock_game_service, mock_room_with_quest_timeout)
         assert updated_votes["user3"] == "success"  # LOYAL
 
     @patch("src.services.timeout_service.datetime")
@@ -335,7 +342,7 @@ class TestQuestTimeout:
         timeout_service_instance._handle_quest_timeout(mock_room_with_quest_timeout)
 
         # 检查未执行的坏人被设置为 fail
-        updated_votes = mock_room_with_quest_timeout.game_state.quest_votes
+        updated_votes = appended_auto_votes(mock_game_service, mock_room_with_quest_timeout)
         assert updated_votes["user2"] == "fail"  # ASSASSIN
 
 
@@ -0,0 +1,42 @@
+"""测试用户昵称的批量查询"""
+
+from unittest.mock import patch
+
+from sqlalchemy import event
+
+from src.app_factory import db
+from src.repositories.user_repository import user_repo
+
+
+def count_selects(app):
+    statements = []
+    engine = db.engine
+    listener = lambda conn, cursor, statement, *args: statements.append(statement) if statement.startswith("SELECT") else None  # noqa: E731
+    event.listen(engine, "before_cursor_execute", listener)
+    return statements, lambda: event.remove(engine, "before_cursor_execute", listener)
+
+
+@patch("src.repositories.user_repository.redis_manager")
+def test_get_nicknames_uses_one_query_for_cache_misses(mock_redis, app):
+    with app.app_context():
+        user_repo.create_or_update("u1", nickname="Alice")
+        user_repo.create_or_update("u2")
+        user_repo.create_or_update("u3", nickname="Carol")
+        mock_redis.client.mget.return_value = [None, None, "Cached"]
+
+        statements, stop = count_selects(app)
+        names = user_repo.get_nicknames(["u1", "u2", "u3"])
+        stop()
+
+        assert names == {"u1": "Alice", "u2": None, "u3": "Cached"}
+        assert len(statements) == 1
+        pipe = mock_redis.client.pipeline.return_value
+        assert sorted(c.args[:2] for c in pipe.set.call_args_list) == [("cache:user:u1:nickname", "Alice"), ("cache:user:u2:nickname", "")]
+
+
+@patch("src.repositories.user_repository.redis_manager")
+def test_setting_nickname_invalidates_cache(mock_redis, app):
+    with app.app_context():
+        user_repo.create_or_update("u1", nickname="Alice")
+
+        mock_redis.client.delete.assert_called_with("cache:user:u1:nickname")
@@ -88,3 +88,129 @@ def test_wechat_error_handler(client):
             response = client.post("/", data=xml_data, content_type="text/xml")
             assert response.status_code == 200
             assert "提示: 测试异常" in response.data.decode()
+
+
+def text_message(content, msg_id):
+    return f"""
+    <xml>
+        <ToUserName><![CDATA[gh_123]]></ToUserName>
+        <FromUserName><![CDATA[user_openid]]></FromUserName>
+        <CreateTime>123456</CreateTime>
+        <MsgType><![CDATA[text]]></MsgType>
+        <Content><![CDATA[{content}]]></Content>
+        <MsgId>{msg_id}</MsgId>
+    </xml>
+    """
+
+
+@pytest.fixture
+def reply_store():
+    """dict-backed stand-in for the idempotency keys in Redis"""
+    store = {}
+
+    def fake_set(key, value, nx=False, ex=None):
+        if nx and key in store:
+            return None
+        store[key] = value
+        return True
+
+    with patch("src.wechat.idempotency.redis_manager") as mock_redis:
+        mock_redis.client.set.side_effect = fake_set
+        mock_redis.client.get.side_effect = store.get
+        mock_redis.client.delete.side_effect = lambda key: store.pop(key, None)
+        yield store
+
+
+def test_retried_message_is_handled_once(client, reply_store):
+    with patch("src.controllers.wechat_ctrl.check_signature", return_value=True):
+        with patch("src.wechat.handlers.dispatcher.dispatch", return_value="已投票") as dispatch:
+            first = client.post("/", data=text_message("/vote yes", 1001), content_type="text/xml")
+            retry = client.post("/", data=text_message("/vote yes", 1001), content_type="text/xml")
+            other = client.post("/", data=text_message("/vote yes", 1002), content_type="text/xml")
+
+    assert dispatch.call_count == 2
+    assert retry.data == first.data
+    assert "已投票" in first.data.decode()
+    assert "已投票" in other.data.decode()
+
+
+def test_retry_while_first_is_running_is_acknowledged(client, reply_store):
+    reply_store["idem:wechat:1001"] = "__pending__"
+    with patch("src.controllers.wechat_ctrl.check_signature", return_value=True):
+        with patch("src.wechat.idempotency.ReplyCache.WAIT_SECONDS", 0.2):
+            with patch("src.wechat.handlers.dispatcher.dispatch") as dispatch:
+                response = client.post("/", data=text_message("/start", 1001), content_type="text/xml")
+
+    dispatch.assert_not_called()
+    assert response.data.decode() == "success"
+
+
+def test_failed_message_releases_its_claim(client, reply_store):
+    from src.exceptions.biz.room_exceptions import RoomStateError
+
+    with patch("src.controllers.wechat_ctrl.check_signature", return_value=True):
+        with patch("src.wechat.handlers.dispatcher.dispatch", side_effect=RoomStateError("操作冲突，请重试")):
+            response = client.post("/", data=text_message("/vote yes", 1001), content_type="text/xml")
+
+    assert "操作冲突" in response.data.decode()
+    assert reply_store == {}
+
+
+def test_command_out_of_time_is_accepted_and_finished_in_background(client, reply_store):
+    from src.exceptions.server.server_exceptions import DeadlineExceededError
+
+    calls = []
+
+    def slow_then_done(cmd):
+        calls.append(cmd.raw_content)
+        if len(calls) == 1:
+            raise DeadlineExceededError("vote")
+        return "投票成功"
+
+    pushed = []
+    with patch("src.controllers.wechat_ctrl.check_signature", return_value=True):
+        with (
+            patch("src.wechat.handlers.dispatcher.dispatch", side_effect=slow_then_done),
+            patch("src.wechat.handlers.dispatcher.throttle", return_value=None) as throttle,
+        ):
+            with (
+                patch("src.wechat.deferred.deferred_commands._pool") as pool,
+                patch("src.wechat.deferred.deferred_commands._listeners", [lambda *a: pushed.append(a)]),
+            ):
+                pool.submit.side_effect = lambda fn, *args: fn(*args)
+                response = client.post("/", data=text_message("/vote yes", 1001), content_type="text/xml")
+
+    assert "已收到你的指令" in response.data.decode()
+    # 后台重做不再扣限流令牌
+    assert calls == ["/vote yes", "/vote yes"]
+    throttle.assert_called_once()
+    assert pushed == [("user_openid", "投票成功")]
+    assert "投票成功" in reply_store["idem:wechat:1001"]
+
+
+def test_throttled_message_runs_no_sql(client, app, reply_store):
+    from sqlalchemy import event
+
+    from src.app_factory import db
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with (
+        patch("src.controllers.wechat_ctrl.check_signature", return_value=True),
+        patch("src.wechat.rate_limit.redis_manager") as limiter_redis,
+        patch("src.repositories.user_repository.redis_manager") as user_redis,
+    ):
+        limiter_redis.client.register_script.return_value = lambda keys, args: 0  # every bucket is empty
+        user_redis.client.get.return_value = "1234"  # room known from Redis
+        with app.app_context():
+            event.listen(db.engine, "before_cursor_execute", record)
+            try:
+                response = client.post("/", data=text_message("/vote yes", 1001), content_type="text/xml")
+            finally:
+                event.remove(db.engine, "before_cursor_execute", record)
+
+    assert "操作太频繁" in response.data.decode()
+    assert statements == []